@@ -1,3 +1,4 @@
+import json
 import requests
 import threading
 import time
@@ -51,7 +52,7 @@ def register_node(name, cpu, ram, trust):
         "name": name,
         "ip_address": "127.0.0.1",
         "resources_capacity": {"cpu": cpu, "ram": ram},
-        "free_resources": {"cpu": cpu, "ram": ram},
+        "free_resources": {"free_cpu": cpu, "free_ram": ram},
         "trust_index": trust
     }
     res = requests.post(f"{API_BASE}/experiment/distribution/create_node/", json=payload)
@@ -103,10 +104,10 @@ def get_task_status(tid):
     return res.json() if res.status_code == 200 else None
 
 def get_all_tasks():
-    """Fetch all tasks from the API."""
-    res = requests.get(f"{API_BASE}/tasks")
-    res.raise_for_status()
-    return res.json()
+    """Fetch all tasks from the API (one streamed NDJSON export instead of paging or per-task requests)."""
+    with requests.get(f"{API_BASE}/tasks/export/", stream=True) as res:
+        res.raise_for_status()
+        return [json.loads(line) for line in res.iter_lines() if line]
 
 def trigger_orchestration():
     """Trigger orchestration manually to process tasks."""
@@ -139,7 +140,7 @@ class NodeThread(threading.Thread):
     def run(self):
         """Run the node thread to fetch and process tasks."""
         while not self.stop_flag.is_set():
-            send_heartbeat(self.nid, {"cpu": self.cpu, "ram": self.ram})
+            send_heartbeat(self.nid, {"free_cpu": self.cpu, "free_ram": self.ram})
             task = fetch_task(self.nid)
             if task:
                 tid = task["id"]
@@ -214,8 +215,9 @@ def run_experiment(algorithm, N, M):
     stale_counts = {}
     while True:
         finished = 0
+        exported = {tstat["id"]: tstat for tstat in get_all_tasks()}
         for tid in task_ids:
-            tstat = get_task_status(tid)
+            tstat = exported.get(tid)
             if not tstat:
                 continue
             stale_counts[tid] = tstat.get("stale_count", 0)
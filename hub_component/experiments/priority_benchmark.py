@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import random
+import uuid
+
+# Run from hub_component/:  python experiments/priority_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'licenta.settings')
+
+import django
+django.setup()
+
+from django.db import transaction
+from django.db.models import F, Func, DateTimeField, ExpressionWrapper
+
+from hub.models import Task
+from hub.task_manager import TaskManager
+
+# ============ CONFIGURABLE PARAMETERS ============
+
+PENDING_TASKS = 100_000
+AVAILABLE_SLOTS = 10
+REPEATS = 5
+CPU_REQ_RANGE = (1, 6)
+RAM_REQ_RANGE = (1, 10)
+MAX_AGE_MINUTES = 24 * 60
+
+
+class Rollback(Exception):
+    """Raised to discard the generated backlog once the benchmark is done."""
+
+
+def create_backlog(count):
+    """Bulk insert `count` pending tasks with random age, requirements and stale counts."""
+    tasks = [
+        Task(
+            id=uuid.uuid4(),
+            description="priority benchmark",
+            status="pending",
+            container_spec={"image": "alpine", "command": "true"},
+            resource_requirements={"cpu": random.randint(*CPU_REQ_RANGE), "ram": random.randint(*RAM_REQ_RANGE)},
+            stale_count=random.randint(0, 5),
+        )
+        for _ in range(count)
+    ]
+    Task.objects.bulk_create(tasks, batch_size=5000)
+    # created_at is auto_now_add, so spread ages with a single UPDATE
+    Task.objects.filter(description="priority benchmark").update(
+        created_at=ExpressionWrapper(
+            F('created_at') - Func(template=f"random() * interval '{MAX_AGE_MINUTES} minutes'"),
+            output_field=DateTimeField(),
+        )
+    )
+
+
+def timed(label, func):
+    """Run `func` REPEATS times and print the best wall time."""
+    best = float("inf")
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} best of {REPEATS}: {best * 1000:9.1f} ms")
+    return result
+
+
+def run_benchmark():
+    """Compare Python sorting of the whole backlog against SQL ORDER BY ... LIMIT."""
+    manager = TaskManager()
+
+    def backlog():
+        return Task.objects.filter(status="pending")
+
+    python_top = timed(
+        "python sort (full backlog)",
+        lambda: [t.id for t in sorted(backlog(), key=manager.calculate_task_priority, reverse=True)[:AVAILABLE_SLOTS]],
+    )
+    sql_top = timed(
+        "sql ORDER BY ... LIMIT",
+        lambda: [t.id for t in manager.annotate_task_priority(backlog()).order_by("-priority")[:AVAILABLE_SLOTS]],
+    )
+    print(f"Top-{AVAILABLE_SLOTS} identical: {set(python_top) == set(sql_top)}")
+
+
+if __name__ == "__main__":
+    try:
+        with transaction.atomic():
+            print(f"Creating {PENDING_TASKS} pending tasks (rolled back afterwards)...")
+            create_backlog(PENDING_TASKS)
+            run_benchmark()
+            raise Rollback()
+    except Rollback:
+        print("Benchmark data rolled back.")
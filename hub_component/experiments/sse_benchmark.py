@@ -0,0 +1,128 @@
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Run from hub_component/:  python experiments/sse_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'licenta.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+
+from hub.redis_publisher import publish_event
+
+# ============ CONFIGURABLE PARAMETERS ============
+
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+MESSAGES = 20
+# Publish at the network_activity frame cap (NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND = 2)
+MESSAGE_INTERVAL = 0.5
+HOST = "127.0.0.1"
+PORT = 18765
+PATH = "/api/sse/network_activity/"
+CONNECT_BATCH = 500
+
+
+async def open_stream(ready):
+    """Open one SSE stream over a raw socket and wait for the ': connected' comment."""
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(f"GET {PATH} HTTP/1.1\r\nHost: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b": connected\n\n")
+    ready.append(1)
+    return reader, writer
+
+
+async def read_messages(reader, count, latencies):
+    """Read `count` data frames and record the delivery latency of each."""
+    received = 0
+    while received < count:
+        line = await reader.readline()
+        if line.startswith(b"data: "):
+            sent_at = float(line[len(b"data: "):].split(b'"sent_at": ')[1].split(b"}")[0])
+            latencies.append(time.perf_counter() - sent_at)
+            received += 1
+
+
+def server_cpu_seconds(pid):
+    """User + system CPU time consumed by the server process."""
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def server_rss_mb(pid):
+    """Resident memory of the server process."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+async def wait_for_server():
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(HOST, PORT)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+
+
+async def run_benchmark():
+    """Serve licenta.asgi from a single uvicorn process, open CLIENTS concurrent streams and fan MESSAGES out."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "licenta.asgi:application", "--host", HOST, "--port", str(PORT),
+         "--workers", "1", "--log-level", "warning", "--backlog", str(CLIENTS), "--lifespan", "off"],
+        preexec_fn=lambda: resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard)),
+    )
+    await wait_for_server()
+
+    ready = []
+    streams = []
+    start = time.perf_counter()
+    for offset in range(0, CLIENTS, CONNECT_BATCH):
+        batch = min(CONNECT_BATCH, CLIENTS - offset)
+        streams += await asyncio.gather(*(open_stream(ready) for _ in range(batch)))
+    connect_time = time.perf_counter() - start
+    print(f"Opened {len(ready)} concurrent SSE streams in {connect_time:.1f}s")
+
+    latencies = []
+    server_cpu = server_cpu_seconds(server.pid)
+    client_cpu = time.process_time()
+    readers = [asyncio.create_task(read_messages(reader, MESSAGES, latencies)) for reader, _ in streams]
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        publish_event(settings.REDIS_NETWORK_ACTIVITY_CHANNEL,
+                      f'{{"type": "benchmark", "sent_at": {time.perf_counter()}}}')
+        await asyncio.sleep(MESSAGE_INTERVAL)
+    await asyncio.gather(*readers)
+    fan_out_time = time.perf_counter() - start
+    server_cpu = server_cpu_seconds(server.pid) - server_cpu
+    client_cpu = time.process_time() - client_cpu
+
+    latencies.sort()
+    delivered = len(latencies)
+    print(f"Delivered {delivered} frames ({MESSAGES} messages x {CLIENTS} clients) in {fan_out_time:.1f}s")
+    print(f"Latency p50 {latencies[delivered // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(delivered * 0.99)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"CPU during fan-out: server {server_cpu:.1f}s, benchmark clients {client_cpu:.1f}s")
+    print(f"Server RSS {server_rss_mb(server.pid):.0f} MB with {len(streams)} open streams "
+          f"(one process, one Redis subscription)")
+
+    # Graceful shutdown would wait for every open stream, so stop the server outright
+    server.kill()
+    server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
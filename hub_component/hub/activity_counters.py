@@ -0,0 +1,185 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from hub.models import Node, Task
+from hub.redis_publisher import redis_client
+
+# Counter hash fields: tasks:<status>, nodes:<status> and the active node aggregates below
+ACTIVE_FREE_CPU = "active_free_cpu"
+ACTIVE_FREE_RAM = "active_free_ram"
+ACTIVE_TRUST_SUM = "active_trust_sum"
+# Set only by reconcile(): increments on a missing hash would otherwise look like a complete snapshot
+RECONCILED_AT = "reconciled_at"
+
+# Swap a node's previous contribution ("status|free_cpu|free_ram|trust") for its current one atomically.
+# An empty status removes the node.
+_RECORD_NODE_SCRIPT = redis_client.register_script("""
+local previous = redis.call('HGET', KEYS[2], ARGV[1])
+if previous then
+    local status, cpu, ram, trust = string.match(previous, '^([^|]*)|([^|]*)|([^|]*)|([^|]*)$')
+    redis.call('HINCRBY', KEYS[1], 'nodes:' .. status, -1)
+    if status == 'active' then
+        redis.call('HINCRBYFLOAT', KEYS[1], ARGV[6], -tonumber(cpu))
+        redis.call('HINCRBYFLOAT', KEYS[1], ARGV[7], -tonumber(ram))
+        redis.call('HINCRBYFLOAT', KEYS[1], ARGV[8], -tonumber(trust))
+    end
+end
+if ARGV[2] == '' then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2] .. '|' .. ARGV[3] .. '|' .. ARGV[4] .. '|' .. ARGV[5])
+redis.call('HINCRBY', KEYS[1], 'nodes:' .. ARGV[2], 1)
+if ARGV[2] == 'active' then
+    redis.call('HINCRBYFLOAT', KEYS[1], ARGV[6], ARGV[3])
+    redis.call('HINCRBYFLOAT', KEYS[1], ARGV[7], ARGV[4])
+    redis.call('HINCRBYFLOAT', KEYS[1], ARGV[8], ARGV[5])
+end
+return 1
+""")
+
+
+def _keys():
+    return [settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY, settings.REDIS_NETWORK_ACTIVITY_NODES_KEY]
+
+
+def _node_contribution(node):
+    """Values a node adds to the aggregates (same free_resources keys the nodes report)."""
+    free = node.free_resources or {}
+    return float(free.get('free_cpu', 0) or 0), float(free.get('free_ram', 0) or 0), float(node.trust_index)
+
+
+def record_task_transitions(transitions):
+    """
+    Apply (old_status, new_status) pairs to the task counters in one MULTI/EXEC.
+    Use None as old_status for created tasks and as new_status for deleted ones.
+    """
+    deltas = Counter()
+    for old_status, new_status in transitions:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[old_status] -= 1
+        if new_status is not None:
+            deltas[new_status] += 1
+
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    for status, delta in deltas.items():
+        pipe.hincrby(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY, f"tasks:{status}", delta)
+    pipe.execute()
+
+
+def record_task_transition(old_status, new_status):
+    """Apply a single task status change to the counters."""
+    record_task_transitions([(old_status, new_status)])
+
+
+def record_nodes(nodes):
+    """Replace the recorded status and resources of each node with its current values."""
+    pipe = redis_client.pipeline(transaction=True)
+    for node in nodes:
+        cpu, ram, trust = _node_contribution(node)
+        _RECORD_NODE_SCRIPT(
+            keys=_keys(),
+            args=[str(node.id), node.status, cpu, ram, trust, ACTIVE_FREE_CPU, ACTIVE_FREE_RAM, ACTIVE_TRUST_SUM],
+            client=pipe,
+        )
+    pipe.execute()
+
+
+def record_node(node):
+    """Replace the recorded status and resources of a single node."""
+    record_nodes([node])
+
+
+def forget_node(node_id):
+    """Remove a deleted node from the counters."""
+    _RECORD_NODE_SCRIPT(
+        keys=_keys(),
+        args=[str(node_id), '', 0, 0, 0, ACTIVE_FREE_CPU, ACTIVE_FREE_RAM, ACTIVE_TRUST_SUM],
+    )
+
+
+def reconcile():
+    """
+    Recompute every counter from the database and replace the Redis state in one transaction.
+    Corrects drift from rolled back transactions or writes that bypassed the signals.
+    Returns the resulting network activity snapshot.
+    """
+    counters = {ACTIVE_FREE_CPU: 0.0, ACTIVE_FREE_RAM: 0.0, ACTIVE_TRUST_SUM: 0.0, RECONCILED_AT: time.time()}
+    for row in Task.objects.values('status').annotate(count=Count('id')).order_by():
+        counters[f"tasks:{row['status']}"] = row['count']
+
+    contributions = {}
+    for node in Node.objects.only('id', 'status', 'free_resources', 'trust_index'):
+        cpu, ram, trust = _node_contribution(node)
+        contributions[str(node.id)] = f"{node.status}|{cpu!r}|{ram!r}|{trust!r}"
+        counters[f"nodes:{node.status}"] = counters.get(f"nodes:{node.status}", 0) + 1
+        if node.status == 'active':
+            counters[ACTIVE_FREE_CPU] += cpu
+            counters[ACTIVE_FREE_RAM] += ram
+            counters[ACTIVE_TRUST_SUM] += trust
+
+    counters_key, nodes_key = _keys()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(counters_key, nodes_key)
+    pipe.hset(counters_key, mapping=counters)
+    if contributions:
+        pipe.hset(nodes_key, mapping=contributions)
+    pipe.execute()
+    return _as_activity_data(counters)
+
+
+def _as_activity_data(counters):
+    """Shape raw counters like the network activity payload served to the frontend."""
+    def count(field):
+        return int(float(counters.get(field, 0)))
+
+    active_nodes = count("nodes:active")
+    trust_sum = float(counters.get(ACTIVE_TRUST_SUM, 0))
+    return {
+        "active_nodes": active_nodes,
+        # Rounded like the node reports, hiding float noise from repeated HINCRBYFLOAT
+        "total_cpu": round(float(counters.get(ACTIVE_FREE_CPU, 0)), 2),
+        "total_ram": round(float(counters.get(ACTIVE_FREE_RAM, 0)), 2),
+        "pending_tasks": count("tasks:pending"),
+        "in_progress_tasks": count("tasks:in_progress"),
+        "completed_tasks": count("tasks:completed"),
+        "validated_tasks": count("tasks:validated"),
+        "failed_tasks": count("tasks:failed"),
+        "in_queue_tasks": count("tasks:in_queue"),
+        "average_trust_index": trust_sum / active_nodes if active_nodes else 0,
+    }
+
+
+def snapshot():
+    """
+    Read the network activity snapshot with a single HGETALL, whatever the table sizes.
+    Falls back to a full reconcile if the counters were never initialised (e.g. fresh or flushed Redis).
+    """
+    counters = {
+        field.decode(): value.decode()
+        for field, value in redis_client.hgetall(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY).items()
+    }
+    if RECONCILED_AT not in counters:
+        return reconcile()
+    return _as_activity_data(counters)
+
+
+def snapshot_version():
+    """
+    Digest of the raw counters, which changes whenever the snapshot does, so conditional GETs of the
+    snapshot can be answered without building it. Initialises the counters like snapshot() if needed.
+    """
+    counters = redis_client.hgetall(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY)
+    if RECONCILED_AT.encode() not in counters:
+        reconcile()
+        counters = redis_client.hgetall(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY)
+    return hashlib.md5(b"|".join(field + b"=" + value for field, value in sorted(counters.items()))).hexdigest()
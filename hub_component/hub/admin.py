@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Node, Task, TaskAssignment, Heartbeat
+from .models import Node, Task, TaskAssignment, Heartbeat, HeartbeatRollup
 
 # django admin = ORM interface for managing the models
 
@@ -25,3 +25,10 @@ class TaskAssignmentAdmin(admin.ModelAdmin):
 class HeartbeatAdmin(admin.ModelAdmin):
     """Django Admin interface for managing heartbeats."""
     list_display = ('id', 'node', 'timestamp', 'status')
+
+
+@admin.register(HeartbeatRollup)
+class HeartbeatRollupAdmin(admin.ModelAdmin):
+    """Django Admin interface for browsing the per-minute heartbeat history."""
+    list_display = ('node', 'minute', 'heartbeat_count', 'healthy_ratio', 'free_cpu_avg', 'free_ram_avg')
+    date_hierarchy = 'minute'
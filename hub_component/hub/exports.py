@@ -0,0 +1,72 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Columns written per row, in order (CSV header); JSON columns are written as JSON text in CSV
+TASK_COLUMNS = (
+    'id', 'description', 'status', 'submitted_by_id', 'trust_index_required', 'overlap_count',
+    'stale_count', 'resource_requirements', 'container_spec', 'result', 'created_at', 'updated_at',
+    'last_attempted',
+)
+ASSIGNMENT_COLUMNS = (
+    'id', 'task_id', 'node_id', 'task_status', 'reserved_cpu', 'reserved_ram', 'result',
+    'assigned_at', 'started_at', 'completed_at',
+)
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can format one row at a time."""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if value is None:
+        return ''
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _next_chunk(rows, size):
+    return list(islice(rows, size))
+
+
+async def _chunked(queryset, columns):
+    """
+    Rows of `queryset` as tuples, read through a server-side cursor EXPORT_CHUNK_SIZE at a time.
+    Each chunk is fetched in the thread that holds the connection (and the cursor) between chunks.
+    """
+    size = settings.EXPORT_CHUNK_SIZE
+    rows = queryset.values_list(*columns).iterator(chunk_size=size)
+    while True:
+        chunk = await sync_to_async(_next_chunk)(rows, size)
+        for row in chunk:
+            yield row
+        if len(chunk) < size:
+            return
+
+
+async def stream_rows(queryset, columns, fmt):
+    """
+    Async generator of the rows of `queryset` as NDJSON or CSV lines. Only one chunk of rows is held
+    at a time, so memory use does not grow with the export size.
+    """
+    rows = _chunked(queryset, columns)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        async for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+    else:
+        async for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
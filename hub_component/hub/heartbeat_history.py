@@ -0,0 +1,171 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from hub.models import Heartbeat, HeartbeatRollup, HeartbeatRollupFlush, Node
+from hub.redis_publisher import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Add one heartbeat to the per-minute aggregates of a node, stored as "<node_id>|<minute>|<field>" hash fields.
+# ARGV: "<node_id>|<minute>", healthy (0/1), free cpu and ram ('' when no resources were reported).
+_ACCUMULATE_SCRIPT = redis_client.register_script("""
+local prefix = ARGV[1] .. '|'
+redis.call('HINCRBY', KEYS[1], prefix .. 'count', 1)
+redis.call('HINCRBY', KEYS[1], prefix .. 'healthy', ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HINCRBY', KEYS[1], prefix .. 'samples', 1)
+    for i, name in ipairs({'cpu', 'ram'}) do
+        local value = ARGV[2 + i]
+        redis.call('HINCRBYFLOAT', KEYS[1], prefix .. name .. '_sum', value)
+        local current = redis.call('HGET', KEYS[1], prefix .. name .. '_min')
+        if not current or tonumber(value) < tonumber(current) then
+            redis.call('HSET', KEYS[1], prefix .. name .. '_min', value)
+        end
+    end
+end
+""")
+
+# Hand the accumulated aggregates to the flush: move them to the flushing key under a new batch id (ARGV[1])
+# and return {batch id, hash fields...}. A batch left behind by a failed flush is returned again instead,
+# with its original id (new heartbeats keep accumulating).
+_TAKE_SCRIPT = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+local batch = redis.call('GET', KEYS[3]) or ARGV[1]
+local result = redis.call('HGETALL', KEYS[2])
+table.insert(result, 1, batch)
+return result
+""")
+
+_RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+_COLUMNS = ('heartbeat_count', 'healthy_count', 'resource_samples',
+            'free_cpu_min', 'free_cpu_sum', 'free_ram_min', 'free_ram_sum')
+_FIELDS = ('count', 'healthy', 'samples', 'cpu_min', 'cpu_sum', 'ram_min', 'ram_sum')
+
+
+def _keys():
+    """accumulating hash, hash being flushed, its batch id, flush lock"""
+    key = settings.REDIS_HEARTBEAT_ROLLUPS_KEY
+    return [key, f"{key}:flushing", f"{key}:flushing_batch", f"{key}:lock"]
+
+
+def record(node_id, free_resources, seen_at, healthy=True):
+    """Count one heartbeat in the current minute's rollup of the node (Redis only, written by flush())."""
+    minute = int(seen_at.timestamp()) // 60 * 60
+    if isinstance(free_resources, dict):
+        cpu, ram = float(free_resources.get('free_cpu', 0) or 0), float(free_resources.get('free_ram', 0) or 0)
+    else:
+        cpu = ram = ''
+    _ACCUMULATE_SCRIPT(keys=_keys()[:1], args=[f"{node_id}|{minute}", int(bool(healthy)), cpu, ram])
+
+
+def flush():
+    """
+    Merge the accumulated per-minute aggregates into HeartbeatRollup rows with one upsert per
+    HEARTBEAT_FLUSH_BATCH_SIZE rows: counts and sums are added, minimums kept, so a minute spread over
+    several flushes ends up in a single row. Returns the number of rollup rows written.
+    Counts are added, so a batch must be merged once: flushes are exclusive (a Redis lock, overlapping
+    calls return 0) and the batch id is recorded in the same transaction as the upsert, so a batch
+    replayed after a crash before its Redis key was deleted is only discarded.
+    """
+    lock_key, token = _keys()[3], uuid.uuid4().hex
+    if not redis_client.set(lock_key, token, nx=True, px=int(settings.HEARTBEAT_ROLLUP_FLUSH_LOCK_SECONDS * 1000)):
+        logger.info("[flush] Another heartbeat rollup flush is running. Skipping.")
+        return 0
+    try:
+        return _flush_batch()
+    finally:
+        _RELEASE_SCRIPT(keys=[lock_key], args=[token])
+
+
+def _flush_batch():
+    taken = _TAKE_SCRIPT(keys=_keys()[:3], args=[uuid.uuid4().hex])
+    if not taken:
+        return 0
+    batch, fields = taken[0].decode(), taken[1:]
+
+    rollups = defaultdict(dict)
+    for name, value in zip(fields[::2], fields[1::2]):
+        node_id, minute, field = name.decode().split('|')
+        rollups[node_id, int(minute)][field] = float(value)
+
+    # Deleted nodes: their pending aggregates are dropped with them
+    existing = {
+        str(node_id) for node_id in
+        Node.objects.filter(id__in={node_id for node_id, _ in rollups}).values_list('id', flat=True)
+    }
+    rows = [
+        (node_id, datetime.fromtimestamp(minute, tz=dt_timezone.utc),
+         *(values.get(field, None if field.endswith('_min') else 0) for field in _FIELDS))
+        for (node_id, minute), values in rollups.items()
+        if node_id in existing
+    ]
+
+    table = HeartbeatRollup._meta.db_table
+    merge = ', '.join(
+        f"{column} = LEAST({table}.{column}, EXCLUDED.{column})" if column.endswith('_min')
+        else f"{column} = {table}.{column} + EXCLUDED.{column}"
+        for column in _COLUMNS
+    )
+    batch_size = settings.HEARTBEAT_FLUSH_BATCH_SIZE
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The row lock also serializes a flush that outlived its Redis lock with the next one
+        flushed, _ = HeartbeatRollupFlush.objects.select_for_update().get_or_create(pk=1)
+        if flushed.batch == batch:
+            logger.warning(f"[flush] Heartbeat rollup batch {batch} was already merged. Discarding it.")
+            rows = []
+        else:
+            flushed.batch = batch
+            flushed.save(update_fields=['batch'])
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * (2 + len(_COLUMNS))) + ')'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} (node_id, minute, {', '.join(_COLUMNS)}) VALUES {placeholders} "
+                f"ON CONFLICT (node_id, minute) DO UPDATE SET {merge}",
+                [value for row in batch for value in row],
+            )
+    redis_client.delete(*_keys()[1:3])
+    logger.info(f"[flush] Wrote {len(rows)} heartbeat rollup row(s).")
+    return len(rows)
+
+
+def _delete_in_chunks(queryset, batch_size):
+    """Delete the rows of `queryset` in primary key chunks, each in its own short transaction."""
+    deleted = 0
+    while True:
+        chunk = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not chunk:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=chunk).delete()[0]
+
+
+def purge(now=None):
+    """
+    Delete heartbeat history older than HEARTBEAT_HISTORY_RETENTION_DAYS (rollups and remaining
+    legacy raw Heartbeat rows) in chunks of HEARTBEAT_PURGE_BATCH_SIZE, so no single DELETE holds
+    locks or bloats the WAL for long. Returns the number of rows deleted.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=settings.HEARTBEAT_HISTORY_RETENTION_DAYS)
+    batch_size = settings.HEARTBEAT_PURGE_BATCH_SIZE
+    deleted = _delete_in_chunks(HeartbeatRollup.objects.filter(minute__lt=cutoff), batch_size)
+    deleted += _delete_in_chunks(Heartbeat.objects.filter(timestamp__lt=cutoff), batch_size)
+    logger.info(f"[purge] Deleted {deleted} heartbeat history row(s) older than {cutoff}.")
+    return deleted
@@ -0,0 +1,227 @@
+import json
+import logging
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone as django_timezone
+
+from hub import activity_counters
+from hub.models import Node
+from hub.redis_publisher import redis_client, publish_network_activity
+
+logger = logging.getLogger(__name__)
+
+# Statuses whose liveness is tracked; heartbeats of these nodes take the Redis-only path
+LIVE_STATUSES = ('active', 'busy')
+
+# Record a heartbeat of a node whose status is cached as active or busy. Returns {status, previous free_resources},
+# or nil when the node has no complete cache entry and the heartbeat must take the database path.
+_RECORD_HEARTBEAT_SCRIPT = redis_client.register_script("""
+local status = redis.call('HGET', KEYS[1], ARGV[1])
+if status ~= 'active' and status ~= 'busy' then
+    return nil
+end
+local previous = redis.call('HGET', KEYS[3], ARGV[1])
+if not previous then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+if ARGV[3] ~= '' then
+    redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+end
+redis.call('SADD', KEYS[4], ARGV[1])
+return {status, previous}
+""")
+
+
+# Stop tracking the nodes in ARGV[2..] whose last heartbeat is still older than ARGV[1] (a timestamp), so a
+# heartbeat recorded meanwhile keeps its node tracked. Returns the number of nodes removed.
+_UNTRACK_SCRIPT = redis_client.register_script("""
+local removed = 0
+for i = 2, #ARGV do
+    local seen = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if seen and tonumber(seen) < tonumber(ARGV[1]) then
+        removed = removed + redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+return removed
+""")
+
+
+def _keys():
+    """status hash, last_seen sorted set (scored by heartbeat timestamp), free_resources hash, dirty set"""
+    prefix = settings.REDIS_HEARTBEATS_PREFIX
+    return [f"{prefix}:status", f"{prefix}:last_seen", f"{prefix}:free_resources", f"{prefix}:dirty"]
+
+
+def record(node_id, free_resources, seen_at):
+    """
+    Record a heartbeat in Redis only; the node row is written later by flush().
+    Returns (status, previous free_resources) or None if the node is not cached as active or busy
+    (unknown, new or inactive), in which case the caller must update the database and call remember().
+    """
+    result = _RECORD_HEARTBEAT_SCRIPT(
+        keys=_keys(),
+        args=[str(node_id), seen_at.timestamp(), json.dumps(free_resources) if isinstance(free_resources, dict) else ''],
+    )
+    if result is None:
+        return None
+    status, previous = result
+    return status.decode(), json.loads(previous)
+
+
+def remember(node):
+    """Cache a node's status, last heartbeat and free resources after they were saved to the database."""
+    status_key, last_seen_key, free_key, _ = _keys()
+    node_id = str(node.id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(status_key, node_id, node.status)
+    pipe.zadd(last_seen_key, {node_id: node.last_heartbeat.timestamp()})
+    pipe.hset(free_key, node_id, json.dumps(node.free_resources or {}))
+    pipe.execute()
+
+
+def evict(node_ids, forget=False):
+    """
+    Drop the cached status of nodes whose status changed in the database, so their next heartbeat
+    takes the database path. With `forget`, drop everything cached for them (deleted nodes).
+    """
+    node_ids = [str(node_id) for node_id in node_ids]
+    if not node_ids:
+        return
+    status_key, last_seen_key, free_key, dirty_key = _keys()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hdel(status_key, *node_ids)
+    if forget:
+        pipe.zrem(last_seen_key, *node_ids)
+        pipe.hdel(free_key, *node_ids)
+        pipe.srem(dirty_key, *node_ids)
+    pipe.execute()
+
+
+def last_seen(node_ids):
+    """Latest heartbeat time recorded in Redis per node id (nodes without one are omitted)."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return {}
+    values = redis_client.zmscore(_keys()[1], [str(node_id) for node_id in node_ids])
+    return {
+        node_id: datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        for node_id, value in zip(node_ids, values)
+        if value is not None
+    }
+
+
+def expired(threshold):
+    """
+    Ids of tracked nodes whose last heartbeat is older than `threshold`: one range read of the
+    last_seen sorted set, so the cost grows with the number of nodes that went silent, not with the
+    node table. If the set is missing (Redis was flushed) it is first seeded from the database.
+    """
+    last_seen_key = _keys()[1]
+    if not redis_client.exists(last_seen_key):
+        seed = dict(Node.objects.filter(status__in=LIVE_STATUSES).values_list('id', 'last_heartbeat'))
+        if seed:
+            # GT keeps a newer heartbeat recorded concurrently
+            redis_client.zadd(last_seen_key, {str(node_id): seen.timestamp() for node_id, seen in seed.items()}, gt=True)
+    return [uuid.UUID(node_id.decode()) for node_id in redis_client.zrangebyscore(last_seen_key, '-inf', f"({threshold.timestamp()}")]
+
+
+def track(nodes):
+    """
+    Watch the liveness of live nodes from their saved last_heartbeat: nodes made or kept live outside the
+    heartbeat endpoint (experiments, admin, keep-alives) must be swept by expired() too.
+    GT keeps a newer heartbeat already recorded in Redis.
+    """
+    scores = {
+        str(node.id): node.last_heartbeat.timestamp()
+        for node in nodes
+        if node.status in LIVE_STATUSES and node.last_heartbeat
+    }
+    if scores:
+        redis_client.zadd(_keys()[1], scores, gt=True)
+
+
+def untrack(node_ids, before):
+    """
+    Stop watching the liveness of nodes marked inactive, unless they heartbeated since `before`;
+    their next heartbeat tracks them again via remember().
+    """
+    node_ids = [str(node_id) for node_id in node_ids]
+    if node_ids:
+        _UNTRACK_SCRIPT(keys=[_keys()[1]], args=[before.timestamp(), *node_ids])
+
+
+def apply_live_state(nodes):
+    """
+    Overlay the latest heartbeat time and free resources from Redis on loaded nodes (in memory only),
+    so scheduling decisions do not wait for the next flush. Returns the nodes.
+    """
+    if not nodes:
+        return nodes
+    _, last_seen_key, free_key, _ = _keys()
+    node_ids = [str(node.id) for node in nodes]
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zmscore(last_seen_key, node_ids)
+    pipe.hmget(free_key, node_ids)
+    seen_values, free_values = pipe.execute()
+    for node, seen, free in zip(nodes, seen_values, free_values):
+        if seen is None:
+            continue
+        seen_at = datetime.fromtimestamp(float(seen), tz=dt_timezone.utc)
+        if node.last_heartbeat is None or seen_at > node.last_heartbeat:
+            node.last_heartbeat = seen_at
+            if free is not None:
+                node.free_resources = json.loads(free)
+    return nodes
+
+
+def flush():
+    """
+    Persist the heartbeats recorded since the last flush with batched bulk_updates
+    (HEARTBEAT_FLUSH_BATCH_SIZE rows per UPDATE). bulk_update bypasses the save signals, so the activity
+    counters of nodes whose free resources changed are updated here and one network activity frame is requested.
+    Returns the number of nodes written.
+    """
+    _, last_seen_key, free_key, dirty_key = _keys()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.smembers(dirty_key)
+    pipe.delete(dirty_key)
+    dirty_ids = [node_id.decode() for node_id in pipe.execute()[0]]
+    if not dirty_ids:
+        return 0
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zmscore(last_seen_key, dirty_ids)
+        pipe.hmget(free_key, dirty_ids)
+        seen_values, free_values = pipe.execute()
+        state = {
+            node_id: (datetime.fromtimestamp(float(seen), tz=dt_timezone.utc), json.loads(free) if free else None)
+            for node_id, seen, free in zip(dirty_ids, seen_values, free_values)
+            if seen is not None
+        }
+
+        nodes = list(Node.objects.filter(id__in=list(state)).only('id', 'status', 'trust_index', 'free_resources', 'last_heartbeat', 'updated_at'))
+        resources_changed = []
+        now = django_timezone.now()
+        for node in nodes:
+            seen_at, free_resources = state[str(node.id)]
+            node.last_heartbeat = seen_at  # bulk_update does not apply auto_now
+            node.updated_at = now
+            if free_resources is not None and free_resources != node.free_resources:
+                node.free_resources = free_resources
+                resources_changed.append(node)
+        Node.objects.bulk_update(
+            nodes, ['last_heartbeat', 'free_resources', 'updated_at'], batch_size=settings.HEARTBEAT_FLUSH_BATCH_SIZE
+        )
+    except Exception:
+        redis_client.sadd(dirty_key, *dirty_ids)  # retried by the next flush
+        raise
+
+    if resources_changed:
+        activity_counters.record_nodes(resources_changed)
+        publish_network_activity()
+    logger.info(f"[flush] Persisted heartbeats of {len(nodes)} node(s).")
+    return len(nodes)
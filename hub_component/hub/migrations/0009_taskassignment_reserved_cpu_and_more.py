@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0008_remove_taskassignment_validated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskassignment',
+            name='reserved_cpu',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='reserved_ram',
+            field=models.FloatField(default=0),
+        ),
+    ]
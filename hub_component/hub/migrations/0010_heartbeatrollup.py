@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0009_taskassignment_reserved_cpu_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeartbeatRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('minute', models.DateTimeField()),
+                ('heartbeat_count', models.PositiveIntegerField(default=0)),
+                ('healthy_count', models.PositiveIntegerField(default=0)),
+                ('resource_samples', models.PositiveIntegerField(default=0)),
+                ('free_cpu_min', models.FloatField(blank=True, null=True)),
+                ('free_cpu_sum', models.FloatField(default=0)),
+                ('free_ram_min', models.FloatField(blank=True, null=True)),
+                ('free_ram_sum', models.FloatField(default=0)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hub.node')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['minute'], name='hub_heartbe_minute_4cb407_idx')],
+                'unique_together': {('node', 'minute')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:05
+
+from django.db import migrations, models
+
+
+def backfill_inactive_since(apps, schema_editor):
+    """Inactive nodes went inactive some time after their last heartbeat."""
+    Node = apps.get_model('hub', 'Node')
+    Node.objects.filter(status='inactive').update(inactive_since=models.F('last_heartbeat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0010_heartbeatrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='inactive_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_inactive_since, migrations.RunPython.noop),
+    ]
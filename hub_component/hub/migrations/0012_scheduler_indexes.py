@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:09
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built with CREATE INDEX CONCURRENTLY so the hot tables stay writable while the indexes build
+    atomic = False
+
+    dependencies = [
+        ('hub', '0011_node_inactive_since'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='node',
+            index=models.Index(fields=['status', 'trust_index'], name='node_status_trust_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='node',
+            index=models.Index(fields=['status', 'last_heartbeat'], name='node_status_heartbeat_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='node',
+            index=models.Index(condition=models.Q(('status', 'inactive')), fields=['inactive_since'], name='node_inactive_since_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['status', 'created_at'], name='task_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['status', 'stale_count'], name='task_status_stale_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['submitted_by', 'updated_at'], name='task_submitter_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskassignment',
+            index=models.Index(condition=models.Q(('completed_at__isnull', True)), fields=['node', 'assigned_at'], name='assignment_open_node_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:12
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built with CREATE INDEX CONCURRENTLY so the hot tables stay writable while the indexes build
+    atomic = False
+
+    dependencies = [
+        ('hub', '0012_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        AddIndexConcurrently(
+            model_name='node',
+            index=models.Index(fields=['created_at', 'id'], name='node_created_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['submitted_by', 'created_at', 'id'], name='task_submitter_created_idx'),
+        ),
+    ]
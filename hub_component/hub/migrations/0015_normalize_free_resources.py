@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-17 07:40
+
+from django.db import migrations
+
+LEGACY_KEYS = {'cpu': 'free_cpu', 'ram': 'free_ram'}
+
+
+def rename_legacy_free_resources(apps, schema_editor):
+    """Nodes created with {"cpu", "ram"} free resources get the keys the node agent reports."""
+    Node = apps.get_model('hub', 'Node')
+    nodes = []
+    for node in Node.objects.filter(free_resources__has_any_keys=list(LEGACY_KEYS)).only('id', 'free_resources'):
+        free = node.free_resources
+        node.free_resources = {
+            LEGACY_KEYS.get(key, key): value
+            for key, value in free.items()
+            if key not in LEGACY_KEYS or LEGACY_KEYS[key] not in free
+        }
+        nodes.append(node)
+    Node.objects.bulk_update(nodes, ['free_resources'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0014_node_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_legacy_free_resources, migrations.RunPython.noop),
+    ]
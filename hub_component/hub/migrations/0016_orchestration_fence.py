@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-17 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0015_normalize_free_resources'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrchestrationFence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-17 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hub', '0016_orchestration_fence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeartbeatRollupFlush',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.CharField(blank=True, default='', max_length=32)),
+            ],
+        ),
+    ]
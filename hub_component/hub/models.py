@@ -1,10 +1,69 @@
 from django.db import models
+from django.db.models import Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
 
 
-class Node(models.Model):
+class StatusTrackingMixin:
+    """
+    Remember the `status` loaded from the database so save signals can detect real status
+    changes in memory instead of re-reading the row before every save.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status', models.DEFERRED)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.status
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'status' in update_fields:
+            self._loaded_status = self.status
+
+    def persisted_status(self, update_fields=None):
+        """
+        Status currently stored for this row, as last loaded or saved by this instance (None if new).
+        If `update_fields` leaves out status, the save keeps the in-memory value out of the DB,
+        so the current status is reported and no change is detected.
+        """
+        if self._state.adding:
+            return None
+        if update_fields is not None and 'status' not in update_fields:
+            return self.status
+        loaded = getattr(self, '_loaded_status', models.DEFERRED)
+        if loaded is models.DEFERRED:
+            # Loaded without the status column (e.g. .only()): fall back to reading it
+            loaded = type(self).objects.filter(pk=self.pk).values_list('status', flat=True).first()
+        return loaded
+
+
+# Node.free_resources keys as reported by the node agent, by the older capacity-style key clients may still send
+FREE_RESOURCE_KEYS = {'cpu': 'free_cpu', 'ram': 'free_ram'}
+
+
+def normalize_free_resources(free_resources):
+    """
+    Free resources in the shape the node agent reports ({"free_cpu", "free_ram"}): legacy "cpu"/"ram"
+    keys are renamed, unless the reported key is also present. Anything but a dict is returned as is.
+    """
+    if not isinstance(free_resources, dict):
+        return free_resources
+    return {
+        FREE_RESOURCE_KEYS.get(key, key): value
+        for key, value in free_resources.items()
+        if key not in FREE_RESOURCE_KEYS or FREE_RESOURCE_KEYS[key] not in free_resources
+    }
+
+
+class Node(StatusTrackingMixin, models.Model):
     """
     Represents a connected peer in the network. Nodes periodically
     report their resource usage so the hub can make informed scheduling decisions.
@@ -39,32 +98,68 @@ class Node(models.Model):
         # }
     )
 
-    # Current usage (dynamic) - Node reports usage periodically
+    # Current usage (dynamic) - Node reports usage periodically (see normalize_free_resources)
     free_resources = models.JSONField(
         default=dict
         # Example: {
-        #   "cpu": 2,
-        #   "ram": 8
+        #   "free_cpu": 2,
+        #   "free_ram": 8
         # }
     )
 
     last_heartbeat = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Row version for conditional GETs (ETag); bulk updates must set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the node last went inactive; None while it is active or busy
+    inactive_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of list_nodes
+            models.Index(fields=['created_at', 'id'], name='node_created_id_idx'),
+            # Candidate nodes of the scheduler: status='active' AND trust_index >= required
+            models.Index(fields=['status', 'trust_index'], name='node_status_trust_idx'),
+            # Live nodes by heartbeat age (liveness seed, FIFO assignment order)
+            models.Index(fields=['status', 'last_heartbeat'], name='node_status_heartbeat_idx'),
+            # Inactive nodes past the reclaim grace period (partial: only inactive nodes have inactive_since)
+            models.Index(
+                fields=['inactive_since'],
+                condition=models.Q(status='inactive'),
+                name='node_inactive_since_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.ip_address})"
 
-    def is_available_for_task(self, task_requirements: dict) -> bool:
+    def save(self, *args, **kwargs):
+        self.free_resources = normalize_free_resources(self.free_resources)
+        super().save(*args, **kwargs)
+
+    def available_resources(self, reserved: dict = None) -> dict:
         """
-        Check if this Node has enough free resources for `task_requirements`.
+        Resources the scheduler may still hand out: reported free resources minus
+        what open TaskAssignments have reserved on this Node.
         """
+        if reserved is None:
+            reserved = TaskAssignment.reserved_resources([self.id]).get(self.id, {})
         free = self.free_resources or {}
-        free_cpu = free.get("cpu", 0)
-        free_ram = free.get("ram", 0)
+        return {
+            "cpu": free.get("free_cpu", 0) - reserved.get("cpu", 0),
+            "ram": free.get("free_ram", 0) - reserved.get("ram", 0),
+        }
+
+    def is_available_for_task(self, task_requirements: dict, reserved: dict = None) -> bool:
+        """
+        Check if this Node has enough unreserved free resources for `task_requirements`.
+        """
+        available = self.available_resources(reserved)
 
         needed_cpu = task_requirements.get("cpu", 1)
         needed_ram = task_requirements.get("ram", 1)
 
-        return (free_cpu >= needed_cpu) and (free_ram >= needed_ram)
+        return (available["cpu"] >= needed_cpu) and (available["ram"] >= needed_ram)
 
     def mark_inactive_if_stale(self, threshold_seconds=60):
         """
@@ -74,10 +169,11 @@ class Node(models.Model):
         if time_since_heartbeat > threshold_seconds:
             if self.status != 'inactive':
                 self.status = 'inactive'
+                self.inactive_since = timezone.now()
                 self.save()
 
 
-class Task(models.Model):
+class Task(StatusTrackingMixin, models.Model):
     """
     A task to be executed by one or more Nodes. Contains a container spec
     for Docker-based execution and resource requirements so we can
@@ -141,6 +237,19 @@ class Task(models.Model):
     stale_count = models.PositiveIntegerField(default=0)
     last_attempted = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of list_tasks, unfiltered and by submitter
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+            models.Index(fields=['submitted_by', 'created_at', 'id'], name='task_submitter_created_idx'),
+            # Active queue, FIFO backlog and list_tasks?status=: status IN (...) ORDER BY created_at
+            models.Index(fields=['status', 'created_at'], name='task_status_created_idx'),
+            # Stale and failed task sweeps: status = ... AND stale_count >= / < MAX_STALE_COUNT
+            models.Index(fields=['status', 'stale_count'], name='task_status_stale_idx'),
+            # Incremental sync of a node's submitted tasks: submitted_by = ... AND updated_at >= since
+            models.Index(fields=['submitted_by', 'updated_at'], name='task_submitter_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Task {self.id}: {self.status}"
 
@@ -149,7 +258,7 @@ class Task(models.Model):
         Increment the stale counter when a task can't be assigned or fails repeatedly.
         """
         self.stale_count = models.F('stale_count') + 1
-        self.save(update_fields=['stale_count'])
+        self.save(update_fields=['stale_count', 'updated_at'])
         self.refresh_from_db()
 
     def reset_stale(self):
@@ -157,7 +266,7 @@ class Task(models.Model):
         Reset the stale count if/when the task is successfully assigned.
         """
         self.stale_count = 0
-        self.save(update_fields=['stale_count'])
+        self.save(update_fields=['stale_count', 'updated_at'])
 
     def get_assigned_nodes(self):
         """
@@ -177,6 +286,7 @@ class TaskAssignment(models.Model):
     - Timestamps for assignment and completion
     - The node's result
     - Whether that result was validated/accepted
+    - The resources reserved on the node while the assignment is open (reservation ledger)
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -189,8 +299,46 @@ class TaskAssignment(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # Reservation ledger: held on the node until the result is submitted (completed_at set)
+    # or the assignment is removed.
+    reserved_cpu = models.FloatField(default=0)
+    reserved_ram = models.FloatField(default=0)
+
     class Meta:
         unique_together = ('node', 'task')
+        indexes = [
+            # Open assignments of a node, oldest first (fetch_task, long-poll wakeups, reservation sums).
+            # Partial: completed assignments, the bulk of the table, are left out.
+            models.Index(
+                fields=['node', 'assigned_at'],
+                condition=models.Q(completed_at__isnull=True),
+                name='assignment_open_node_idx',
+            ),
+        ]
+
+    @classmethod
+    def reserving(cls, task, node):
+        """
+        Build (unsaved) assignment of `task` to `node` that reserves the task's resource requirements.
+        """
+        requirements = task.resource_requirements or {}
+        return cls(
+            task=task,
+            node=node,
+            reserved_cpu=requirements.get('cpu', 1),
+            reserved_ram=requirements.get('ram', 1),
+        )
+
+    @staticmethod
+    def reserved_resources(node_ids) -> dict:
+        """
+        Sum open reservations per node in one query: {node_id: {"cpu": ..., "ram": ...}}.
+        """
+        rows = TaskAssignment.objects.filter(
+            node_id__in=node_ids,
+            completed_at__isnull=True
+        ).values('node_id').annotate(cpu=Sum('reserved_cpu'), ram=Sum('reserved_ram'))
+        return {row['node_id']: {"cpu": row['cpu'] or 0, "ram": row['ram'] or 0} for row in rows}
 
     @property
     def validated(self):
@@ -204,6 +352,8 @@ class Heartbeat(models.Model):
     """
     Track health pings from Nodes. The Node can send
     additional info about resource usage or status in the future.
+    Legacy raw rows: heartbeats are no longer stored one row per ping (see HeartbeatRollup),
+    remaining rows are deleted by the heartbeat history retention.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -229,8 +379,74 @@ class Heartbeat(models.Model):
         """
         if self.status == 'healthy' and self.node.status != 'active':
             self.node.status = 'active'
+            self.node.inactive_since = None
             self.node.save()
         elif self.status == 'unhealthy':
             if self.node.status != 'inactive':
                 self.node.status = 'inactive'
+                self.node.inactive_since = timezone.now()
                 self.node.save()
+
+
+class OrchestrationFence(models.Model):
+    """
+    Newest orchestration fencing token (see hub.orchestration_lease) that wrote assignments: a single row,
+    locked by each assignment step inside its transaction, so a pass that overran its lease is rejected
+    by the database rather than by a Redis check that can go stale before the commit.
+    """
+    token = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Orchestration fence at token {self.token}"
+
+
+class HeartbeatRollupFlush(models.Model):
+    """
+    Id of the last batch of heartbeat aggregates merged into HeartbeatRollup (a single row, see
+    hub.heartbeat_history.flush): written with the merge, so a batch replayed from Redis is not counted twice.
+    """
+    batch = models.CharField(max_length=32, blank=True, default='')
+
+    def __str__(self):
+        return f"Heartbeat rollups merged up to batch {self.batch}"
+
+
+class HeartbeatRollup(models.Model):
+    """
+    Heartbeat history of a Node aggregated per minute: one row per node and minute instead of one per ping.
+    Written by hub.heartbeat_history from heartbeats accumulated in Redis and purged after
+    HEARTBEAT_HISTORY_RETENTION_DAYS. Sums are stored rather than averages so partial minutes merge exactly.
+    """
+    id = models.BigAutoField(primary_key=True)  # ~1440 rows per node and day
+
+    node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    minute = models.DateTimeField()  # start of the minute
+
+    heartbeat_count = models.PositiveIntegerField(default=0)
+    healthy_count = models.PositiveIntegerField(default=0)
+
+    # Heartbeats that reported free resources, and their aggregates
+    resource_samples = models.PositiveIntegerField(default=0)
+    free_cpu_min = models.FloatField(null=True, blank=True)
+    free_cpu_sum = models.FloatField(default=0)
+    free_ram_min = models.FloatField(null=True, blank=True)
+    free_ram_sum = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('node', 'minute')
+        indexes = [models.Index(fields=['minute'])]  # retention purge
+
+    @property
+    def free_cpu_avg(self):
+        return self.free_cpu_sum / self.resource_samples if self.resource_samples else None
+
+    @property
+    def free_ram_avg(self):
+        return self.free_ram_sum / self.resource_samples if self.resource_samples else None
+
+    @property
+    def healthy_ratio(self):
+        return self.healthy_count / self.heartbeat_count if self.heartbeat_count else None
+
+    def __str__(self):
+        return f"Heartbeats of {self.node_id} at {self.minute}: {self.heartbeat_count}"
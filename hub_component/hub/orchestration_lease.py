@@ -0,0 +1,79 @@
+from django.conf import settings
+
+from hub.models import OrchestrationFence
+from hub.redis_publisher import redis_client
+
+# Compare-and-set helpers: only the holder of the current fencing token may extend or drop the lease
+_RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+_RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def _lease_ms():
+    return int(getattr(settings, "ORCHESTRATION_LEASE_SECONDS", 300) * 1000)
+
+
+def acquire_lease():
+    """
+    Try to become the single cluster-wide orchestration pass.
+    Returns a fencing token (monotonically increasing int) on success, None if another pass holds the lease.
+    The lease expires after ORCHESTRATION_LEASE_SECONDS so a crashed worker cannot block orchestration.
+    """
+    token = redis_client.incr(settings.REDIS_ORCHESTRATION_FENCING_KEY)
+    if redis_client.set(settings.REDIS_ORCHESTRATION_LEASE_KEY, token, nx=True, px=_lease_ms()):
+        return token
+    return None
+
+
+def holds_lease(token) -> bool:
+    """Whether `token` is still the current lease holder (no newer pass took over)."""
+    current = redis_client.get(settings.REDIS_ORCHESTRATION_LEASE_KEY)
+    return current is not None and int(current) == int(token)
+
+
+def renew_lease(token) -> bool:
+    """Extend the lease if `token` still holds it. Returns False if the lease was lost."""
+    return bool(_RENEW_SCRIPT(keys=[settings.REDIS_ORCHESTRATION_LEASE_KEY], args=[token, _lease_ms()]))
+
+
+def release_lease(token) -> bool:
+    """Drop the lease if `token` still holds it."""
+    return bool(_RELEASE_SCRIPT(keys=[settings.REDIS_ORCHESTRATION_LEASE_KEY], args=[token]))
+
+
+def enter_fence(token) -> bool:
+    """
+    Admit `token` to write in the current transaction: lock the fence row and record `token` unless a newer
+    pass already wrote. Writers are serialized on the row lock until they commit, and an overrun pass that
+    gets the lock after its successor is refused, however late its lease was lost.
+    Returns False if `token` is stale.
+    """
+    fence, _ = OrchestrationFence.objects.select_for_update().get_or_create(pk=1)
+    if fence.token > int(token):
+        if holds_lease(token):
+            # The lease is ours but the counter is behind the fence (Redis was flushed): move it past the fence
+            redis_client.set(settings.REDIS_ORCHESTRATION_FENCING_KEY, fence.token)
+        return False
+    fence.token = int(token)
+    fence.save(update_fields=['token'])
+    return True
+
+
+def request_rerun():
+    """Record that a pass was requested while another was running. Any number of requests collapse into one."""
+    redis_client.set(settings.REDIS_ORCHESTRATION_RERUN_KEY, 1, px=_lease_ms())
+
+
+def pop_rerun() -> bool:
+    """Consume the queued follow-up request, if any."""
+    return redis_client.getdel(settings.REDIS_ORCHESTRATION_RERUN_KEY) is not None
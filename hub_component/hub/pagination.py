@@ -0,0 +1,103 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import ManyToManyField, Prefetch, Q
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidPageRequest(ValueError):
+    """Raised for a malformed `cursor`, `limit` or `fields` query parameter."""
+
+
+def encode_cursor(created_at, pk):
+    """Opaque cursor for the position right after the row (created_at, pk)."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, pk) from a cursor built by encode_cursor()."""
+    try:
+        created_at, _, pk = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidPageRequest("cursor is invalid.")
+
+
+def _page_size(request):
+    limit = request.query_params.get("limit")
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise InvalidPageRequest("limit must be a positive integer.")
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def _sparse_fields(request, serializer_class):
+    """Field names requested with `fields=a,b,c`, or None for all of them."""
+    fields = request.query_params.get("fields")
+    if not fields:
+        return None
+    fields = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = set(fields) - set(serializer_class().fields)
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    return fields
+
+
+def _restrict_columns(queryset, fields):
+    """
+    Load only the columns the rendered fields need (plus the cursor columns), and the many-to-many
+    fields that are rendered with one prefetch query each instead of one query per row.
+    """
+    model = queryset.model
+    columns, prefetch = {"id", "created_at"}, []
+    for field in model._meta.get_fields():
+        if fields is not None and field.name not in fields:
+            continue
+        if isinstance(field, ManyToManyField):
+            # Rendered as primary keys: the related rows are not needed
+            prefetch.append(Prefetch(field.name, queryset=field.related_model.objects.only("pk")))
+        elif field.concrete:
+            columns.add(field.name)
+    if fields is not None:
+        queryset = queryset.only(*columns)
+    return queryset.prefetch_related(*prefetch)
+
+
+def paginated_response(request, queryset, serializer_class):
+    """
+    One page of `queryset` in (created_at, id) order, rendered as {"next": url or None, "results": [...]}.
+    Pages are keyset-paginated: `cursor` (from the previous page's `next`) resumes right after the last row
+    returned, so each page is an index range scan and costs the same at any depth. `limit` sets the page size
+    (API_PAGE_SIZE by default, at most API_MAX_PAGE_SIZE) and `fields=a,b` renders only those fields.
+    """
+    try:
+        page_size = _page_size(request)
+        fields = _sparse_fields(request, serializer_class)
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    except InvalidPageRequest as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = list(_restrict_columns(queryset, fields).order_by("created_at", "id")[:page_size + 1])
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = replace_query_param(
+            request.build_absolute_uri(), "cursor", encode_cursor(rows[-1].created_at, rows[-1].id)
+        )
+    return Response({
+        "next": next_url,
+        "results": serializer_class(rows, many=True, fields=fields).data,
+    }, status=status.HTTP_200_OK)
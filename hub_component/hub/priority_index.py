@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.utils import timezone
+
+from hub.models import Task
+from hub.redis_publisher import redis_client
+from licenta.settings import STALE_PENALTY_MULTIPLIER
+
+# Task statuses kept in the index (the backlog and the unassigned part of the active queue)
+INDEXED_STATUSES = ('pending', 'in_queue')
+
+
+def resource_weight(resource_requirements: dict) -> float:
+    """Resource weight of the priority heuristic. If no requirements are given, use 0.5 for each."""
+    return resource_requirements.get("cpu", 0.5) + resource_requirements.get("ram", 0.5) / 2
+
+
+def static_score(task) -> float:
+    """
+    Time-independent part of TaskManager.calculate_task_priority for non in_progress tasks:
+        priority(now) = now / weight - (created_at / weight + stale_count * STALE_PENALTY_MULTIPLIER)
+    Within one resource-weight bucket every task ages at the same rate (1 / weight), so ordering by
+    this score (ascending = higher priority) never changes with time and entries never need rescoring.
+    """
+    weight = resource_weight(task.resource_requirements or {})
+    return task.created_at.timestamp() / weight + task.stale_count * STALE_PENALTY_MULTIPLIER
+
+
+def _prefix():
+    return getattr(settings, "REDIS_PRIORITY_INDEX_PREFIX", "priority")
+
+
+def _buckets_key(status):
+    return f"{_prefix()}:{status}:buckets"
+
+
+def _bucket_key(status, weight):
+    return f"{_prefix()}:{status}:{weight!r}"
+
+
+def sync_tasks(tasks):
+    """
+    Move each task to the bucket matching its current status and score (or drop it if the
+    status is not indexed). All updates are sent in a single pipeline.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for task in tasks:
+        weight = float(resource_weight(task.resource_requirements or {}))
+        member = str(task.id)
+        for status in INDEXED_STATUSES:
+            pipe.zrem(_bucket_key(status, weight), member)
+        if task.status in INDEXED_STATUSES:
+            pipe.sadd(_buckets_key(task.status), repr(weight))
+            pipe.zadd(_bucket_key(task.status, weight), {member: static_score(task)})
+    pipe.execute()
+
+
+def sync_task(task):
+    """Update the index entry of a single task after a status or stale_count change."""
+    sync_tasks([task])
+
+
+def _bucket_weights():
+    pipe = redis_client.pipeline(transaction=False)
+    for status in INDEXED_STATUSES:
+        pipe.smembers(_buckets_key(status))
+    return {
+        status: sorted(float(weight) for weight in weights)
+        for status, weights in zip(INDEXED_STATUSES, pipe.execute())
+    }
+
+
+def discard(task_ids):
+    """Remove tasks from every bucket, e.g. after deletion or when the index drifted from the DB."""
+    task_ids = [str(task_id) for task_id in task_ids]
+    if not task_ids:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for status, weights in _bucket_weights().items():
+        for weight in weights:
+            pipe.zrem(_bucket_key(status, weight), *task_ids)
+    pipe.execute()
+
+
+def _ranked(status, start, stop, now=None):
+    """Read the [start, stop] slice of every bucket and return (task_id, priority) pairs."""
+    now_ts = (now or timezone.now()).timestamp()
+    weights = sorted(float(weight) for weight in redis_client.smembers(_buckets_key(status)))
+    if not weights:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for weight in weights:
+        pipe.zrange(_bucket_key(status, weight), start, stop, withscores=True)
+
+    ranked = []
+    for weight, entries in zip(weights, pipe.execute()):
+        for member, score in entries:
+            ranked.append((member.decode() if isinstance(member, bytes) else member, now_ts / weight - score))
+    return ranked
+
+
+def top_task_ids(status, count, now=None):
+    """
+    Return up to `count` task IDs with the highest priority for `status`, highest first.
+    Costs O(buckets * (log n + count)) instead of sorting the whole backlog.
+    """
+    if count <= 0:
+        return []
+    ranked = _ranked(status, 0, count - 1, now)
+    ranked.sort(key=lambda entry: entry[1], reverse=True)
+    return [task_id for task_id, _ in ranked[:count]]
+
+
+def lowest_task_id(status, now=None):
+    """Return the task ID with the lowest priority for `status`, or None if the index is empty."""
+    ranked = _ranked(status, -1, -1, now)
+    if not ranked:
+        return None
+    return min(ranked, key=lambda entry: entry[1])[0]
+
+
+def clear():
+    """Delete every key of the priority index."""
+    keys = list(redis_client.scan_iter(match=f"{_prefix()}:*"))
+    if keys:
+        redis_client.delete(*keys)
+
+
+def rebuild():
+    """
+    Reconcile the index with the database: drop all entries and re-add every indexed task.
+    Returns the number of indexed tasks.
+    """
+    clear()
+    tasks = Task.objects.filter(status__in=INDEXED_STATUSES).only(
+        'id', 'status', 'created_at', 'resource_requirements', 'stale_count'
+    )
+    batch = []
+    count = 0
+    for task in tasks.iterator(chunk_size=2000):
+        batch.append(task)
+        if len(batch) >= 2000:
+            sync_tasks(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        sync_tasks(batch)
+        count += len(batch)
+    return count
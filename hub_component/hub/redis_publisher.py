@@ -1,62 +1,181 @@
 import redis
 import json
 from django.conf import settings
-from django.db.models import Avg
 from django.utils import timezone
 
-from hub.models import Node, Task
-
 redis_client = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL)
 
+# Append the event to the channel's capped replay stream, then publish "<stream id> <message>" for live fan-out.
+# One script keeps replay order and live order identical.
+_PUBLISH_EVENT_SCRIPT = redis_client.register_script("""
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', ARGV[3], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', ARGV[1], id .. ' ' .. ARGV[2])
+return id
+""")
+
+# Compare-and-advance of the network activity frame: store the new last frame and publish it (as above) only if
+# the stored last frame is still ARGV[1], the one the frame was computed against ('' for none). Returns the event
+# ID, or nil if another frame got in first. Frames are published in seq order and no seq is published twice.
+_PUBLISH_FRAME_SCRIPT = redis_client.register_script("""
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return nil
+end
+redis.call('SET', KEYS[1], ARGV[2])
+local id = redis.call('XADD', KEYS[2], 'MAXLEN', ARGV[5], '*', 'data', ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+redis.call('PUBLISH', ARGV[3], id .. ' ' .. ARGV[4])
+return id
+""")
+
+# Attempts of publish_network_activity_frame against concurrently published frames before giving up
+_FRAME_PUBLISH_ATTEMPTS = 5
+
+def event_stream_key(channel):
+    """Redis Stream retaining the recent events of an SSE channel for Last-Event-ID replay."""
+    return f"{settings.REDIS_SSE_STREAM_PREFIX}:{channel}"
+
+def publish_event(channel, message):
+    """
+    Publish an SSE event (JSON string) on `channel` and retain it for replay.
+    Returns the event ID, which is monotonically increasing per channel.
+    """
+    event_id = _PUBLISH_EVENT_SCRIPT(
+        keys=[event_stream_key(channel)],
+        args=[channel, message, settings.SSE_REPLAY_MAX_EVENTS, settings.SSE_REPLAY_RETENTION_SECONDS],
+    )
+    return event_id.decode("utf-8")
+
 def get_network_activity_data():
     """
     Collect and return network activity data as a dictionary.
+    Read from the incrementally maintained Redis counters (one round trip).
     """
-    active_nodes = Node.objects.filter(status='active')
-    active_nodes_count = active_nodes.count()
-    total_cpu = sum(node.free_resources.get('free_cpu', 0) for node in active_nodes)
-    total_ram = sum(node.free_resources.get('free_ram', 0) for node in active_nodes)
-    average_trust_index = active_nodes.aggregate(Avg('trust_index'))['trust_index__avg'] or 0
+    from hub import activity_counters  # imports redis_client from this module
+    return activity_counters.snapshot()
+
+def task_updates_channel(node_id):
+    """Per-node task update channel, so a client only receives the events of the node it follows."""
+    return f"{settings.REDIS_TASK_UPDATES_CHANNEL}:{node_id}"
 
+def assignments_channel(node_id):
+    """Per-node channel announcing new assignments to long-polling tasks/fetch requests."""
+    return f"{settings.REDIS_ASSIGNMENTS_CHANNEL}:{node_id}"
+
+def notify_new_assignments(node_ids):
+    """Wake the long-polling fetches of the given nodes (call once the assignments are committed)."""
+    pipe = redis_client.pipeline(transaction=False)
+    for node_id in set(node_ids):
+        pipe.publish(assignments_channel(node_id), "assigned")
+    pipe.execute()
+
+def task_update_state(task):
+    """
+    Compact state of a changed task carried by task update events.
+    The result is summarised: the validated output can be large and is fetched on demand.
+    """
+    result = task.result or {}
     return {
-        "active_nodes": active_nodes_count,
-        "total_cpu": total_cpu,
-        "total_ram": total_ram,
-        "pending_tasks": Task.objects.filter(status='pending').count(),
-        "in_progress_tasks": Task.objects.filter(status='in_progress').count(),
-        "completed_tasks": Task.objects.filter(status='completed').count(),
-        "validated_tasks": Task.objects.filter(status='validated').count(),
-        "failed_tasks": Task.objects.filter(status='failed').count(),
-        "in_queue_tasks": Task.objects.filter(status='in_queue').count(),
-        "average_trust_index": average_trust_index,
+        "id": str(task.id),
+        "old_status": getattr(task, "_old_status", None),
+        "status": task.status,
+        "updated_at": task.updated_at.isoformat() if task.updated_at else None,
+        "result": {
+            "trust_score": result.get("trust_score"),
+            "has_output": result.get("validated_output") is not None,
+            "error": result.get("error"),
+        } if result else None,
     }
 
-def publish_task_update(node_id, emit=False):
+def publish_task_update(node_id, tasks=(), emit=False):
     """
-    Publish a task update event to the Redis channel.
+    Publish a task update event to the node's own Redis channel.
     Args: node_id (UUID): The ID of the node that is being updated.
+          tasks (iterable of Task): The changed tasks submitted by that node, sent as compact state.
+    Without tasks, the event asks subscribers to refetch their task list.
     """
     if not emit:
         return
 
-    channel = settings.REDIS_TASK_UPDATES_CHANNEL
+    channel = task_updates_channel(node_id)
+    states = [task_update_state(task) for task in tasks]
     message = {
         "type": "task_update",
         "timestamp": timezone.now().isoformat(),
         "node_id": str(node_id),
-        "action": "refetch"
+        "action": "patch" if states else "refetch",
+        "tasks": states,
     }
-    redis_client.publish(channel, json.dumps(message))
+    publish_event(channel, json.dumps(message))
+
+def _frame_interval_ms():
+    return max(int(1000 / getattr(settings, "NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND", 2)), 1)
+
+def publish_network_activity(force_keyframe=False):
+    """
+    Request a network activity frame on the Redis channel.
+    Frames are coalesced to at most NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND: the first request of a window
+    publishes immediately, later ones in the same window are folded into one trailing frame sent when it closes.
+    Returns True if a frame was published by this call.
+    """
+    interval_ms = _frame_interval_ms()
+    if force_keyframe or redis_client.set(settings.REDIS_NETWORK_ACTIVITY_THROTTLE_KEY, 1, nx=True, px=interval_ms):
+        return publish_network_activity_frame(force_keyframe)
+
+    # Inside an open window: make sure exactly one trailing frame is scheduled
+    if redis_client.set(settings.REDIS_NETWORK_ACTIVITY_PENDING_KEY, 1, nx=True, px=interval_ms * 2):
+        from hub.tasks import flush_network_activity_task  # hub.tasks imports this module
+        remaining_ms = max(redis_client.pttl(settings.REDIS_NETWORK_ACTIVITY_THROTTLE_KEY), 0)
+        flush_network_activity_task.apply_async(countdown=remaining_ms / 1000)
+    return False
 
-def publish_network_activity():
+def publish_network_activity_frame(force_keyframe=False):
     """
-    Publish aggregated network activity data to the Redis channel.
+    Publish one frame, delta-encoded against the previous frame.
+    Keyframes carry the full snapshot and go out every NETWORK_ACTIVITY_KEYFRAME_SECONDS (or when forced);
+    in between, a delta carries only the fields whose value changed. Nothing is sent if nothing changed.
+    See the "Network activity stream" section in the README for the consumer contract.
+    Frames may be requested concurrently (forced keyframes, trailing frames): each one is stored and published
+    only if no other frame was published since it was computed (see _PUBLISH_FRAME_SCRIPT), otherwise it is
+    recomputed against the newer frame.
     """
-    data = get_network_activity_data()
     channel = settings.REDIS_NETWORK_ACTIVITY_CHANNEL
-    message = {
-        "type": "network_activity",
-        "timestamp": timezone.now().isoformat(),
-        "data": data
-    }
-    redis_client.publish(channel, json.dumps(message))
+    keyframe_interval = getattr(settings, "NETWORK_ACTIVITY_KEYFRAME_SECONDS", 30)
+    for _ in range(_FRAME_PUBLISH_ATTEMPTS):
+        data = get_network_activity_data()
+        now = timezone.now()
+        stored_frame = redis_client.get(settings.REDIS_NETWORK_ACTIVITY_LAST_FRAME_KEY)
+        last_frame = json.loads(stored_frame) if stored_frame else None
+
+        keyframe = force_keyframe or last_frame is None or now.timestamp() - last_frame["keyframe_at"] >= keyframe_interval
+        if keyframe:
+            payload = data
+            keyframe_at = now.timestamp()
+        else:
+            payload = {key: value for key, value in data.items() if last_frame["data"].get(key) != value}
+            if not payload:
+                return False
+            keyframe_at = last_frame["keyframe_at"]
+
+        seq = (last_frame["seq"] + 1) if last_frame else 1
+        message = {
+            "type": "network_activity",
+            "frame": "keyframe" if keyframe else "delta",
+            "seq": seq,
+            "timestamp": now.isoformat(),
+            "data": payload
+        }
+        event_id = _PUBLISH_FRAME_SCRIPT(
+            keys=[settings.REDIS_NETWORK_ACTIVITY_LAST_FRAME_KEY, event_stream_key(channel)],
+            args=[
+                stored_frame or '',
+                json.dumps({"seq": seq, "data": data, "keyframe_at": keyframe_at}),
+                channel,
+                json.dumps(message),
+                settings.SSE_REPLAY_MAX_EVENTS,
+                settings.SSE_REPLAY_RETENTION_SECONDS,
+            ],
+        )
+        if event_id is not None:
+            return True
+    return False
@@ -0,0 +1,131 @@
+import networkx as nx
+import numpy as np
+
+# Integer cost resolution for the min-cost flow solver (network simplex needs integral weights)
+COST_SCALE = 1000
+TRUST_TIEBREAK_SCALE = 10
+
+
+def node_resource_arrays(nodes, reserved=None):
+    """
+    Build aligned NumPy arrays (free_cpu, free_ram, trust_index) for a list of nodes.
+    Missing resource values are treated as 0, matching Node.free_resources defaults.
+    `reserved` ({node_id: {"cpu", "ram"}}) is subtracted so arrays hold unreserved capacity.
+    """
+    reserved = reserved or {}
+    free = [node.available_resources(reserved.get(node.id, {})) for node in nodes]
+    free_cpu = np.fromiter((resources["cpu"] for resources in free), dtype=float, count=len(nodes))
+    free_ram = np.fromiter((resources["ram"] for resources in free), dtype=float, count=len(nodes))
+    trust = np.fromiter((node.trust_index for node in nodes), dtype=float, count=len(nodes))
+    return free_cpu, free_ram, trust
+
+
+def task_requirement_arrays(tasks):
+    """
+    Build aligned NumPy arrays (cpu, ram, trust_index_required) for a list of tasks.
+    Missing requirements default to 1, as in the per-task suitability heuristic.
+    """
+    cpu = np.fromiter(((task.resource_requirements or {}).get('cpu', 1) for task in tasks), dtype=float, count=len(tasks))
+    ram = np.fromiter(((task.resource_requirements or {}).get('ram', 1) for task in tasks), dtype=float, count=len(tasks))
+    trust_required = np.fromiter((task.trust_index_required for task in tasks), dtype=float, count=len(tasks))
+    return cpu, ram, trust_required
+
+
+def suitability_matrix(task_cpu, task_ram, node_cpu, node_ram):
+    """
+    Compute the tasks x nodes suitability matrix of the 'custom' heuristic in one step:
+        |free_cpu - cpu| / max(cpu, 1) + |free_ram - ram| / max(ram, 1)
+    Lower is better.
+    """
+    cpu_score = np.abs(node_cpu[np.newaxis, :] - task_cpu[:, np.newaxis]) / np.maximum(task_cpu, 1)[:, np.newaxis]
+    ram_score = np.abs(node_ram[np.newaxis, :] - task_ram[:, np.newaxis]) / np.maximum(task_ram, 1)[:, np.newaxis]
+    return cpu_score + ram_score
+
+
+def fits_matrix(task_cpu, task_ram, node_cpu, node_ram):
+    """
+    Boolean tasks x nodes matrix: True where the node's unreserved capacity covers the task.
+    Vectorized equivalent of Node.is_available_for_task.
+    """
+    return (node_cpu[np.newaxis, :] >= task_cpu[:, np.newaxis]) & (node_ram[np.newaxis, :] >= task_ram[:, np.newaxis])
+
+
+def greedy_assignment(task_cpu, task_ram, node_cpu, node_ram, node_trust, eligible, slots):
+    """
+    Rank nodes per task by (suitability, -trust_index) and take the best `slots[row]` nodes that fit,
+    processing tasks in row order. Every pick reserves the task's resources on the node, so later
+    rows see reduced capacity and a node is never booked beyond what it reported as free.
+    np.lexsort is stable, so ties keep the original node order like Python's sorted().
+    Returns, for every task row, an array of chosen node indices.
+    """
+    node_cpu = node_cpu.copy()
+    node_ram = node_ram.copy()
+    suitability = suitability_matrix(task_cpu, task_ram, node_cpu, node_ram)
+
+    plan = []
+    for row in range(len(slots)):
+        candidates = eligible[row] & (node_cpu >= task_cpu[row]) & (node_ram >= task_ram[row])
+        order = np.lexsort((-node_trust, suitability[row]))
+        chosen = order[candidates[order]][:slots[row]]
+        if chosen.size:
+            node_cpu[chosen] -= task_cpu[row]
+            node_ram[chosen] -= task_ram[row]
+            suitability[row + 1:, chosen] = suitability_matrix(
+                task_cpu[row + 1:], task_ram[row + 1:], node_cpu[chosen], node_ram[chosen]
+            )
+        plan.append(chosen)
+    return plan
+
+
+def drop_overbooked(plan, task_cpu, task_ram, node_cpu, node_ram):
+    """
+    Replay a plan in row order against unreserved node capacity and drop picks that would
+    overbook a node (possible when a solver lets one node take several replicas per pass).
+    """
+    node_cpu = node_cpu.copy()
+    node_ram = node_ram.copy()
+    checked = []
+    for row, chosen in enumerate(plan):
+        kept = []
+        for col in chosen:
+            if node_cpu[col] >= task_cpu[row] and node_ram[col] >= task_ram[row]:
+                node_cpu[col] -= task_cpu[row]
+                node_ram[col] -= task_ram[row]
+                kept.append(col)
+        checked.append(kept)
+    return checked
+
+
+def min_cost_assignment(suitability, eligible, node_trust, slots, node_capacity=1):
+    """
+    Solve all open replica slots against all candidate nodes as one min-cost flow:
+        source -> task (capacity = open slots) -> node (capacity 1) -> sink (capacity = node_capacity)
+    The number of filled slots is maximised first, then the total suitability cost is minimised,
+    with trust_index as a tie-breaker. The unit task -> node edges enforce the no-duplicate-node rule;
+    ineligible pairs (trust, existing assignment) are simply left out of the graph.
+    Returns, for every task row, the list of chosen node indices ordered by cost.
+    """
+    graph = nx.DiGraph()
+    rows, cols = np.nonzero(eligible)
+    trust_penalty = np.rint((node_trust.max(initial=0) - node_trust) * TRUST_TIEBREAK_SCALE).astype(int)
+    costs = np.rint(suitability[rows, cols] * COST_SCALE).astype(int) * (trust_penalty.max(initial=0) + 1) \
+        + trust_penalty[cols]
+
+    edges = list(zip(rows.tolist(), cols.tolist(), costs.tolist()))
+
+    for row in set(rows.tolist()):
+        graph.add_edge('source', ('task', row), capacity=int(slots[row]), weight=0)
+    for row, col, cost in edges:
+        graph.add_edge(('task', row), ('node', col), capacity=1, weight=cost)
+    for col in set(cols.tolist()):
+        graph.add_edge(('node', col), 'sink', capacity=node_capacity, weight=0)
+
+    plan = [[] for _ in range(eligible.shape[0])]
+    if graph.number_of_edges() == 0:
+        return plan
+
+    flow = nx.max_flow_min_cost(graph, 'source', 'sink')
+    for row, col, cost in sorted(edges, key=lambda edge: edge[2]):
+        if flow[('task', row)][('node', col)] > 0:
+            plan[row].append(col)
+    return plan
@@ -2,7 +2,18 @@ from rest_framework import serializers
 from hub.models import Node, Task
 
 
-class NodeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Accepts an optional `fields` argument: only those fields are rendered (sparse fieldsets for list endpoints).
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class NodeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Node model."""
     class Meta:
         model = Node
@@ -28,7 +39,7 @@ class NodeRegistrationSerializer(serializers.Serializer):
         return Node.objects.create(**validated_data)
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Task model."""
     class Meta:
         model = Task
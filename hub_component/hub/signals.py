@@ -1,45 +1,76 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.expressions import Combinable
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from hub import activity_counters, heartbeats, priority_index
 from hub.models import Node, Task
 from hub.redis_publisher import publish_network_activity, publish_task_update
 
 
 @receiver(pre_save, sender=Node)
-def cache_old_node_status(sender, instance, **kwargs):
+def cache_old_node_status(sender, instance, update_fields=None, **kwargs):
     """
-    Cache the old status of a Node instance before saving.
+    Cache the old status of a Node instance before saving (tracked in memory, no query).
     """
-    if instance.pk:
-        try:
-            old_instance = Node.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-        except Node.DoesNotExist:
-            instance._old_status = None
-    else:
-        instance._old_status = None
+    instance._old_status = instance.persisted_status(update_fields)
+
+# Node fields feeding the network activity counters
+COUNTED_NODE_FIELDS = {'status', 'free_resources', 'trust_index'}
 
 @receiver(post_save, sender=Node)
-def emit_network_activity_on_node_update(sender, instance, created, **kwargs):
-    """Emit network activity if the node status has changed or if it's a new node."""
+def emit_network_activity_on_node_update(sender, instance, created, update_fields=None, **kwargs):
+    """Update the activity counters and emit network activity if the node status has changed or if it's a new node."""
+    if update_fields is None or COUNTED_NODE_FIELDS & set(update_fields):
+        activity_counters.record_node(instance)
     if created or instance._old_status != instance.status:
         publish_network_activity()
 
+@receiver(post_save, sender=Node)
+def evict_cached_heartbeat_status(sender, instance, created, **kwargs):
+    """A node whose status changed takes the database path on its next heartbeat (see hub.heartbeats)."""
+    if not created and instance._old_status != instance.status:
+        heartbeats.evict([instance.id])
+
+@receiver(post_save, sender=Node)
+def track_live_node(sender, instance, update_fields=None, **kwargs):
+    """Saved live nodes are watched by the liveness sweep, however they became live (see heartbeats.track)."""
+    if update_fields is None or {'status', 'last_heartbeat'} & set(update_fields):
+        heartbeats.track([instance])
+
+@receiver(post_delete, sender=Node)
+def forget_node_in_activity_counters(sender, instance, **kwargs):
+    """Drop deleted nodes from the network activity counters and the heartbeat cache."""
+    activity_counters.forget_node(instance.id)
+    heartbeats.evict([instance.id], forget=True)
+
 @receiver(pre_save, sender=Task)
-def cache_old_task_status(sender, instance, **kwargs):
-    """Cache the old status of a Task instance before saving."""
-    if instance.pk:
-        try:
-            old_instance = Task.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-        except Task.DoesNotExist:
-            instance._old_status = None
-    else:
-        instance._old_status = None
+def cache_old_task_status(sender, instance, update_fields=None, **kwargs):
+    """Cache the old status of a Task instance before saving (tracked in memory, no query)."""
+    instance._old_status = instance.persisted_status(update_fields)
 
 @receiver(post_save, sender=Task)
 def emit_network_activity_on_task_update(sender, instance, created, **kwargs):
-    """Emit network activity if the task status has changed or if it's a new task."""
+    """Update the activity counters and emit network activity if the task status has changed or if it's a new task."""
     if created or instance._old_status != instance.status:
+        activity_counters.record_task_transition(instance._old_status, instance.status)
         publish_network_activity()
-        if instance.submitted_by:
-            publish_task_update(instance.submitted_by.id, emit=True)
+        if instance.submitted_by_id:
+            publish_task_update(instance.submitted_by_id, [instance], emit=True)
+
+@receiver(post_save, sender=Task)
+def sync_priority_index_on_task_update(sender, instance, **kwargs):
+    """Keep the Redis priority index in sync with the task's status and stale count."""
+    if instance.status in priority_index.INDEXED_STATUSES or instance._old_status in priority_index.INDEXED_STATUSES:
+        if isinstance(instance.stale_count, Combinable):  # e.g. Task.mark_stale() saves an F() expression
+            instance.refresh_from_db(fields=['stale_count'])
+        priority_index.sync_task(instance)
+
+@receiver(post_delete, sender=Task)
+def discard_priority_index_on_task_delete(sender, instance, **kwargs):
+    """Drop deleted tasks from the Redis priority index."""
+    if instance.status in priority_index.INDEXED_STATUSES:
+        priority_index.discard([instance.id])
+
+@receiver(post_delete, sender=Task)
+def count_task_delete(sender, instance, **kwargs):
+    """Remove deleted tasks from the network activity counters."""
+    activity_counters.record_task_transition(instance.status, None)
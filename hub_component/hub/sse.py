@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of messages to tell a client stream it was dropped
+_DROPPED = object()
+
+# Sent instead of a replay when the events after a client's Last-Event-ID are no longer retained
+RESYNC_REQUIRED = '{"type": "resync_required"}'
+
+
+def parse_event_id(event_id):
+    """Redis Stream ID "<ms>-<seq>" as a comparable tuple, or None if it is malformed."""
+    ms, _, seq = (event_id or "").strip().partition("-")
+    try:
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return None
+
+
+class SSEBroadcaster:
+    """
+    Fans Redis pub/sub messages out to every SSE client of this process.
+    Holds a single pattern subscription (REDIS_CHANNEL_PREFIX:*) on one connection regardless of the
+    number of clients; each client gets a bounded asyncio queue. A client whose queue is full is a
+    slow consumer and is dropped rather than buffering without limit (EventSource reconnects on its own).
+    """
+
+    def __init__(self):
+        self._clients = defaultdict(set)  # channel -> set of client queues
+        self._reader = None
+        self._redis = None
+        self.dropped_clients = 0
+        self.subscribed = asyncio.Event()  # set while the shared subscription is live
+
+    @property
+    def client_count(self):
+        return sum(len(queues) for queues in self._clients.values())
+
+    def subscribe(self, channel) -> asyncio.Queue:
+        """Register a client for `channel` and return its message queue."""
+        queue = asyncio.Queue(maxsize=getattr(settings, "SSE_CLIENT_QUEUE_SIZE", 100))
+        self._clients[channel].add(queue)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._read_forever())
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        """Remove a client queue. The shared subscription stays open for the next client."""
+        queues = self._clients.get(channel)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._clients[channel]
+
+    def dispatch(self, channel, data):
+        """Deliver one message to every client of `channel` without ever blocking the reader."""
+        for queue in list(self._clients.get(channel, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self.unsubscribe(channel, queue)
+                self.dropped_clients += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_DROPPED)
+                logger.warning(f"[SSEBroadcaster] Dropped slow SSE consumer on {channel}.")
+
+    async def replay(self, channel, last_event_id):
+        """
+        Return the retained (event_id, data) pairs published on `channel` after `last_event_id`,
+        or None if some of them were already trimmed from the replay stream (the client must resync).
+        """
+        from hub.redis_publisher import event_stream_key  # hub.redis_publisher opens a sync client on import
+
+        last = parse_event_id(last_event_id)
+        if last is None:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(settings.CELERY_BROKER_URL)
+        key = event_stream_key(channel)
+        first = await self._redis.xrange(key, count=1)
+        if not first or parse_event_id(first[0][0].decode("utf-8")) > last:
+            # The stream starts after the client's position, or expired: missed events may be gone
+            return None
+        entries = await self._redis.xrange(key, min=last_event_id.strip())
+        return [
+            (event_id.decode("utf-8"), fields[b"data"].decode("utf-8"))
+            for event_id, fields in entries
+            if parse_event_id(event_id.decode("utf-8")) > last
+        ]
+
+    async def _read_forever(self):
+        """Read the shared subscription, reconnecting after Redis errors."""
+        pattern = f"{settings.REDIS_CHANNEL_PREFIX}:*"
+        while True:
+            client = aioredis.from_url(settings.CELERY_BROKER_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(pattern)
+                async for message in pubsub.listen():
+                    if message["type"] == "psubscribe":
+                        self.subscribed.set()
+                    elif message["type"] == "pmessage":
+                        self.dispatch(message["channel"].decode("utf-8"), message["data"].decode("utf-8"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[SSEBroadcaster] Redis subscription failed: {e}. Reconnecting.")
+                await asyncio.sleep(1)
+            finally:
+                self.subscribed.clear()
+                await pubsub.aclose()
+                await client.aclose()
+
+
+_broadcasters = {}
+
+
+def get_broadcaster() -> SSEBroadcaster:
+    """Return the broadcaster of the running event loop (one per process under an ASGI server)."""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        _broadcasters.clear()  # a previous loop is closed, its broadcaster is unusable
+        broadcaster = _broadcasters[loop] = SSEBroadcaster()
+    return broadcaster
+
+
+async def wait_for_notification(channel, condition, timeout):
+    """
+    Wait until the async callable `condition` returns True, re-checking it on every message published
+    on `channel`, for at most `timeout` seconds. Returns False if the timeout passed first.
+    Waiters share the broadcaster's subscription, so they hold neither a thread nor a Redis connection.
+    """
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(channel)  # before the first check, so a notification in between is not lost
+    try:
+        async with asyncio.timeout(timeout):
+            while not await condition():
+                if await queue.get() is _DROPPED:
+                    queue = broadcaster.subscribe(channel)
+        return True
+    except TimeoutError:
+        return False
+    finally:
+        broadcaster.unsubscribe(channel, queue)
+
+
+async def event_stream(channel, last_event_id=None):
+    """
+    Async generator of SSE frames for one client of `channel`.
+    Every event carries its stream ID; a client reconnecting with `last_event_id` first receives the
+    retained events it missed, or a resync_required event if the gap is older than the replay stream.
+    Sends a keepalive comment every SSE_KEEPALIVE_SECONDS of silence so proxies keep the connection open.
+    """
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(channel)  # before the replay, so nothing published meanwhile is lost
+    keepalive = getattr(settings, "SSE_KEEPALIVE_SECONDS", 15)
+    try:
+        yield f"retry: {getattr(settings, 'SSE_RETRY_MS', 3000)}\n: connected\n\n"
+        sent = None
+        if last_event_id:
+            replayed = await broadcaster.replay(channel, last_event_id)
+            if replayed is None:
+                yield f"data: {RESYNC_REQUIRED}\n\n"
+            else:
+                sent = parse_event_id(last_event_id)
+                for event_id, data in replayed:
+                    sent = parse_event_id(event_id)
+                    yield f"id: {event_id}\ndata: {data}\n\n"
+        while True:
+            try:
+                async with asyncio.timeout(keepalive):  # unlike wait_for, does not spawn a task per message
+                    message = await queue.get()
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is _DROPPED:
+                return
+            event_id, _, data = message.partition(" ")
+            if sent is not None and parse_event_id(event_id) <= sent:
+                continue  # already delivered by the replay
+            sent = parse_event_id(event_id)
+            yield f"id: {event_id}\ndata: {data}\n\n"
+    finally:
+        broadcaster.unsubscribe(channel, queue)
@@ -1,12 +1,21 @@
 import logging
 import docker
+import numpy as np
 from docker.errors import ImageNotFound, DockerException
 from collections import defaultdict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F, Value, Func, Case, When, FloatField, ExpressionWrapper
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce
+from hub import heartbeats, priority_index, scheduling
+from hub.transitions import bulk_transition, transition_tasks
 from hub.models import Task, Node, TaskAssignment
+from hub.redis_publisher import notify_new_assignments
 from licenta.settings import VALIDATION_THRESHOLD, TRUST_INCREMENT, TRUST_DECREMENT, STALE_PENALTY_MULTIPLIER, \
     IN_PROGRESS_BOOST, MAX_STALE_COUNT, TRUST_INDEX_MAX, TRUST_INDEX_MIN
 
@@ -22,16 +31,51 @@ class TaskManager:
     def __init__(self):
         self.active_queue_size = getattr(settings, 'ACTIVE_QUEUE_SIZE', 10)
         self.max_stale_count = MAX_STALE_COUNT
+        self.priority_backend = getattr(settings, 'PRIORITY_BACKEND', 'redis')
 
     def select_tasks_to_activate(self, backlog_tasks, available_slots):
         """Selects tasks from the backlog to activate based on priority / use FiFo."""
         mechanism = getattr(settings, "ORCHESTRATION_MECHANISM", "custom")
         if mechanism == "fifo":
             return list(backlog_tasks.order_by("created_at")[:available_slots])
+        elif self.priority_backend == "redis":
+            return self._top_indexed_tasks(backlog_tasks, 'pending', available_slots)
+        elif self.priority_backend == "sql":
+            return list(self.annotate_task_priority(backlog_tasks).order_by('-priority')[:available_slots])
         else:
             sorted_backlog = sorted(backlog_tasks, key=self.calculate_task_priority, reverse=True)
             return sorted_backlog[:available_slots]
 
+    def _top_indexed_tasks(self, queryset, status, count):
+        """
+        Fetch the `count` highest priority tasks of `status` from the Redis priority index.
+        Index entries that no longer match `queryset` (drift) are discarded and replaced.
+        """
+        selected = []
+        while len(selected) < count:
+            task_ids = priority_index.top_task_ids(status, count - len(selected))
+            if not task_ids:
+                break
+            tasks = {str(task.id): task for task in queryset.filter(id__in=task_ids, status=status)}
+            selected.extend(tasks[task_id] for task_id in task_ids if task_id in tasks)
+
+            missing = [task_id for task_id in task_ids if task_id not in tasks]
+            if not missing:
+                break
+            priority_index.discard(missing)
+        return selected
+
+    def _lowest_indexed_task(self, status):
+        """Fetch the lowest priority task of `status` from the Redis priority index (discarding drifted entries)."""
+        while True:
+            task_id = priority_index.lowest_task_id(status)
+            if task_id is None:
+                return None
+            task = Task.objects.filter(id=task_id, status=status).first()
+            if task:
+                return task
+            priority_index.discard([task_id])
+
     def calculate_task_priority(self, task: Task) -> float:
         """
         Calculates a numeric priority score for a given task using heuristic.
@@ -40,8 +84,7 @@ class TaskManager:
         # Age factor: the longer it has waited, the more urgent
         time_waiting = (timezone.now() - task.created_at).total_seconds()
         # If no resource requirements, use 1 so we don't divide by zero
-        resource_weight = task.resource_requirements.get("cpu", 0.5) + task.resource_requirements.get("ram",
-                                                                                                            0.5) / 2
+        resource_weight = priority_index.resource_weight(task.resource_requirements)
         # Give a penalty for tasks that have gone stale multiple times
         stale_penalty = task.stale_count * STALE_PENALTY_MULTIPLIER
 
@@ -51,6 +94,30 @@ class TaskManager:
         # Basic formula with status weight
         return ((time_waiting / resource_weight) - stale_penalty) * status_weight
 
+    def annotate_task_priority(self, queryset, now=None):
+        """
+        Annotate `priority` evaluated in SQL with the same heuristic as calculate_task_priority,
+        so Postgres can rank the backlog with ORDER BY ... LIMIT instead of sorting it in Python.
+        """
+        now = now or timezone.now()
+        time_waiting = Value(now.timestamp()) - Func(
+            F('created_at'), template='EXTRACT(EPOCH FROM %(expressions)s)::double precision', output_field=FloatField()
+        )
+        resource_weight = Coalesce(
+            Cast(KeyTextTransform('cpu', 'resource_requirements'), FloatField()), Value(0.5)
+        ) + Coalesce(
+            Cast(KeyTextTransform('ram', 'resource_requirements'), FloatField()), Value(0.5)
+        ) / Value(2.0)
+        stale_penalty = F('stale_count') * Value(float(STALE_PENALTY_MULTIPLIER))
+        status_weight = Case(
+            When(status='in_progress', then=Value(IN_PROGRESS_BOOST)), default=Value(1.0), output_field=FloatField()
+        )
+        return queryset.annotate(
+            priority=ExpressionWrapper(
+                ((time_waiting / resource_weight) - stale_penalty) * status_weight, output_field=FloatField()
+            )
+        )
+
     def move_tasks_to_active_queue(self):
         """
         Fill available slots in the active queue from the backlog based on priority.
@@ -64,10 +131,7 @@ class TaskManager:
         backlog_tasks = Task.objects.filter(status='pending')
         tasks_to_activate = self.select_tasks_to_activate(backlog_tasks, available_slots)
 
-        for task in tasks_to_activate:
-            task.status = 'in_queue'
-            task.last_attempted = timezone.now()
-            task.save()
+        for task in transition_tasks(tasks_to_activate, 'in_queue', last_attempted=timezone.now()):
             logger.info(f"Moved task {task.id} to queue for assignment.")
 
     def reorder_active_queue(self):
@@ -76,27 +140,36 @@ class TaskManager:
         but only if the active tasks are unassigned. (We do not swap tasks that already started.)
         Don't swap tasks if impact is minimal (30% threshold).
         """
-        active_tasks_unassigned = list(
-            Task.objects.filter(
-                status='in_queue',
+        if self.priority_backend == "sql":
+            lowest_active = self.annotate_task_priority(Task.objects.filter(status='in_queue')).order_by('priority').first()
+            highest_backlog = self.annotate_task_priority(Task.objects.filter(status='pending')).order_by('-priority').first()
+            if not lowest_active or not highest_backlog:
+                return
+        elif self.priority_backend == "redis":
+            lowest_active = self._lowest_indexed_task('in_queue')
+            backlog_top = self._top_indexed_tasks(Task.objects.all(), 'pending', 1)
+            highest_backlog = backlog_top[0] if backlog_top else None
+            if not lowest_active or not highest_backlog:
+                return
+        else:
+            active_tasks_unassigned = list(
+                Task.objects.filter(
+                    status='in_queue',
+                )
             )
-        )
-        backlog_tasks = list(Task.objects.filter(status='pending'))
-        if not active_tasks_unassigned or not backlog_tasks:
-            return
+            backlog_tasks = list(Task.objects.filter(status='pending'))
+            if not active_tasks_unassigned or not backlog_tasks:
+                return
 
-        active_sorted = sorted(active_tasks_unassigned, key=self.calculate_task_priority, reverse=True)
-        backlog_sorted = sorted(backlog_tasks, key=self.calculate_task_priority, reverse=True)
+            active_sorted = sorted(active_tasks_unassigned, key=self.calculate_task_priority, reverse=True)
+            backlog_sorted = sorted(backlog_tasks, key=self.calculate_task_priority, reverse=True)
 
-        lowest_active = active_sorted[-1]
-        highest_backlog = backlog_sorted[0]
+            lowest_active = active_sorted[-1]
+            highest_backlog = backlog_sorted[0]
 
         if self.calculate_task_priority(highest_backlog) > self.calculate_task_priority(lowest_active) * 1.3: # 30% threshold to prevent minimal impact swapping
-            lowest_active.status = 'pending'
-            lowest_active.save()
-            highest_backlog.status = 'in_queue'
             highest_backlog.last_attempted = timezone.now()
-            highest_backlog.save()
+            bulk_transition([(lowest_active, 'pending'), (highest_backlog, 'in_queue')], fields=['last_attempted'])
 
             logger.info(
                 f"Swapped out unassigned active task {lowest_active.id} "
@@ -109,7 +182,12 @@ class TaskManager:
         Prevents duplicate assignment of the same task to the same node.
         """
         mechanism = getattr(settings, "ORCHESTRATION_MECHANISM", "custom")
-        active_tasks = Task.objects.filter(Q(status='in_progress') | Q(status='in_queue'))
+        if mechanism == "optimal":
+            return self.assign_tasks_to_nodes_bulk(optimal=True)
+        if mechanism == "custom" and getattr(settings, "BULK_ASSIGNMENT", True):
+            return self.assign_tasks_to_nodes_bulk()
+
+        active_tasks = Task.objects.filter(Q(status='in_progress') | Q(status='in_queue')).order_by('created_at')
 
         for task in active_tasks:
             assigned_nodes = set(
@@ -128,19 +206,30 @@ class TaskManager:
                 trust_index__gte=task.trust_index_required
             ).exclude(id__in=assigned_nodes)  # Exclude already assigned nodes
 
-            if not candidate_nodes.exists():
+            if mechanism == "fifo":
+                # Assign nodes just in DB-order (FIFO, no ranking)
+                candidate_nodes = candidate_nodes.order_by("last_heartbeat")
+
+            # Schedule against reported free resources minus open reservations
+            reserved = TaskAssignment.reserved_resources(candidate_nodes.values_list('id', flat=True))
+            candidate_nodes = [
+                node for node in heartbeats.apply_live_state(list(candidate_nodes))
+                if node.is_available_for_task(task.resource_requirements, reserved.get(node.id, {}))
+            ]
+
+            if not candidate_nodes:
                 task.mark_stale()
                 logger.warning(f"No candidate nodes found for task {task.id}. Marking as stale.")
                 continue
 
             if mechanism == "fifo":
-                # Assign nodes just in DB-order (FIFO, no ranking)
-                ranked_nodes = list(candidate_nodes.order_by("last_heartbeat"))
+                ranked_nodes = candidate_nodes
             else:
                 def calculate_suitability(node):
                     """Compute suitability score based on resource availability and match with task requirements."""
-                    node_free_cpu = node.free_resources.get('cpu', 0)
-                    node_free_ram = node.free_resources.get('ram', 0)
+                    available = node.available_resources(reserved.get(node.id, {}))
+                    node_free_cpu = available['cpu']
+                    node_free_ram = available['ram']
 
                     task_cpu = task.resource_requirements.get('cpu', 1)
                     task_ram = task.resource_requirements.get('ram', 1)
@@ -167,7 +256,8 @@ class TaskManager:
 
                 best_node = ranked_nodes.pop(0)
 
-                TaskAssignment.objects.create(task=task, node=best_node)
+                TaskAssignment.reserving(task, best_node).save()
+                transaction.on_commit(partial(notify_new_assignments, [best_node.id]))
                 if task.status == 'in_queue':
                     task.status = 'in_progress'
                     task.save()
@@ -176,6 +266,135 @@ class TaskManager:
                     f"(Overlap {len(assigned_nodes) + i + 1}/{task.overlap_count})."
                 )
 
+    def assign_tasks_to_nodes_bulk(self, optimal=False):
+        """
+        Bulk variant of the 'custom' assignment. Loads active tasks, their assignments and
+        eligible nodes once, ranks all (task, node) pairs with a vectorized suitability matrix
+        and writes the new TaskAssignments with a single bulk_create.
+        Produces the same ranking as the per-task heuristic. Nodes are scored against their
+        unreserved capacity, and every pick reserves the task's resources for the rest of the pass.
+        With `optimal=True` all open replica slots are solved together as a min-cost matching,
+        falling back to the greedy ranking above OPTIMAL_MAX_EDGES candidate pairs or if the solver
+        exceeds OPTIMAL_TIME_BUDGET.
+        """
+        active_tasks = list(Task.objects.filter(status__in=['in_progress', 'in_queue']).order_by('created_at'))
+        if not active_tasks:
+            return
+
+        assigned_nodes = defaultdict(set)
+        for task_id, node_id in TaskAssignment.objects.filter(
+            task_id__in=[task.id for task in active_tasks]
+        ).values_list('task_id', 'node_id'):
+            assigned_nodes[task_id].add(node_id)
+
+        tasks_to_promote = []
+        open_tasks = []
+        for task in active_tasks:
+            if len(assigned_nodes[task.id]) >= task.overlap_count:
+                logger.info(
+                    f"Task {task.id} already fully assigned ({len(assigned_nodes[task.id])}/{task.overlap_count})."
+                )
+                tasks_to_promote.append(task)
+            else:
+                open_tasks.append(task)
+
+        min_trust_required = min((task.trust_index_required for task in open_tasks), default=0)
+        # Free resources reported by heartbeats not yet flushed to the database
+        nodes = heartbeats.apply_live_state(list(Node.objects.filter(status='active', trust_index__gte=min_trust_required)))
+        node_index = {node.id: i for i, node in enumerate(nodes)}
+        reserved = TaskAssignment.reserved_resources(list(node_index))
+
+        new_assignments = []
+        stale_task_ids = []
+        if open_tasks and nodes:
+            node_cpu, node_ram, node_trust = scheduling.node_resource_arrays(nodes, reserved)
+            task_cpu, task_ram, task_trust_required = scheduling.task_requirement_arrays(open_tasks)
+
+            eligible = node_trust[np.newaxis, :] >= task_trust_required[:, np.newaxis]
+            for row, task in enumerate(open_tasks):
+                for node_id in assigned_nodes[task.id]:
+                    if node_id in node_index:
+                        eligible[row, node_index[node_id]] = False
+
+            slots = np.array([task.overlap_count - len(assigned_nodes[task.id]) for task in open_tasks])
+
+            plan = None
+            if optimal:
+                suitability = scheduling.suitability_matrix(task_cpu, task_ram, node_cpu, node_ram)
+                fits = scheduling.fits_matrix(task_cpu, task_ram, node_cpu, node_ram)
+                plan = self._plan_optimal_assignment(suitability, eligible & fits, node_trust, slots)
+                if plan is not None:
+                    plan = scheduling.drop_overbooked(plan, task_cpu, task_ram, node_cpu, node_ram)
+            if plan is None:
+                plan = scheduling.greedy_assignment(task_cpu, task_ram, node_cpu, node_ram, node_trust, eligible, slots)
+
+            for row, task in enumerate(open_tasks):
+                chosen = plan[row]
+                if len(chosen) == 0:
+                    stale_task_ids.append(task.id)
+                    continue
+
+                if len(chosen) < slots[row]:
+                    logger.warning(
+                        f"Not enough nodes available for task {task.id}. Assigned {len(chosen)} additional nodes so far."
+                    )
+                for i, node_idx in enumerate(chosen):
+                    new_assignments.append(TaskAssignment.reserving(task, nodes[node_idx]))
+                    logger.info(
+                        f"Assigned task {task.id} to node {nodes[node_idx].name} "
+                        f"(Overlap {len(assigned_nodes[task.id]) + i + 1}/{task.overlap_count})."
+                    )
+                tasks_to_promote.append(task)
+        else:
+            stale_task_ids = [task.id for task in open_tasks]
+
+        with transaction.atomic():
+            if new_assignments:
+                TaskAssignment.objects.bulk_create(new_assignments)
+                # Wake the nodes' long-polling fetches once the assignments are visible to them
+                transaction.on_commit(partial(notify_new_assignments, [a.node_id for a in new_assignments]))
+            if stale_task_ids:
+                Task.objects.filter(id__in=stale_task_ids).update(
+                    stale_count=F('stale_count') + 1, updated_at=timezone.now()
+                )
+                for task_id in stale_task_ids:
+                    logger.warning(f"No candidate nodes found for task {task_id}. Marking as stale.")
+                priority_index.sync_tasks(Task.objects.filter(id__in=stale_task_ids))
+            transition_tasks([task for task in tasks_to_promote if task.status == 'in_queue'], 'in_progress')
+
+    def _plan_optimal_assignment(self, suitability, eligible, node_trust, slots):
+        """
+        Solve the min-cost matching of open replica slots to nodes within the configured time budget.
+        Returns per-task lists of node indices, or None if the graph has more than OPTIMAL_MAX_EDGES
+        candidate pairs or the solver did not finish in time.
+        The solver thread cannot be stopped: after a timeout it keeps running in the background, so the
+        graph size is bounded up front and the time budget is only a last resort.
+        """
+        time_budget = getattr(settings, "OPTIMAL_TIME_BUDGET", 30.0)
+        node_capacity = getattr(settings, "OPTIMAL_NODE_CAPACITY", 1)
+        max_edges = getattr(settings, "OPTIMAL_MAX_EDGES", 20000)
+
+        edge_count = int(np.count_nonzero(eligible))
+        if edge_count > max_edges:
+            logger.info(
+                f"[assign_tasks_to_nodes] {edge_count} candidate pairs exceed OPTIMAL_MAX_EDGES ({max_edges}). Using greedy."
+            )
+            return None
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(
+            scheduling.min_cost_assignment, suitability, eligible, node_trust, slots, node_capacity
+        )
+        try:
+            return future.result(timeout=time_budget)
+        except FuturesTimeoutError:
+            logger.warning(
+                f"[assign_tasks_to_nodes] Optimal matching exceeded {time_budget}s budget. Falling back to greedy."
+            )
+            return None
+        finally:
+            executor.shutdown(wait=False)
+
     def handle_stale_tasks(self):
         """
         If a task's stale_count exceeds max_stale_count, mark it as 'failed'.
@@ -185,9 +404,7 @@ class TaskManager:
             stale_count__gte=self.max_stale_count,
             status='in_queue'
         )
-        for task in too_stale:
-            task.status = 'failed'
-            task.save()
+        for task in transition_tasks(too_stale, 'failed'):
             logger.info(f"Marked task {task.id} as failed due to exceeding stale threshold.")
 
 
@@ -213,7 +430,8 @@ class TaskManager:
             id__in=affected_task_ids
         ).annotate(assignment_count=Count('taskassignment')).filter(assignment_count=0)
 
-        reset_count = tasks_without_assignments.update(status='in_queue')
+        # Transition through bulk_transition so updated_at advances and the change events are emitted
+        reset_count = len(transition_tasks(tasks_without_assignments, 'in_queue'))
         if reset_count:
             logger.info(
                 f"[handle_tasks_for_inactive_nodes] {reset_count} task(s) moved to 'in_queue' (0 active assignments).")
@@ -224,7 +442,7 @@ class TaskManager:
         ).annotate(assignment_count=Count('taskassignment')).filter(assignment_count__gt=0,
                                                                     status__in=['pending', 'in_queue'])
 
-        in_progress_count = tasks_with_assignments.update(status='in_progress')
+        in_progress_count = len(transition_tasks(tasks_with_assignments, 'in_progress'))
         if in_progress_count:
             logger.info(
              f"[handle_tasks_for_inactive_nodes] {in_progress_count} task(s) updated to 'in_progress' (active assignments remain).")
@@ -311,13 +529,11 @@ class TaskManager:
             logger.info("[retry_failed_tasks] No retryable failed tasks found.")
             return
 
-        retried_count = 0
-        for task in retryable_tasks:
-            TaskAssignment.objects.filter(task=task).delete()
-            task.status = 'pending'
-            task.last_attempted = timezone.now()
-            task.save()
-            retried_count += 1
+        with transaction.atomic():
+            retryable_tasks = list(retryable_tasks)
+            TaskAssignment.objects.filter(task__in=retryable_tasks).delete()
+            retried_tasks = transition_tasks(retryable_tasks, 'pending', last_attempted=timezone.now())
+        for task in retried_tasks:
             logger.info(f"[retry_failed_tasks] Task {task.id} reset and moved back to 'pending', assignments cleared.")
 
     def handle_persistently_failing_tasks(self):
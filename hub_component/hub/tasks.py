@@ -1,83 +1,248 @@
+import json
+import time
 from datetime import timedelta
 
 from celery import shared_task, group, chain
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from hub.models import Node
+from hub import activity_counters, heartbeat_history, heartbeats, orchestration_lease, priority_index
+from hub.models import Node, TaskAssignment
+from hub.redis_publisher import redis_client, publish_network_activity
 from hub.task_manager import TaskManager, logger
 
 
+def request_orchestration(reason):
+    """
+    Request an orchestration pass because an event that can change its outcome happened
+    (task became pending, node gained capacity, assignment completed, node went inactive).
+    Events within ORCHESTRATION_DEBOUNCE_SECONDS are coalesced into a single pass scheduled
+    at the end of the window; Celery beat keeps running as a slow safety net.
+    Returns True if this call scheduled a new pass.
+    """
+    if not getattr(settings, "ORCHESTRATION_EVENT_DRIVEN", True):
+        return False
+
+    window = getattr(settings, "ORCHESTRATION_DEBOUNCE_SECONDS", 3.0)
+    requested_at = time.time()
+    scheduled = redis_client.set(
+        settings.REDIS_ORCHESTRATION_DEBOUNCE_KEY,
+        json.dumps({"reason": reason, "requested_at": requested_at}),
+        nx=True,
+        px=int(window * 1000),
+    )
+    if not scheduled:
+        logger.debug(f"[request_orchestration] '{reason}' coalesced into the pending orchestration pass.")
+        return False
+
+    orchestrate_task_distribution.apply_async(
+        kwargs={"reason": reason, "requested_at": requested_at},
+        countdown=window
+    )
+    logger.info(f"[request_orchestration] Orchestration scheduled in {window}s (trigger: {reason}).")
+    return True
+
+
 @shared_task
 def check_node_health():
     """
     Periodically checks node heartbeats and updates their status based on inactivity.
-    - Any 'active' node that hasn't had a heartbeat in the last 2 minutes becomes 'inactive'.
-    - Delegates task handling logic to TaskManager.
+    - Any 'active' or 'busy' node that hasn't had a heartbeat in the last 2 minutes becomes 'inactive'
+      and records when in inactive_since. Only nodes that newly went silent are read: they come from a
+      range read of the heartbeat sorted set in Redis (see hub.heartbeats.expired), and each node is
+      processed once on its active -> inactive edge, nodes already inactive are not revisited.
+    - Reclaims the assignments of inactive nodes through TaskManager, right away or, with
+      NODE_RECLAIM_GRACE_SECONDS, once a node stayed inactive that long (a node back in time keeps its work).
     """
-    threshold_inactive = timezone.now() - timedelta(minutes=2)
-
-    inactive_nodes = Node.objects.filter(
-        Q(
-        last_heartbeat__lt=threshold_inactive,
-        status='active'
-    ) | Q(
-            status='inactive')
-    )
-    if inactive_nodes.exists():
-        node_ids = list(inactive_nodes.values_list('id', flat=True))
-        count_inactive = inactive_nodes.update(status='inactive')
+    now = timezone.now()
+    threshold_inactive = now - timedelta(minutes=2)
+
+    node_ids = []
+    stale_ids = heartbeats.expired(threshold_inactive)
+    if stale_ids:
+        with transaction.atomic():
+            # Row locks make the edge exactly-once when health checks overlap: a concurrent run skips these rows
+            locked_ids = list(
+                Node.objects.select_for_update(skip_locked=True)
+                .filter(id__in=stale_ids, status__in=heartbeats.LIVE_STATUSES)
+                .values_list('id', flat=True)
+            )
+            # The status cache goes first, so a heartbeat arriving now takes the database path: it waits for
+            # these row locks and reactivates the node. Heartbeats recorded before that only moved the node's
+            # last_seen score, so nodes that heartbeated since expired() was read are left alone.
+            heartbeats.evict(locked_ids)
+            seen = heartbeats.last_seen(locked_ids)
+            node_ids = [node_id for node_id in locked_ids if node_id not in seen or seen[node_id] < threshold_inactive]
+            count_inactive = Node.objects.filter(id__in=node_ids).update(status='inactive', inactive_since=now, updated_at=now)
+            # Rows skipped (locked by another writer, or heartbeated meanwhile) are still live: they stay tracked
+            skipped_ids = set(
+                Node.objects.filter(id__in=stale_ids, status__in=heartbeats.LIVE_STATUSES)
+                .exclude(id__in=node_ids).values_list('id', flat=True)
+            )
         logger.info(f"[check_node_health] {count_inactive} node(s) marked inactive.")
+        heartbeats.untrack([node_id for node_id in stale_ids if node_id not in skipped_ids], before=threshold_inactive)
+        if node_ids:
+            # Queryset update bypasses the save signals
+            activity_counters.record_nodes(Node.objects.filter(id__in=node_ids))
+
+    grace = settings.NODE_RECLAIM_GRACE_SECONDS
+    if grace:
+        # Driven by the open assignments, so the cost follows in-flight work rather than the inactive population
+        reclaim_ids = list(
+            TaskAssignment.objects.filter(
+                completed_at__isnull=True,
+                node__status='inactive',
+                node__inactive_since__lte=now - timedelta(seconds=grace),
+            ).values_list('node_id', flat=True).distinct()
+        )
+    else:
+        reclaim_ids = node_ids
 
+    if reclaim_ids:
         # Delegate task handling to TaskManager
         manager = TaskManager()
-        manager.handle_tasks_for_inactive_nodes(node_ids)
+        manager.handle_tasks_for_inactive_nodes(reclaim_ids)
+        request_orchestration("node_inactive")
 
     logger.info("[check_node_health] Node health check complete.")
 
 
 @shared_task
-def reorder_active_queue_task(*args, **kwargs):
+def flush_heartbeats_task():
+    """Persist the heartbeats written behind to Redis since the last flush, and their per-minute history."""
+    heartbeats.flush()
+    heartbeat_history.flush()
+
+
+@shared_task
+def purge_heartbeat_history_task():
+    """Delete heartbeat history older than the retention period."""
+    heartbeat_history.purge()
+
+
+class StaleFencingToken(Exception):
+    """Raised to roll back a step whose orchestration lease was taken over by a newer pass."""
+
+
+def _holds_orchestration_lease(fencing_token, step):
+    """
+    Renew the orchestration lease for this pass. Steps invoked outside a pass (no token) always run;
+    steps of a pass whose lease expired and was taken over by a newer one are skipped.
+    """
+    if fencing_token is None or orchestration_lease.renew_lease(fencing_token):
+        return True
+    logger.warning(f"[{step}] Orchestration lease lost (fencing token {fencing_token}). Skipping step.")
+    return False
+
+
+@shared_task
+def reorder_active_queue_task(*args, fencing_token=None, **kwargs):
     """Celery task to reorder the active task queue. Delegates to TaskManager."""
+    if not _holds_orchestration_lease(fencing_token, "reorder_active_queue_task"):
+        return
     manager = TaskManager()
     manager.reorder_active_queue()
 
 
 @shared_task
-def handle_stale_tasks_task(*args, **kwargs):
+def handle_stale_tasks_task(*args, fencing_token=None, **kwargs):
     """Celery task to handle stale tasks. Delegates to TaskManager."""
+    if not _holds_orchestration_lease(fencing_token, "handle_stale_tasks_task"):
+        return
     manager = TaskManager()
     manager.handle_stale_tasks()
 
 
 @shared_task
-def move_tasks_to_active_queue_task(*args, **kwargs):
+def move_tasks_to_active_queue_task(*args, fencing_token=None, **kwargs):
     """Celery task to move tasks from the pending queue to the active queue. Delegates to TaskManager."""
+    if not _holds_orchestration_lease(fencing_token, "move_tasks_to_active_queue_task"):
+        return
     manager = TaskManager()
     manager.move_tasks_to_active_queue()
 
 
 @shared_task
-def assign_tasks_to_nodes_task(*args, **kwargs):
-    """Celery task to assign tasks to nodes. Delegates to TaskManager."""
+def assign_tasks_to_nodes_task(*args, fencing_token=None, **kwargs):
+    """
+    Celery task to assign tasks to nodes. Delegates to TaskManager.
+    The fencing token is enforced by the database (see orchestration_lease.enter_fence): the step runs
+    holding the fence row lock and is rolled back if a newer pass already wrote, so a pass that overran
+    its lease can never race a newer one into duplicate assignments.
+    """
+    if not _holds_orchestration_lease(fencing_token, "assign_tasks_to_nodes_task"):
+        return
     manager = TaskManager()
-    manager.assign_tasks_to_nodes()
+    try:
+        with transaction.atomic():
+            if fencing_token is not None and not orchestration_lease.enter_fence(fencing_token):
+                raise StaleFencingToken(fencing_token)
+            manager.assign_tasks_to_nodes()
+            if fencing_token is not None and not orchestration_lease.holds_lease(fencing_token):
+                raise StaleFencingToken(fencing_token)
+    except StaleFencingToken:
+        logger.warning(
+            f"[assign_tasks_to_nodes_task] Lease lost during assignment (fencing token {fencing_token}). Rolled back."
+        )
 
 
 @shared_task
-def retry_failed_tasks_task(*args, **kwargs):
+def retry_failed_tasks_task(*args, fencing_token=None, **kwargs):
     """Celery task to retry failed tasks. Delegates to TaskManager."""
+    if not _holds_orchestration_lease(fencing_token, "retry_failed_tasks_task"):
+        return
     manager = TaskManager()
     manager.retry_failed_tasks()
 
 
 @shared_task
-def handle_persistently_failing_tasks_task(*args, **kwargs):
+def handle_persistently_failing_tasks_task(*args, fencing_token=None, **kwargs):
     """Celery task to handle persistently failing tasks. Delegates to TaskManager."""
+    if not _holds_orchestration_lease(fencing_token, "handle_persistently_failing_tasks_task"):
+        return
     manager = TaskManager()
     manager.handle_persistently_failing_tasks()
 
 
+@shared_task
+def release_orchestration_lease_task(*args, fencing_token=None, **kwargs):
+    """
+    Final step (and error callback) of an orchestration pass: release the lease and, if passes
+    were requested while this one ran, start exactly one follow-up pass.
+    """
+    orchestration_lease.release_lease(fencing_token)
+    if orchestration_lease.pop_rerun():
+        orchestrate_task_distribution.apply_async(kwargs={"reason": "queued"})
+        logger.info("[release_orchestration_lease_task] Follow-up orchestration pass started for queued triggers.")
+
+
+@shared_task
+def rebuild_priority_index_task(*args, **kwargs):
+    """Celery task to reconcile the Redis priority index with the database (corrects drift)."""
+    indexed_count = priority_index.rebuild()
+    logger.info(f"[rebuild_priority_index_task] Re-indexed {indexed_count} task(s).")
+
+
+@shared_task
+def reconcile_network_activity_task(*args, **kwargs):
+    """Celery task to recompute the Redis network activity counters from the database (corrects drift)."""
+    data = activity_counters.reconcile()
+    logger.info(
+        f"[reconcile_network_activity_task] Counters reconciled "
+        f"({data['active_nodes']} active node(s), {data['pending_tasks']} pending task(s))."
+    )
+    # Resynchronise dashboards with the corrected counters
+    publish_network_activity(force_keyframe=True)
+
+
+@shared_task
+def flush_network_activity_task(*args, **kwargs):
+    """Celery task publishing the trailing network activity frame of a coalescing window."""
+    redis_client.delete(settings.REDIS_NETWORK_ACTIVITY_PENDING_KEY)
+    publish_network_activity()
+
+
 @shared_task
 def validate_docker_image_task(task_id):
     """ Celery task to validate a Docker image for a given task ID. Delegates to TaskManager."""
@@ -85,28 +250,45 @@ def validate_docker_image_task(task_id):
     status = manager.validate_docker_image(task_id)
     if 'error' in status:
         logger.error(f"[validate_docker_image_task] Error validating Docker image for task {task_id}: {status['error']}")
+    else:
+        request_orchestration("task_pending")
 
 
 @shared_task
-def orchestrate_task_distribution():
+def orchestrate_task_distribution(reason="beat", requested_at=None):
     """
     Orchestrates the task distribution workflow using Celery's `group` and `chain`.
+    Runs on the beat schedule and, debounced, on events via `request_orchestration`.
     """
+    if requested_at is not None:
+        logger.info(
+            f"[orchestrate_task_distribution] Triggered by '{reason}' "
+            f"{time.time() - requested_at:.2f}s after the first coalesced event."
+        )
+
+    # Single-flight: at most one pass runs cluster-wide, concurrent requests collapse into one follow-up
+    fencing_token = orchestration_lease.acquire_lease()
+    if fencing_token is None:
+        orchestration_lease.request_rerun()
+        logger.info("[orchestrate_task_distribution] Pass already running. Follow-up pass queued.")
+        return
+
     # Parallel tasks
     parallel_tasks = group(
-        reorder_active_queue_task.s(),
-        handle_stale_tasks_task.s()
+        reorder_active_queue_task.s(fencing_token=fencing_token),
+        handle_stale_tasks_task.s(fencing_token=fencing_token)
     )
 
     # Sequential tasks
     sequential_tasks = chain(
-        move_tasks_to_active_queue_task.s(),
-        assign_tasks_to_nodes_task.s(),
-        retry_failed_tasks_task.s(),
-        handle_persistently_failing_tasks_task.s()
+        move_tasks_to_active_queue_task.s(fencing_token=fencing_token),
+        assign_tasks_to_nodes_task.s(fencing_token=fencing_token),
+        retry_failed_tasks_task.s(fencing_token=fencing_token),
+        handle_persistently_failing_tasks_task.s(fencing_token=fencing_token),
+        release_orchestration_lease_task.s(fencing_token=fencing_token)
     )
 
     # Trigger the workflow
     workflow = chain(parallel_tasks, sequential_tasks)
-    workflow.apply_async()
-    logger.info("[orchestrate_task_distribution] Task distribution workflow initiated.")
+    workflow.apply_async(link_error=release_orchestration_lease_task.si(fencing_token=fencing_token))
+    logger.info(f"[orchestrate_task_distribution] Task distribution workflow initiated (fencing token {fencing_token}).")
@@ -0,0 +1,24 @@
+import pytest
+from django.conf import settings
+
+from hub import priority_index
+from hub.redis_publisher import redis_client
+
+
+@pytest.fixture(autouse=True)
+def clear_redis_state():
+    """Redis state (priority index, orchestration keys, activity counters, SSE replay streams, heartbeats) outlives the per-test DB transaction, so start every test empty."""
+    priority_index.clear()
+    redis_client.delete(
+        settings.REDIS_ORCHESTRATION_DEBOUNCE_KEY,
+        settings.REDIS_ORCHESTRATION_LEASE_KEY,
+        settings.REDIS_ORCHESTRATION_RERUN_KEY,
+        settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY,
+        settings.REDIS_NETWORK_ACTIVITY_NODES_KEY,
+        settings.REDIS_NETWORK_ACTIVITY_THROTTLE_KEY,
+        settings.REDIS_NETWORK_ACTIVITY_PENDING_KEY,
+        settings.REDIS_NETWORK_ACTIVITY_LAST_FRAME_KEY,
+        *redis_client.scan_iter(f"{settings.REDIS_SSE_STREAM_PREFIX}:*"),
+        *redis_client.scan_iter(f"{settings.REDIS_HEARTBEATS_PREFIX}:*"),
+    )
+    yield
@@ -15,7 +15,7 @@ class NodeFactory(factory.django.DjangoModelFactory):
     status = "active"
     trust_index = 7.5
     resources_capacity = {"cpu": 4, "ram": 16}
-    free_resources = {"cpu": 2, "ram": 8}
+    free_resources = {"free_cpu": 2, "free_ram": 8}  # as reported by the node agent
     last_heartbeat = factory.LazyFunction(timezone.now)
 
 
@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+from unittest.mock import patch
+from django.conf import settings
+from django.utils import timezone
+from freezegun import freeze_time
+
+from hub import activity_counters
+from hub.redis_publisher import event_stream_key, redis_client, publish_network_activity, \
+    publish_network_activity_frame
+from hub.task_manager import TaskManager
+from hub.tasks import check_node_health, flush_network_activity_task
+from hub.tests.factories import NodeFactory, TaskFactory, TaskAssignmentFactory
+
+
+@pytest.mark.django_db
+class TestActivityCounters:
+    """Tests for the incrementally maintained network activity counters."""
+
+    def test_incremental_counters_match_database(self, django_capture_on_commit_callbacks):
+        activity_counters.reconcile()
+        node = NodeFactory(status="active", trust_index=8.0, free_resources={"free_cpu": 2, "free_ram": 4})
+        NodeFactory(status="active", trust_index=6.0, free_resources={"free_cpu": 1.5, "free_ram": 2})
+        NodeFactory(status="inactive", free_resources={"free_cpu": 8, "free_ram": 8})
+        tasks = TaskFactory.create_batch(4, status="pending")
+        TaskFactory(status="completed").delete()
+
+        with django_capture_on_commit_callbacks(execute=True):  # transition events are emitted on commit
+            TaskManager().move_tasks_to_active_queue()
+        tasks[0].refresh_from_db()
+        tasks[0].status = "failed"
+        tasks[0].save()
+        node.free_resources = {"free_cpu": 0.5, "free_ram": 1}
+        node.save()
+
+        incremental = activity_counters.snapshot()
+        assert incremental == activity_counters.reconcile()
+        assert incremental["active_nodes"] == 2
+        assert incremental["total_cpu"] == 2.0
+        assert incremental["average_trust_index"] == 7.0
+        assert incremental["failed_tasks"] == 1
+
+    def test_queryset_updates_are_counted(self, django_capture_on_commit_callbacks):
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            node = NodeFactory(status="active", free_resources={"free_cpu": 2, "free_ram": 2})
+        task = TaskFactory(status="in_progress")
+        TaskAssignmentFactory(task=task, node=node)
+        activity_counters.reconcile()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            check_node_health()
+
+        incremental = activity_counters.snapshot()
+        assert incremental == activity_counters.reconcile()
+        assert incremental["active_nodes"] == 0
+        assert incremental["in_queue_tasks"] == 1
+
+    def test_snapshot_is_query_free(self, django_assert_num_queries):
+        TaskFactory.create_batch(3, status="pending")
+        activity_counters.reconcile()
+        with django_assert_num_queries(0):
+            assert activity_counters.snapshot()["pending_tasks"] == 3
+
+    def test_reconcile_corrects_drift(self):
+        TaskFactory.create_batch(2, status="pending")
+        activity_counters.reconcile()
+        redis_client.hset(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY, "tasks:pending", 40)
+
+        assert activity_counters.snapshot()["pending_tasks"] == 40
+        assert activity_counters.reconcile()["pending_tasks"] == 2
+
+    def test_uninitialised_counters_are_rebuilt(self):
+        TaskFactory.create_batch(2, status="pending")
+        redis_client.delete(settings.REDIS_NETWORK_ACTIVITY_COUNTERS_KEY)
+        TaskFactory(status="pending")  # increment on a missing hash
+
+        assert activity_counters.snapshot()["pending_tasks"] == 3
+
+
+def _frames():
+    """Network activity frames published so far, read back from the channel's replay stream."""
+    stream = event_stream_key(settings.REDIS_NETWORK_ACTIVITY_CHANNEL)
+    return [json.loads(fields[b"data"]) for _, fields in redis_client.xrange(stream)]
+
+
+@pytest.mark.django_db
+class TestNetworkActivityPublisher:
+    """Tests for the rate-limited, delta-encoded network_activity publisher."""
+
+    @patch("hub.tasks.flush_network_activity_task.apply_async")
+    def test_burst_is_coalesced_into_one_frame_and_one_trailing_flush(self, mock_flush):
+        TaskFactory.create_batch(5, status="pending")
+
+        assert len(_frames()) == 1
+        mock_flush.assert_called_once()
+
+    @patch("hub.tasks.flush_network_activity_task.apply_async")
+    def test_trailing_frame_is_a_delta_of_changed_fields(self, mock_flush, settings):
+        settings.NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND = 20
+        TaskFactory(status="pending")
+        TaskFactory(status="pending")
+        time.sleep(0.06)
+        flush_network_activity_task()
+
+        keyframe, delta = _frames()
+        assert keyframe["frame"] == "keyframe" and keyframe["data"]["pending_tasks"] == 1
+        assert len(keyframe["data"]) == 10
+        assert (delta["frame"], delta["seq"]) == ("delta", keyframe["seq"] + 1)
+        assert delta["data"] == {"pending_tasks": 2}
+
+    def test_unchanged_snapshot_publishes_nothing(self, settings):
+        settings.NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND = 1000
+        assert publish_network_activity() is True
+        time.sleep(0.01)
+        assert publish_network_activity() is False
+        assert len(_frames()) == 1
+
+    def test_forced_keyframe_bypasses_throttle(self):
+        publish_network_activity()
+        publish_network_activity(force_keyframe=True)
+        assert [frame["frame"] for frame in _frames()] == ["keyframe", "keyframe"]
+
+    @patch("hub.tasks.flush_network_activity_task.apply_async")
+    def test_concurrent_frames_never_share_a_seq(self, mock_flush):
+        from hub import redis_publisher
+        publish_network_activity_frame(force_keyframe=True)
+        TaskFactory.create_batch(2, status="pending")
+        snapshot = redis_publisher.get_network_activity_data
+        raced = []
+
+        def snapshot_then_race():
+            data = snapshot()
+            if not raced:  # a forced keyframe is published while this delta is being computed
+                raced.append(True)
+                publish_network_activity_frame(force_keyframe=True)
+            return data
+
+        with patch("hub.redis_publisher.get_network_activity_data", side_effect=snapshot_then_race):
+            assert publish_network_activity_frame() is False  # recomputed against the keyframe: nothing changed
+
+        frames = _frames()
+        assert [frame["seq"] for frame in frames] == list(range(1, len(frames) + 1))
+        assert frames[-1]["frame"] == "keyframe"
@@ -1,4 +1,6 @@
 import http
+import time
+from unittest.mock import patch
 
 import pytest
 from rest_framework.test import APIClient
@@ -20,7 +22,7 @@ class TestNodeAPI:
             "name": "NodeAlpha",
             "ip_address": "10.0.0.1",
             "resources_capacity": {"cpu": 4, "ram": 8},
-            "free_resources": {"cpu": 2, "ram": 4}
+            "free_resources": {"free_cpu": 2, "free_ram": 4}
         }
         response = self.client.post(reverse("register_node"), data=payload, format="json")
         assert response.status_code == 201
@@ -34,7 +36,7 @@ class TestNodeAPI:
         NodeFactory.create_batch(3)
         response = self.client.get(reverse("list_nodes"))
         assert response.status_code == 200
-        assert len(response.data) == 3
+        assert len(response.data["results"]) == 3
 
     def test_fetch_node_by_id(self):
         node = NodeFactory()
@@ -55,15 +57,36 @@ class TestHeartbeatAPI:
         self.client = APIClient()
 
     def test_heartbeat_updates_node(self):
-        node = NodeFactory(status="inactive", free_resources={"cpu": 1})
+        node = NodeFactory(status="inactive", free_resources={"free_cpu": 1})
         response = self.client.post(reverse("node_heartbeat"), data={
             "node_id": str(node.id),
-            "free_resources": {"cpu": 3, "ram": 5}
+            "free_resources": {"free_cpu": 3, "free_ram": 5}
         }, format="json")
         node.refresh_from_db()
         assert response.status_code == 200
         assert node.status == "active"
-        assert node.free_resources["cpu"] == 3
+        assert node.free_resources["free_cpu"] == 3
+
+    @patch("hub.views.request_orchestration")
+    def test_heartbeat_triggers_orchestration_when_node_becomes_active(self, mock_request):
+        node = NodeFactory(status="inactive")
+        self.client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+        mock_request.assert_called_once_with("node_active")
+
+    @patch("hub.views.request_orchestration")
+    def test_heartbeat_triggers_orchestration_on_more_free_resources(self, mock_request):
+        node = NodeFactory(status="active", free_resources={"free_cpu": 1, "free_ram": 2})
+        self.client.post(reverse("node_heartbeat"), data={
+            "node_id": str(node.id),
+            "free_resources": {"free_cpu": 1, "free_ram": 2}
+        }, format="json")
+        mock_request.assert_not_called()
+
+        self.client.post(reverse("node_heartbeat"), data={
+            "node_id": str(node.id),
+            "free_resources": {"free_cpu": 3, "free_ram": 2}
+        }, format="json")
+        mock_request.assert_called_once_with("node_free_resources")
 
     def test_heartbeat_missing_node_id(self):
         response = self.client.post(reverse("node_heartbeat"), data={}, format="json")
@@ -114,7 +137,7 @@ class TestTaskAPI:
         TaskFactory.create_batch(2)
         response = self.client.get(reverse("list_tasks"))
         assert response.status_code == 200
-        assert len(response.data) == 2
+        assert len(response.data["results"]) == 2
 
     def test_get_task_with_assignment(self):
         node = NodeFactory()
@@ -166,6 +189,53 @@ class TestTaskAssignmentAPI:
         assert response.status_code == 200
         assert response.data["id"] == str(task.id)
 
+    def test_fetch_task_batch_returns_oldest_assignments_and_marks_them_started(self, django_assert_num_queries):
+        node = NodeFactory()
+        tasks = TaskFactory.create_batch(3)
+        for task in tasks:
+            TaskAssignment.objects.create(task=task, node=node)
+
+        with django_assert_num_queries(4):  # node, assignments with tasks, their assigned nodes, UPDATE
+            response = self.client.get(reverse("fetch_task"), {"node_id": str(node.id), "max_tasks": 2})
+
+        assert response.status_code == 200
+        assert [task["id"] for task in response.data] == [str(task.id) for task in tasks[:2]]
+        started = TaskAssignment.objects.filter(node=node, started_at__isnull=False)
+        assert set(started.values_list("task_id", flat=True)) == {task.id for task in tasks[:2]}
+
+    def test_fetch_task_again_keeps_started_at(self):
+        node = NodeFactory()
+        assignment = TaskAssignment.objects.create(task=TaskFactory(), node=node)
+        self.client.get(reverse("fetch_task"), {"node_id": str(node.id)})
+        assignment.refresh_from_db()
+        started_at = assignment.started_at
+
+        self.client.get(reverse("fetch_task"), {"node_id": str(node.id)})
+        assignment.refresh_from_db()
+        assert started_at is not None and assignment.started_at == started_at
+
+    def test_fetch_task_batch_rejects_invalid_max_tasks(self):
+        node = NodeFactory()
+        response = self.client.get(reverse("fetch_task"), {"node_id": str(node.id), "max_tasks": 0})
+        assert response.status_code == 400
+
+    def test_fetch_task_long_poll_returns_existing_assignment_immediately(self):
+        node = NodeFactory()
+        task = TaskFactory()
+        TaskAssignment.objects.create(task=task, node=node)
+        start = time.monotonic()
+        response = self.client.get(reverse("fetch_task"), {"node_id": str(node.id), "wait": 10})
+        assert response.status_code == 200
+        assert response.data["id"] == str(task.id)
+        assert time.monotonic() - start < 5
+
+    def test_fetch_task_long_poll_times_out(self):
+        node = NodeFactory()
+        start = time.monotonic()
+        response = self.client.get(reverse("fetch_task"), {"node_id": str(node.id), "wait": 0.2})
+        assert response.status_code == 404
+        assert time.monotonic() - start >= 0.2
+
     def test_submit_task_result_success(self):
         node = NodeFactory()
         task = TaskFactory(status="in_progress")
@@ -178,6 +248,18 @@ class TestTaskAssignmentAPI:
         response = self.client.post(reverse("submit_task_result"), data=payload, format="json")
         assert response.status_code == 200
 
+    @patch("hub.views.request_orchestration")
+    def test_submit_task_result_triggers_orchestration(self, mock_request):
+        node = NodeFactory()
+        task = TaskFactory(status="in_progress")
+        TaskAssignment.objects.create(task=task, node=node)
+        self.client.post(reverse("submit_task_result"), data={
+            "task_id": str(task.id),
+            "node_id": str(node.id),
+            "result": {"output": "42"}
+        }, format="json")
+        mock_request.assert_called_once_with("assignment_completed")
+
     def test_submit_task_result_twice(self):
         node = NodeFactory()
         task = TaskFactory(status="in_progress")
@@ -218,7 +300,24 @@ class TestTaskQueries:
         TaskFactory.create_batch(2, submitted_by=node)
         response = self.client.get(reverse("get_submitted_tasks"), {"node_id": node.id})
         assert response.status_code == 200
-        assert len(response.data) == 2
+        assert len(response.data["results"]) == 2
+
+    def test_get_submitted_tasks_since_returns_only_updated_tasks(self):
+        node = NodeFactory()
+        unchanged, changed = TaskFactory.create_batch(2, submitted_by=node, status="pending")
+        since = timezone.now()
+        changed.status = "in_queue"
+        changed.save()
+
+        response = self.client.get(reverse("get_submitted_tasks"), {"node_id": node.id, "since": since.isoformat()})
+
+        assert response.status_code == 200
+        assert [task["id"] for task in response.data["results"]] == [str(changed.id)]
+
+    def test_get_submitted_tasks_invalid_since(self):
+        node = NodeFactory()
+        response = self.client.get(reverse("get_submitted_tasks"), {"node_id": node.id, "since": "yesterday"})
+        assert response.status_code == 400
 
     def test_get_submitted_tasks_invalid_node(self):
         response = self.client.get(reverse("get_submitted_tasks"), {"node_id": "00000000-0000-0000-0000-000000000000"})
@@ -229,6 +328,84 @@ class TestTaskQueries:
         assert response.status_code == 400
 
 
+@pytest.mark.django_db
+class TestListPagination:
+    """Test cases for keyset pagination, sparse fieldsets and filters of the list endpoints."""
+
+    def setup_method(self):
+        self.client = APIClient()
+
+    def _all_pages(self, url, params):
+        ids, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            assert response.status_code == 200
+            ids += [row["id"] for row in response.data["results"]]
+            pages += 1
+            if response.data["next"] is None:
+                return ids, pages
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_walks_every_row_once_in_creation_order(self):
+        nodes = NodeFactory.create_batch(5)
+        # Rows created in the same instant are ordered by id
+        Node.objects.filter(id__in=[nodes[1].id, nodes[2].id]).update(created_at=nodes[1].created_at)
+
+        ids, pages = self._all_pages(reverse("list_nodes"), {"limit": 2})
+
+        expected = Node.objects.order_by("created_at", "id").values_list("id", flat=True)
+        assert ids == [str(node_id) for node_id in expected]
+        assert pages == 3
+
+    def test_limit_is_capped(self, settings):
+        settings.API_MAX_PAGE_SIZE = 2
+        TaskFactory.create_batch(3)
+        response = self.client.get(reverse("list_tasks"), {"limit": 100})
+        assert len(response.data["results"]) == 2
+        assert response.data["next"] is not None
+
+    def test_sparse_fieldset(self):
+        TaskFactory(status="pending")
+        response = self.client.get(reverse("list_tasks"), {"fields": "id,status"})
+        assert response.data["results"] == [{"id": response.data["results"][0]["id"], "status": "pending"}]
+
+    @pytest.mark.parametrize("params", [
+        {"cursor": "not-a-cursor"},
+        {"limit": "0"},
+        {"limit": "many"},
+        {"fields": "id,secret"},
+        {"status": "sleeping"},
+    ])
+    def test_invalid_parameters(self, params):
+        response = self.client.get(reverse("list_nodes"), params)
+        assert response.status_code == 400
+
+    def test_filters(self):
+        node = NodeFactory(status="active")
+        NodeFactory(status="inactive")
+        wanted = TaskFactory(submitted_by=node, status="failed")
+        TaskFactory(submitted_by=node, status="completed")
+        TaskFactory(status="failed")
+
+        response = self.client.get(reverse("list_nodes"), {"status": "active,busy"})
+        assert [row["id"] for row in response.data["results"]] == [str(node.id)]
+        response = self.client.get(reverse("list_tasks"), {"status": "failed", "submitted_by": str(node.id)})
+        assert [row["id"] for row in response.data["results"]] == [str(wanted.id)]
+        response = self.client.get(reverse("get_submitted_tasks"), {"node_id": node.id, "status": "failed"})
+        assert [row["id"] for row in response.data["results"]] == [str(wanted.id)]
+        response = self.client.get(reverse("list_tasks"), {"submitted_by": "nobody"})
+        assert response.status_code == 400
+
+    def test_query_count_does_not_grow_with_page_size(self, django_assert_num_queries):
+        nodes = NodeFactory.create_batch(3)
+        for task in TaskFactory.create_batch(20):
+            task.assigned_nodes.set(nodes)
+
+        with django_assert_num_queries(2):  # the page, then one prefetch of the assigned nodes
+            response = self.client.get(reverse("list_tasks"), {"limit": 20})
+        assert all(len(row["assigned_nodes"]) == 3 for row in response.data["results"])
+
+
 @pytest.mark.django_db
 class TestNetworkActivity:
     """Test cases for Network Activity API endpoint."""
@@ -243,6 +420,76 @@ class TestNetworkActivity:
         assert "data" in response.data
 
 
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Test cases for ETag / If-None-Match handling of the polled detail endpoints."""
+
+    def setup_method(self):
+        self.client = APIClient()
+
+    def _revalidate(self, url, params=None):
+        response = self.client.get(url, params)
+        assert response.status_code == 200
+        assert response["ETag"].startswith('W/"')
+        assert "max-age" in response["Cache-Control"]
+        return response["ETag"]
+
+    def test_unchanged_task_is_not_modified_without_serializing(self, django_assert_num_queries):
+        task = TaskFactory()
+        url = reverse("get_task", kwargs={"task_id": task.id})
+        etag = self._revalidate(url)
+
+        with patch("hub.views.TaskSerializer") as serializer, django_assert_num_queries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert "max-age" in response["Cache-Control"]
+        serializer.assert_not_called()
+
+    def test_task_etag_follows_status_stale_count_and_assignments(self):
+        task = TaskFactory(status="pending")
+        node = NodeFactory()
+        url = reverse("get_task", kwargs={"task_id": task.id})
+
+        etags = [self._revalidate(url, {"node_id": str(node.id)})]
+        task.mark_stale()
+        etags.append(self._revalidate(url, {"node_id": str(node.id)}))
+        assignment = TaskAssignment.objects.create(task=task, node=node)
+        etags.append(self._revalidate(url, {"node_id": str(node.id)}))
+        TaskAssignment.objects.filter(id=assignment.id).update(completed_at=timezone.now(), result={"output": "42"})
+        etags.append(self._revalidate(url, {"node_id": str(node.id)}))
+        etags.append(self._revalidate(url))
+        assert len(set(etags)) == len(etags)
+
+        response = self.client.get(url, {"node_id": str(node.id)}, HTTP_IF_NONE_MATCH=etags[0])
+        assert response.status_code == 200
+        assert response.data["assignment"]["result"] == {"output": "42"}
+
+    def test_node_etag_follows_updates(self):
+        node = NodeFactory(status="inactive")
+        url = reverse("fetch_node", kwargs={"node_id": node.id})
+        etag = self._revalidate(url)
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        self.client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["status"] == "active"
+
+    def test_network_activity_etag_follows_counters(self):
+        etag = self._revalidate(reverse("network_activity"))
+        assert self.client.get(reverse("network_activity"), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        NodeFactory(status="active")
+        assert self.client.get(reverse("network_activity"), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_unknown_objects_are_not_cached(self):
+        response = self.client.get(reverse("fetch_node", kwargs={"node_id": "00000000-0000-0000-0000-000000000000"}))
+        assert response.status_code == 404
+        assert not response.has_header("ETag")
+        assert not response.has_header("Cache-Control")
+
+
 @pytest.mark.django_db
 class TestSSEViews:
     """Test cases for Server-Sent Events (SSE) endpoints."""
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from hub.exports import ASSIGNMENT_COLUMNS, TASK_COLUMNS
+from hub.models import Task, TaskAssignment
+from hub.tests.factories import NodeFactory, TaskAssignmentFactory, TaskFactory
+
+
+@pytest.mark.django_db
+class TestExports:
+    """Test cases for the streaming NDJSON/CSV exports of tasks and assignments."""
+
+    def setup_method(self):
+        self.client = Client()
+
+    @staticmethod
+    async def _read(content):
+        return b"".join([chunk async for chunk in content])
+
+    def _get(self, name, params=None):
+        response = self.client.get(reverse(name), params or {})
+        if response.streaming:
+            return response, async_to_sync(self._read)(response.streaming_content).decode()
+        return response, response.content.decode()
+
+    def test_tasks_stream_as_ndjson_across_chunks(self, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+        tasks = TaskFactory.create_batch(5, result={"trust_score": 7})
+
+        response, body = self._get("export_tasks")
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in body.splitlines()]
+        assert [row["id"] for row in rows] == [str(task.id) for task in sorted(tasks, key=lambda t: (t.created_at, t.id))]
+        assert set(rows[0]) == set(TASK_COLUMNS)
+        assert rows[0]["result"] == {"trust_score": 7}
+
+    def test_assignments_stream_as_csv(self):
+        assignment = TaskAssignmentFactory(task=TaskFactory(status="in_progress"), reserved_cpu=2)
+
+        response, body = self._get("export_assignments", {"format": "csv"})
+
+        assert response["Content-Type"] == "text/csv"
+        header, row = list(csv.reader(io.StringIO(body)))
+        assert header == list(ASSIGNMENT_COLUMNS)
+        row = dict(zip(header, row))
+        assert row["id"] == str(assignment.id)
+        assert row["task_status"] == "in_progress"
+        assert float(row["reserved_cpu"]) == 2
+        assert row["completed_at"] == ""
+
+    def test_status_and_time_range_filters(self):
+        old, recent, other = TaskFactory(status="failed"), TaskFactory(status="failed"), TaskFactory(status="pending")
+        now = timezone.now()
+        Task.objects.filter(id=old.id).update(created_at=now - timezone.timedelta(days=2))
+        for task in (old, recent, other):
+            TaskAssignmentFactory(task=task, node=NodeFactory())
+        TaskAssignment.objects.filter(task=old).update(assigned_at=now - timezone.timedelta(days=2))
+        since = (now - timezone.timedelta(days=1)).isoformat()
+
+        _, body = self._get("export_tasks", {"status": "failed,validated", "since": since})
+        assert [json.loads(line)["id"] for line in body.splitlines()] == [str(recent.id)]
+        _, body = self._get("export_tasks", {"until": since})
+        assert [json.loads(line)["id"] for line in body.splitlines()] == [str(old.id)]
+        _, body = self._get("export_assignments", {"status": "failed", "since": since})
+        assert [json.loads(line)["task_id"] for line in body.splitlines()] == [str(recent.id)]
+
+    @pytest.mark.parametrize("params", [
+        {"format": "xml"},
+        {"status": "sleeping"},
+        {"since": "yesterday"},
+    ])
+    def test_invalid_parameters(self, params):
+        response, body = self._get("export_tasks", params)
+        assert response.status_code == 400
+        assert "error" in json.loads(body)
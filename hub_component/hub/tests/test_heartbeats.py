@@ -0,0 +1,290 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from hub import heartbeat_history, heartbeats
+from hub.models import Heartbeat, HeartbeatRollup, Node, TaskAssignment
+from hub.redis_publisher import redis_client
+from hub.tasks import check_node_health, flush_heartbeats_task
+from hub.tests.factories import HeartbeatFactory, NodeFactory, TaskAssignmentFactory, TaskFactory
+
+
+@pytest.mark.django_db
+class TestHeartbeatWriteBehind:
+    """Tests for heartbeats recorded in Redis and flushed to the database in batches."""
+
+    def setup_method(self):
+        self.client = APIClient()
+
+    def _heartbeat(self, node, free_resources=None):
+        data = {"node_id": str(node.id)}
+        if free_resources is not None:
+            data["free_resources"] = free_resources
+        return self.client.post(reverse("node_heartbeat"), data=data, format="json")
+
+    def test_heartbeats_of_active_node_skip_the_database(self, django_assert_num_queries):
+        node = NodeFactory(status="inactive", free_resources={"free_cpu": 1})
+        self._heartbeat(node)  # becomes active through the database path and is cached
+
+        with django_assert_num_queries(0):
+            response = self._heartbeat(node, {"free_cpu": 2, "free_ram": 4})
+        assert response.status_code == 200
+        node.refresh_from_db()
+        assert node.free_resources == {"free_cpu": 1}
+
+    def test_flush_persists_latest_heartbeats(self, django_assert_num_queries):
+        nodes = NodeFactory.create_batch(3, status="inactive", free_resources={"free_cpu": 1})
+        for node in nodes:
+            self._heartbeat(node)
+        for cpu, node in enumerate(nodes, start=2):
+            self._heartbeat(node, {"free_cpu": cpu})
+        seen_at = heartbeats.last_seen([node.id for node in nodes])
+
+        with django_assert_num_queries(2):  # load the dirty nodes, one bulk UPDATE
+            assert heartbeats.flush() == 3
+
+        for cpu, node in enumerate(nodes, start=2):
+            node.refresh_from_db()
+            assert node.free_resources == {"free_cpu": cpu}
+            assert node.last_heartbeat == seen_at[node.id]
+        flush_heartbeats_task()
+        assert heartbeats.flush() == 0
+
+    def test_status_change_sends_next_heartbeat_to_the_database(self):
+        node = NodeFactory(status="inactive")
+        self._heartbeat(node)
+        node.refresh_from_db()
+        node.status = "inactive"
+        node.save()
+
+        self._heartbeat(node)
+        node.refresh_from_db()
+        assert node.status == "active"
+
+    def test_health_check_uses_unflushed_heartbeats(self):
+        node = NodeFactory(status="inactive")
+        self._heartbeat(node)
+        Node.objects.filter(id=node.id).update(last_heartbeat=timezone.now() - timezone.timedelta(minutes=10))
+
+        check_node_health()
+        node.refresh_from_db()
+        assert node.status == "active"
+
+        heartbeats.evict([node.id], forget=True)
+        check_node_health()
+        node.refresh_from_db()
+        assert node.status == "inactive"
+
+
+@pytest.mark.django_db
+class TestLivenessSweep:
+    """Tests for the liveness sweep over the last_seen sorted set."""
+
+    @patch("hub.tasks.TaskManager.handle_tasks_for_inactive_nodes")
+    def test_only_newly_silent_nodes_are_processed(self, mock_handle, django_assert_num_queries):
+        NodeFactory.create_batch(5, status="inactive")
+        silent, live = NodeFactory(status="inactive"), NodeFactory(status="inactive")
+        client = APIClient()
+        for node in (silent, live):
+            client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+        redis_client.zadd(f"{settings.REDIS_HEARTBEATS_PREFIX}:last_seen", {str(silent.id): time.time() - 600})
+
+        check_node_health()
+        mock_handle.assert_called_once_with([silent.id])
+        assert Node.objects.filter(status="active").get() == live
+
+        mock_handle.reset_mock()
+        with django_assert_num_queries(0):
+            check_node_health()
+        mock_handle.assert_not_called()
+
+    def test_edge_records_inactive_since_and_heartbeat_clears_it(self):
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            node = NodeFactory(status="active")
+
+        check_node_health()
+        node.refresh_from_db()
+        assert node.status == "inactive" and node.inactive_since is not None
+
+        APIClient().post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+        node.refresh_from_db()
+        assert node.status == "active" and node.inactive_since is None
+
+    @patch("hub.tasks.request_orchestration")
+    def test_assignments_are_reclaimed_after_grace_period(self, mock_request, settings):
+        settings.NODE_RECLAIM_GRACE_SECONDS = 300
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            returning, gone = NodeFactory.create_batch(2, status="active")
+        for node in (returning, gone):
+            TaskAssignmentFactory(node=node, task=TaskFactory(status="in_progress"))
+
+        check_node_health()
+        assert TaskAssignment.objects.count() == 2
+        mock_request.assert_not_called()
+
+        APIClient().post(reverse("node_heartbeat"), data={"node_id": str(returning.id)}, format="json")
+        Node.objects.filter(id=gone.id).update(inactive_since=timezone.now() - timezone.timedelta(seconds=301))
+        check_node_health()
+        assert list(TaskAssignment.objects.values_list("node_id", flat=True)) == [returning.id]
+        mock_request.assert_called_once_with("node_inactive")
+
+        mock_request.reset_mock()
+        check_node_health()
+        mock_request.assert_not_called()
+
+    def test_nodes_made_live_outside_the_heartbeat_endpoint_are_swept(self):
+        live = NodeFactory(status="active")  # the sorted set already exists
+        with freeze_time(timezone.now() - timezone.timedelta(hours=1)):
+            silent = NodeFactory(status="inactive")
+            silent.status = "active"  # e.g. the admin or an experiment endpoint
+            silent.save()
+
+        check_node_health()
+        silent.refresh_from_db()
+        live.refresh_from_db()
+        assert (silent.status, live.status) == ("inactive", "active")
+
+    def test_keep_alive_keeps_nodes_tracked_as_live(self, settings):
+        settings.EXPERIMENT_MODE = True
+        node = NodeFactory(status="active", name="HighNode-0")
+        redis_client.zadd(f"{settings.REDIS_HEARTBEATS_PREFIX}:last_seen", {str(node.id): time.time() - 600})
+
+        response = APIClient().post(
+            reverse("trust_validation_keep_alive"), data={"node_names": ["HighNode-0"]}, format="json"
+        )
+        assert response.status_code == 200
+        check_node_health()
+        node.refresh_from_db()
+        assert node.status == "active"
+
+    def test_node_locked_by_another_writer_stays_tracked(self):
+        NodeFactory(status="active")  # keeps the sorted set from being reseeded
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            node = NodeFactory(status="active")
+
+        # The row is locked (e.g. by a trust update in submit_task_result) while the sweep runs
+        with patch("hub.tasks.Node.objects.select_for_update") as mock_lock:
+            mock_lock.return_value.filter.return_value.values_list.return_value = []
+            check_node_health()
+        node.refresh_from_db()
+        assert node.status == "active"
+
+        check_node_health()
+        node.refresh_from_db()
+        assert node.status == "inactive"
+
+    def test_heartbeat_racing_the_sweep_keeps_node_active(self):
+        node = NodeFactory(status="inactive")
+        TaskAssignmentFactory(node=node, task=TaskFactory(status="in_progress"))
+        client = APIClient()
+        client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")  # cached as active
+        last_seen_key = f"{settings.REDIS_HEARTBEATS_PREFIX}:last_seen"
+        redis_client.zadd(last_seen_key, {str(node.id): time.time() - 600})
+        expired = heartbeats.expired
+
+        def expired_then_heartbeat(threshold):
+            stale_ids = expired(threshold)
+            client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")  # Redis-only path
+            return stale_ids
+
+        with patch("hub.tasks.heartbeats.expired", side_effect=expired_then_heartbeat):
+            check_node_health()
+
+        node.refresh_from_db()
+        assert node.status == "active"
+        assert TaskAssignment.objects.filter(node=node).exists()
+        assert redis_client.zscore(last_seen_key, str(node.id)) > time.time() - 60
+
+    def test_missing_sorted_set_is_seeded_from_database(self):
+        node = NodeFactory(status="active")
+        Node.objects.filter(id=node.id).update(last_heartbeat=timezone.now() - timezone.timedelta(minutes=10))
+        redis_client.delete(f"{settings.REDIS_HEARTBEATS_PREFIX}:last_seen")
+
+        assert heartbeats.expired(timezone.now() - timezone.timedelta(minutes=2)) == [node.id]
+
+
+@pytest.mark.django_db
+class TestHeartbeatHistory:
+    """Tests for the per-minute heartbeat rollups and their retention."""
+
+    def test_minute_spread_over_flushes_is_one_rollup_row(self):
+        node = NodeFactory()
+        minute = timezone.now().replace(second=0, microsecond=0)
+        heartbeat_history.record(node.id, {"free_cpu": 4, "free_ram": 8}, minute)
+        heartbeat_history.record(node.id, {"free_cpu": 2, "free_ram": 6}, minute + timezone.timedelta(seconds=10))
+        assert heartbeat_history.flush() == 1
+        heartbeat_history.record(node.id, None, minute + timezone.timedelta(seconds=20), healthy=False)
+        heartbeat_history.record(node.id, {"free_cpu": 3, "free_ram": 1}, minute + timezone.timedelta(seconds=70))
+        assert heartbeat_history.flush() == 2
+
+        first, second = HeartbeatRollup.objects.filter(node=node).order_by("minute")
+        assert first.minute == minute
+        assert (first.heartbeat_count, first.resource_samples) == (3, 2)
+        assert first.healthy_ratio == pytest.approx(2 / 3)
+        assert (first.free_cpu_min, first.free_cpu_avg) == (2, 3)
+        assert (first.free_ram_min, first.free_ram_avg) == (6, 7)
+        assert (second.heartbeat_count, second.free_ram_min) == (1, 1)
+
+    def test_overlapping_flush_does_not_merge_twice(self):
+        node = NodeFactory()
+        heartbeat_history.record(node.id, {"free_cpu": 4, "free_ram": 8}, timezone.now())
+        redis_client.set(f"{settings.REDIS_HEARTBEAT_ROLLUPS_KEY}:lock", "other-flush")  # a flush still running
+
+        assert heartbeat_history.flush() == 0
+        redis_client.delete(f"{settings.REDIS_HEARTBEAT_ROLLUPS_KEY}:lock")
+        assert heartbeat_history.flush() == 1
+        assert heartbeat_history.flush() == 0
+        assert HeartbeatRollup.objects.get(node=node).heartbeat_count == 1
+
+    def test_batch_replayed_after_crash_is_not_merged_twice(self):
+        node = NodeFactory()
+        heartbeat_history.record(node.id, {"free_cpu": 4, "free_ram": 8}, timezone.now())
+        with patch.object(redis_client, "delete", side_effect=ConnectionError), pytest.raises(ConnectionError):
+            heartbeat_history.flush()  # committed, but the batch is still in Redis
+
+        assert heartbeat_history.flush() == 0
+        rollup = HeartbeatRollup.objects.get(node=node)
+        assert (rollup.heartbeat_count, rollup.free_cpu_sum) == (1, 4)
+        assert not redis_client.exists(f"{settings.REDIS_HEARTBEAT_ROLLUPS_KEY}:flushing")
+
+        heartbeat_history.record(node.id, None, timezone.now())
+        heartbeat_history.flush()
+        assert HeartbeatRollup.objects.get(node=node).heartbeat_count == 2
+
+    def test_heartbeat_endpoint_writes_rollups_not_raw_rows(self):
+        node = NodeFactory(status="inactive")
+        client = APIClient()
+        for _ in range(3):  # database path, then the Redis-only path
+            client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+        flush_heartbeats_task()
+
+        assert not Heartbeat.objects.exists()
+        assert HeartbeatRollup.objects.get(node=node).heartbeat_count == 3
+
+    def test_rollups_of_deleted_nodes_are_dropped(self):
+        node = NodeFactory()
+        heartbeat_history.record(node.id, None, timezone.now())
+        node.delete()
+        assert heartbeat_history.flush() == 0
+
+    def test_purge_deletes_expired_history_in_chunks(self, settings, django_assert_max_num_queries):
+        settings.HEARTBEAT_HISTORY_RETENTION_DAYS = 7
+        settings.HEARTBEAT_PURGE_BATCH_SIZE = 2
+        node = NodeFactory()
+        now = timezone.now()
+        for age in range(5):
+            HeartbeatRollup.objects.create(node=node, minute=now - timezone.timedelta(days=8, minutes=age))
+        recent = HeartbeatRollup.objects.create(node=node, minute=now - timezone.timedelta(days=6))
+        HeartbeatFactory.create_batch(3, node=node)
+        Heartbeat.objects.update(timestamp=now - timezone.timedelta(days=8))
+
+        with django_assert_max_num_queries(12):  # 3 + 2 chunks of one select and one delete, plus the empty selects
+            assert heartbeat_history.purge(now) == 8
+        assert list(HeartbeatRollup.objects.all()) == [recent]
+        assert not Heartbeat.objects.exists()
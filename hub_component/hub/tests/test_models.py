@@ -2,7 +2,9 @@ import pytest
 from django.utils import timezone
 from datetime import timedelta
 from freezegun import freeze_time
+from unittest.mock import patch
 
+from hub.models import Node, Task, TaskAssignment
 from hub.tests.factories import NodeFactory, TaskFactory, TaskAssignmentFactory, HeartbeatFactory
 
 
@@ -11,15 +13,32 @@ class TestNodeModel:
     """Tests for Node model level logic. Uses freezegun to control time."""
 
     def test_is_available_for_task_true(self):
-        node = NodeFactory(free_resources={"cpu": 4, "ram": 8})
+        node = NodeFactory(free_resources={"free_cpu": 4, "free_ram": 8})
         task_req = {"cpu": 2, "ram": 4}
         assert node.is_available_for_task(task_req) is True
 
     def test_is_available_for_task_false_due_to_cpu(self):
-        node = NodeFactory(free_resources={"cpu": 1, "ram": 8})
+        node = NodeFactory(free_resources={"free_cpu": 1, "free_ram": 8})
         task_req = {"cpu": 2, "ram": 4}
         assert node.is_available_for_task(task_req) is False
 
+    def test_is_available_for_task_subtracts_open_reservations(self):
+        node = NodeFactory(free_resources={"free_cpu": 4, "free_ram": 8})
+        TaskAssignmentFactory(node=node, reserved_cpu=3, reserved_ram=2)
+        assert node.available_resources() == {"cpu": 1, "ram": 6}
+        assert node.is_available_for_task({"cpu": 2, "ram": 4}) is False
+
+    def test_legacy_free_resource_keys_are_normalized(self):
+        node = NodeFactory(free_resources={"cpu": 4, "ram": 8, "gpu": 1})
+        node.refresh_from_db()
+        assert node.free_resources == {"free_cpu": 4, "free_ram": 8, "gpu": 1}
+        assert node.is_available_for_task({"cpu": 2, "ram": 4}) is True
+
+    def test_completed_assignment_releases_reservation(self):
+        node = NodeFactory(free_resources={"free_cpu": 4, "free_ram": 8})
+        TaskAssignmentFactory(node=node, reserved_cpu=3, reserved_ram=2, completed_at=timezone.now())
+        assert node.is_available_for_task({"cpu": 2, "ram": 4}) is True
+
     @freeze_time("2025-06-01 12:00:00")
     def test_mark_inactive_if_stale_marks_inactive(self):
         with freeze_time("2025-06-01 11:58:30"):
@@ -67,10 +86,54 @@ class TestTaskModel:
         assert "Alpha" in names and "Beta" in names
 
 
+@pytest.mark.django_db
+class TestStatusTracking:
+    """Tests for the in-memory status tracking used by the save signals."""
+
+    def test_node_save_without_status_change_runs_no_extra_query(self, django_assert_num_queries):
+        node = Node.objects.get(id=NodeFactory(status="active").id)
+        node.free_resources = {"free_cpu": 1, "free_ram": 1}
+        with patch("hub.signals.publish_network_activity") as mock_publish, django_assert_num_queries(1):
+            node.save()
+        mock_publish.assert_not_called()
+
+    def test_node_status_change_is_detected_and_snapshot_advances(self):
+        node = Node.objects.get(id=NodeFactory(status="active").id)
+        node.status = "inactive"
+        with patch("hub.signals.publish_network_activity") as mock_publish:
+            node.save()
+            node.save()
+        mock_publish.assert_called_once()
+
+    def test_update_fields_without_status_does_not_emit(self):
+        task = Task.objects.get(id=TaskFactory(status="pending", submitted_by=NodeFactory()).id)
+        task.status = "in_queue"
+        with patch("hub.signals.publish_network_activity") as mock_publish, \
+                patch("hub.signals.publish_task_update") as mock_task_update:
+            task.save(update_fields=["description"])
+            mock_publish.assert_not_called()
+
+            task.save(update_fields=["status"])
+        mock_publish.assert_called_once()
+        mock_task_update.assert_called_once()
+
+    def test_deferred_status_falls_back_to_database(self):
+        task = Task.objects.only("id").get(id=TaskFactory(status="pending").id)
+        task.status = "pending"
+        with patch("hub.signals.publish_network_activity") as mock_publish:
+            task.save()
+        mock_publish.assert_not_called()
+
+
 @pytest.mark.django_db
 class TestTaskAssignmentModel:
     """Tests for TaskAssignment model level logic."""
 
+    def test_reserving_uses_task_requirements(self):
+        task = TaskFactory(resource_requirements={"cpu": 2, "ram": 3})
+        assignment = TaskAssignment.reserving(task, NodeFactory())
+        assert (assignment.reserved_cpu, assignment.reserved_ram) == (2, 3)
+
     def test_str_representation(self):
         assignment = TaskAssignmentFactory()
         s = str(assignment)
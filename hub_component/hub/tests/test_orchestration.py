@@ -1,9 +1,16 @@
+import json
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
 
+from django.db import transaction
 from django.utils import timezone
+from freezegun import freeze_time
 
-from hub.models import Task, Node, TaskAssignment
+from hub import activity_counters
+from hub.models import Task, TaskAssignment
+from hub.redis_publisher import task_updates_channel
 from hub.task_manager import TaskManager
 from hub.tasks import (
     orchestrate_task_distribution,
@@ -11,6 +18,7 @@ from hub.tasks import (
     check_node_health,
 )
 from hub.tests.factories import NodeFactory, TaskFactory, TaskAssignmentFactory
+from hub.transitions import transition_tasks
 
 
 @pytest.mark.django_db
@@ -43,13 +51,28 @@ class TestTaskManagerLogic:
 
     def test_assign_tasks_to_nodes_assigns_based_on_resources(self):
         task = TaskFactory(status="in_queue", resource_requirements={"cpu": 1, "ram": 1})
-        node = NodeFactory(status="active", trust_index=9.0, free_resources={"cpu": 2, "ram": 2})
+        node = NodeFactory(status="active", trust_index=9.0, free_resources={"free_cpu": 2, "free_ram": 2})
         manager = TaskManager()
         manager.assign_tasks_to_nodes()
         assignments = TaskAssignment.objects.filter(task=task)
         assert assignments.count() == 1
         assert assignments.first().node == node
 
+    @pytest.mark.parametrize("bulk", [True, False])
+    def test_assign_tasks_wakes_assigned_nodes_after_commit(self, bulk, settings, django_capture_on_commit_callbacks):
+        settings.BULK_ASSIGNMENT = bulk
+        TaskFactory(status="in_queue", resource_requirements={"cpu": 1, "ram": 1})
+        node = NodeFactory(status="active", trust_index=9.0, free_resources={"free_cpu": 2, "free_ram": 2})
+
+        with patch("hub.task_manager.notify_new_assignments") as mock_notify:
+            with django_capture_on_commit_callbacks() as callbacks:
+                TaskManager().assign_tasks_to_nodes()
+            mock_notify.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        mock_notify.assert_called_once_with([node.id])
+
     def test_handle_stale_tasks_marks_failed(self):
         manager = TaskManager()
         task = TaskFactory(status="in_queue", stale_count=manager.max_stale_count + 1)
@@ -135,13 +158,9 @@ class TestNodeHealthTask:
     """Test suite for node health checks and status updates."""
 
     def test_check_node_health_marks_inactive(self):
-        # Create node with dummy value first
-        node = NodeFactory(status="active")
-
-        # Then manually override last_heartbeat with old timestamp (bypassing auto_now)
-        Node.objects.filter(id=node.id).update(
-            last_heartbeat=timezone.now() - timezone.timedelta(minutes=10)
-        )
+        # Create node with an old heartbeat (freezing the clock, since last_heartbeat is auto_now)
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            node = NodeFactory(status="active")
 
         # Re-fetch node with correct timestamp
         node.refresh_from_db()
@@ -254,3 +273,433 @@ class TestCeleryEntrypoints:
     def test_handle_persistently_failing_tasks_task_executes(self):
         from hub.tasks import handle_persistently_failing_tasks_task
         handle_persistently_failing_tasks_task()
+
+
+@pytest.mark.django_db
+class TestBulkAssignment:
+    """Tests for the vectorized bulk assignment engine against the per-task heuristic."""
+
+    def _create_cluster(self):
+        nodes = [
+            NodeFactory(trust_index=9.0, free_resources={"free_cpu": 2, "free_ram": 4}),
+            NodeFactory(trust_index=6.0, free_resources={"free_cpu": 8, "free_ram": 32}),
+            NodeFactory(trust_index=8.0, free_resources={"free_cpu": 1, "free_ram": 1}),
+            NodeFactory(trust_index=4.0, free_resources={"free_cpu": 2, "free_ram": 4}),
+        ]
+        tasks = [
+            TaskFactory(status="in_queue", resource_requirements={"cpu": 2, "ram": 4}, overlap_count=2),
+            TaskFactory(status="in_queue", resource_requirements={"cpu": 8, "ram": 16}, trust_index_required=5.5),
+            TaskFactory(status="in_progress", resource_requirements={"cpu": 1, "ram": 1}, trust_index_required=8.5),
+        ]
+        TaskAssignmentFactory(task=tasks[2], node=nodes[0])
+        tasks[2].overlap_count = 2
+        tasks[2].save()
+        return nodes, tasks
+
+    def _assignment_pairs(self):
+        return set(TaskAssignment.objects.values_list("task_id", "node_id"))
+
+    def test_bulk_matches_per_task_ranking(self, settings):
+        self._create_cluster()
+        initial_pairs = self._assignment_pairs()
+        initial_tasks = list(Task.objects.values("id", "status", "stale_count"))
+
+        settings.BULK_ASSIGNMENT = False
+        TaskManager().assign_tasks_to_nodes()
+        expected_pairs = self._assignment_pairs()
+        expected_tasks = list(Task.objects.order_by("id").values("id", "status", "stale_count"))
+
+        for task_id, node_id in expected_pairs - initial_pairs:
+            TaskAssignment.objects.filter(task_id=task_id, node_id=node_id).delete()
+        for row in initial_tasks:
+            Task.objects.filter(id=row["id"]).update(status=row["status"], stale_count=row["stale_count"])
+
+        settings.BULK_ASSIGNMENT = True
+        TaskManager().assign_tasks_to_nodes()
+        assert self._assignment_pairs() == expected_pairs
+        assert list(Task.objects.order_by("id").values("id", "status", "stale_count")) == expected_tasks
+
+    def test_bulk_marks_tasks_without_candidates_stale(self, settings):
+        settings.BULK_ASSIGNMENT = True
+        NodeFactory(trust_index=3.0)
+        task = TaskFactory(status="in_queue", trust_index_required=9.0, stale_count=2)
+        TaskManager().assign_tasks_to_nodes_bulk()
+        task.refresh_from_db()
+        assert task.stale_count == 3
+        assert task.status == "in_queue"
+        assert not TaskAssignment.objects.exists()
+
+    def test_bulk_never_assigns_same_node_twice(self):
+        node = NodeFactory(trust_index=9.0)
+        task = TaskFactory(status="in_progress", overlap_count=2)
+        TaskAssignmentFactory(task=task, node=node)
+        TaskManager().assign_tasks_to_nodes_bulk()
+        task.refresh_from_db()
+        assert TaskAssignment.objects.filter(task=task).count() == 1
+        assert task.stale_count == 1
+
+
+@pytest.mark.django_db
+class TestReservationLedger:
+    """Tests that one orchestration pass cannot overbook a node beyond its free resources."""
+
+    @pytest.mark.parametrize("bulk", [True, False])
+    def test_single_pass_does_not_overbook_hot_node(self, settings, bulk):
+        settings.BULK_ASSIGNMENT = bulk
+        hot = NodeFactory(trust_index=9.0, free_resources={"free_cpu": 2, "free_ram": 2})
+        cold = NodeFactory(trust_index=6.0, free_resources={"free_cpu": 16, "free_ram": 64})
+        TaskFactory.create_batch(3, status="in_queue", resource_requirements={"cpu": 1, "ram": 1})
+
+        TaskManager().assign_tasks_to_nodes()
+
+        assert TaskAssignment.objects.filter(node=hot).count() == 2
+        assert TaskAssignment.objects.filter(node=cold).count() == 1
+        assert TaskAssignment.reserved_resources([hot.id])[hot.id] == {"cpu": 2, "ram": 2}
+
+    def test_task_that_fits_nowhere_is_marked_stale(self):
+        NodeFactory(free_resources={"free_cpu": 1, "free_ram": 1})
+        task = TaskFactory(status="in_queue", resource_requirements={"cpu": 4, "ram": 4})
+        TaskManager().assign_tasks_to_nodes()
+        task.refresh_from_db()
+        assert task.stale_count == 1
+        assert not TaskAssignment.objects.exists()
+
+    def test_submit_result_releases_reservation(self):
+        node = NodeFactory(free_resources={"free_cpu": 1, "free_ram": 1})
+        first = TaskFactory(status="in_queue", resource_requirements={"cpu": 1, "ram": 1})
+        TaskManager().assign_tasks_to_nodes()
+        second = TaskFactory(status="in_queue", resource_requirements={"cpu": 1, "ram": 1})
+        TaskManager().assign_tasks_to_nodes()
+        assert not TaskAssignment.objects.filter(task=second).exists()
+
+        TaskAssignment.objects.filter(task=first).update(completed_at=timezone.now())
+        TaskManager().assign_tasks_to_nodes()
+        assert TaskAssignment.objects.get(task=second).node == node
+
+
+@pytest.mark.django_db
+class TestOptimalAssignment:
+    """Tests for the 'optimal' (min-cost matching) orchestration mechanism."""
+
+    def test_optimal_leaves_best_node_for_constrained_task(self, settings):
+        settings.ORCHESTRATION_MECHANISM = "optimal"
+        settings.OPTIMAL_NODE_CAPACITY = 1
+        trusted = NodeFactory(trust_index=9.5, free_resources={"free_cpu": 2, "free_ram": 2})
+        regular = NodeFactory(trust_index=6.0, free_resources={"free_cpu": 4, "free_ram": 4})
+        flexible = TaskFactory(status="in_queue", resource_requirements={"cpu": 2, "ram": 2}, trust_index_required=5.0)
+        strict = TaskFactory(status="in_queue", resource_requirements={"cpu": 2, "ram": 2}, trust_index_required=9.0)
+
+        TaskManager().assign_tasks_to_nodes()
+
+        assert TaskAssignment.objects.get(task=strict).node == trusted
+        assert TaskAssignment.objects.get(task=flexible).node == regular
+
+    def test_optimal_respects_overlap_and_no_duplicate_nodes(self, settings):
+        settings.ORCHESTRATION_MECHANISM = "optimal"
+        settings.OPTIMAL_NODE_CAPACITY = 2
+        nodes = NodeFactory.create_batch(3, trust_index=8.0)
+        task = TaskFactory(status="in_progress", overlap_count=3)
+        TaskAssignmentFactory(task=task, node=nodes[0])
+
+        TaskManager().assign_tasks_to_nodes()
+
+        assigned = list(TaskAssignment.objects.filter(task=task).values_list("node_id", flat=True))
+        assert len(assigned) == 3
+        assert len(set(assigned)) == 3
+
+    @patch("hub.task_manager.scheduling.min_cost_assignment")
+    def test_optimal_skips_solver_above_edge_cap(self, mock_solver, settings):
+        settings.ORCHESTRATION_MECHANISM = "optimal"
+        settings.OPTIMAL_MAX_EDGES = 1
+        NodeFactory.create_batch(2, trust_index=9.0)
+        task = TaskFactory(status="in_queue")
+
+        TaskManager().assign_tasks_to_nodes()
+
+        mock_solver.assert_not_called()
+        assert TaskAssignment.objects.filter(task=task).count() == 1
+
+    @patch("hub.task_manager.scheduling.min_cost_assignment")
+    def test_optimal_falls_back_to_greedy_on_time_budget(self, mock_solver, settings):
+        settings.ORCHESTRATION_MECHANISM = "optimal"
+        settings.OPTIMAL_TIME_BUDGET = 0.01
+        mock_solver.side_effect = lambda *args, **kwargs: time.sleep(0.5)
+        node = NodeFactory(trust_index=9.0)
+        task = TaskFactory(status="in_queue")
+
+        TaskManager().assign_tasks_to_nodes()
+
+        assert TaskAssignment.objects.get(task=task).node == node
+        task.refresh_from_db()
+        assert task.status == "in_progress"
+
+
+@pytest.mark.django_db
+class TestSqlTaskPriority:
+    """Tests for the SQL (ORM annotation) evaluation of the task priority heuristic."""
+
+    def test_annotation_matches_calculate_task_priority(self):
+        manager = TaskManager()
+        specs = [
+            ({"cpu": 1, "ram": 2}, 0, "pending", 10),
+            ({"cpu": 4}, 2, "pending", 45),
+            ({"ram": 8}, 0, "in_queue", 5),
+            ({}, 1, "in_progress", 30),
+            ({"cpu": 2.5, "ram": 3}, 7, "pending", 90),
+        ]
+        for requirements, stale_count, status, minutes in specs:
+            task = TaskFactory(resource_requirements=requirements, stale_count=stale_count, status=status)
+            task.created_at = timezone.now() - timezone.timedelta(minutes=minutes)
+            task.save()
+
+        now = timezone.now()
+        with freeze_time(now):
+            for task in manager.annotate_task_priority(Task.objects.all(), now=now):
+                assert task.priority == pytest.approx(manager.calculate_task_priority(task), rel=1e-9)
+
+    def test_move_tasks_to_active_queue_uses_sql_ranking(self, settings):
+        settings.PRIORITY_BACKEND = "sql"
+        settings.ACTIVE_QUEUE_SIZE = 2
+        tasks = TaskFactory.create_batch(4, status="pending")
+        for minutes, task in zip([5, 50, 20, 1], tasks):
+            task.created_at = timezone.now() - timezone.timedelta(minutes=minutes)
+            task.save()
+
+        TaskManager().move_tasks_to_active_queue()
+
+        assert set(Task.objects.filter(status="in_queue").values_list("id", flat=True)) == {tasks[1].id, tasks[2].id}
+
+    def test_reorder_active_queue_uses_sql_ranking(self, settings):
+        settings.PRIORITY_BACKEND = "sql"
+        high_task = TaskFactory(status="pending")
+        high_task.created_at = timezone.now() - timezone.timedelta(minutes=30)
+        high_task.save()
+        low_task = TaskFactory(status="in_queue", stale_count=5)
+
+        TaskManager().reorder_active_queue()
+
+        high_task.refresh_from_db()
+        low_task.refresh_from_db()
+        assert high_task.status == "in_queue"
+        assert low_task.status == "pending"
+
+
+@pytest.mark.django_db
+class TestEventDrivenOrchestration:
+    """Tests for debounced, event-driven orchestration triggers."""
+
+    @patch("hub.tasks.orchestrate_task_distribution.apply_async")
+    def test_burst_of_events_schedules_one_pass(self, mock_apply):
+        from hub.tasks import request_orchestration
+        assert request_orchestration("task_pending") is True
+        assert request_orchestration("node_active") is False
+        assert request_orchestration("assignment_completed") is False
+        mock_apply.assert_called_once()
+        assert mock_apply.call_args.kwargs["kwargs"]["reason"] == "task_pending"
+
+    @patch("hub.tasks.orchestrate_task_distribution.apply_async")
+    def test_disabled_event_driven_mode_never_schedules(self, mock_apply, settings):
+        from hub.tasks import request_orchestration
+        settings.ORCHESTRATION_EVENT_DRIVEN = False
+        assert request_orchestration("task_pending") is False
+        mock_apply.assert_not_called()
+
+    @patch("hub.tasks.request_orchestration")
+    @patch("hub.task_manager.docker.DockerClient")
+    def test_validated_task_triggers_orchestration(self, mock_client_class, mock_request):
+        mock_client_class.return_value = MagicMock()
+        task = TaskFactory(status="validating")
+        validate_docker_image_task(task.id)
+        mock_request.assert_called_once_with("task_pending")
+
+    @patch("hub.tasks.request_orchestration")
+    def test_node_going_inactive_triggers_orchestration(self, mock_request):
+        with freeze_time(timezone.now() - timezone.timedelta(minutes=10)):
+            NodeFactory(status="active")
+        check_node_health()
+        mock_request.assert_called_once_with("node_inactive")
+
+
+@pytest.mark.django_db
+class TestSingleFlightOrchestration:
+    """Tests for the single-flight orchestration lease with fencing tokens."""
+
+    @patch("hub.tasks.chain")
+    def test_second_pass_is_collapsed_into_one_follow_up(self, mock_chain):
+        from hub import orchestration_lease
+        mock_chain.return_value.apply_async = MagicMock()
+
+        orchestrate_task_distribution()
+        orchestrate_task_distribution()
+        orchestrate_task_distribution()
+
+        mock_chain.return_value.apply_async.assert_called_once()
+        assert orchestration_lease.pop_rerun() is True
+        assert orchestration_lease.pop_rerun() is False
+
+    @patch("hub.tasks.orchestrate_task_distribution.apply_async")
+    def test_release_starts_single_follow_up_run(self, mock_apply):
+        from hub import orchestration_lease
+        from hub.tasks import release_orchestration_lease_task
+        token = orchestration_lease.acquire_lease()
+        orchestration_lease.request_rerun()
+        orchestration_lease.request_rerun()
+
+        release_orchestration_lease_task(fencing_token=token)
+
+        assert orchestration_lease.acquire_lease() is not None
+        mock_apply.assert_called_once()
+
+    def test_fencing_tokens_increase_and_stale_holder_cannot_renew(self):
+        from hub import orchestration_lease
+        first = orchestration_lease.acquire_lease()
+        assert orchestration_lease.acquire_lease() is None
+        orchestration_lease.release_lease(first)
+
+        second = orchestration_lease.acquire_lease()
+        assert second > first
+        assert orchestration_lease.renew_lease(first) is False
+        assert orchestration_lease.release_lease(first) is False
+        assert orchestration_lease.holds_lease(second) is True
+
+    def test_assign_step_with_stale_token_writes_nothing(self):
+        from hub import orchestration_lease
+        from hub.tasks import assign_tasks_to_nodes_task
+        NodeFactory(trust_index=9.0)
+        TaskFactory(status="in_queue")
+        stale = orchestration_lease.acquire_lease()
+        orchestration_lease.release_lease(stale)
+        orchestration_lease.acquire_lease()
+
+        assign_tasks_to_nodes_task(fencing_token=stale)
+
+        assert not TaskAssignment.objects.exists()
+
+    def test_assign_step_is_fenced_in_the_database(self):
+        from hub import orchestration_lease
+        from hub.models import OrchestrationFence
+        from hub.tasks import assign_tasks_to_nodes_task
+        NodeFactory(trust_index=9.0)
+        task = TaskFactory(status="in_queue")
+        token = orchestration_lease.acquire_lease()
+        OrchestrationFence.objects.create(pk=1, token=token + 1)  # a newer pass wrote first
+
+        # The Redis lease still looks held, the database refuses the stale token
+        assign_tasks_to_nodes_task(fencing_token=token)
+        assert not TaskAssignment.objects.exists()
+
+        orchestration_lease.release_lease(token)
+        newer = orchestration_lease.acquire_lease()
+        assert newer > token + 1  # the counter was moved past the fence
+        assign_tasks_to_nodes_task(fencing_token=newer)
+        assert TaskAssignment.objects.filter(task=task).exists()
+        assert OrchestrationFence.objects.get().token == newer
+
+
+@pytest.mark.django_db
+class TestBulkTransitions:
+    """Tests for bulk status transitions emitting one aggregated change event per batch."""
+
+    @patch("hub.transitions.publish_task_update")
+    @patch("hub.transitions.publish_network_activity")
+    def test_move_tasks_emits_single_network_event(self, mock_activity, mock_task_update, settings,
+                                                   django_capture_on_commit_callbacks):
+        settings.ACTIVE_QUEUE_SIZE = 10
+        submitters = NodeFactory.create_batch(2)
+        for i in range(10):
+            TaskFactory(status="pending", submitted_by=submitters[i % 2])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaskManager().move_tasks_to_active_queue()
+
+        assert Task.objects.filter(status="in_queue").count() == 10
+        mock_activity.assert_called_once()
+        assert {call.args[0] for call in mock_task_update.call_args_list} == {node.id for node in submitters}
+
+    def test_move_tasks_query_count_does_not_grow_with_batch(self, settings, django_assert_max_num_queries):
+        settings.ACTIVE_QUEUE_SIZE = 10
+        TaskFactory.create_batch(10, status="pending")
+        with patch("hub.transitions.publish_network_activity"), django_assert_max_num_queries(6):
+            TaskManager().move_tasks_to_active_queue()
+
+    @patch("hub.transitions.publish_network_activity")
+    def test_task_update_events_carry_compact_task_state(self, mock_activity, django_capture_on_commit_callbacks):
+        submitter = NodeFactory()
+        task = TaskFactory(status="pending", submitted_by=submitter, result={"validated_output": "x" * 10000})
+
+        with patch("hub.redis_publisher.publish_event") as mock_publish, \
+                django_capture_on_commit_callbacks(execute=True):
+            TaskManager().move_tasks_to_active_queue()
+
+        channel, message = mock_publish.call_args.args
+        message = json.loads(message)
+        assert channel == task_updates_channel(submitter.id)
+        assert message["action"] == "patch"
+        assert message["tasks"] == [{
+            "id": str(task.id),
+            "old_status": "pending",
+            "status": "in_queue",
+            "updated_at": Task.objects.get(id=task.id).updated_at.isoformat(),
+            "result": {"trust_score": None, "has_output": True, "error": None},
+        }]
+
+    @patch("hub.transitions.publish_network_activity")
+    def test_transition_updates_timestamps_and_priority_index(self, mock_activity, django_capture_on_commit_callbacks):
+        from hub import priority_index
+        task = TaskFactory(status="pending")
+        before = Task.objects.get(id=task.id).updated_at
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaskManager().move_tasks_to_active_queue()
+
+        task.refresh_from_db()
+        assert task.status == "in_queue"
+        assert task.last_attempted is not None
+        assert task.updated_at > before
+        assert priority_index.top_task_ids("pending", 10) == []
+        assert priority_index.top_task_ids("in_queue", 10) == [str(task.id)]
+
+    @patch("hub.transitions.publish_network_activity")
+    def test_reorder_swap_is_one_event(self, mock_activity, django_capture_on_commit_callbacks):
+        high_task = TaskFactory(status="pending", stale_count=0)
+        Task.objects.filter(id=high_task.id).update(created_at=timezone.now() - timezone.timedelta(minutes=30))
+        low_task = TaskFactory(status="in_queue", stale_count=5)
+        from hub import priority_index
+        priority_index.rebuild()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaskManager().reorder_active_queue()
+
+        low_task.refresh_from_db()
+        high_task.refresh_from_db()
+        assert (low_task.status, high_task.status) == ("pending", "in_queue")
+        mock_activity.assert_called_once()
+
+    @patch("hub.transitions.publish_network_activity")
+    def test_retry_failed_tasks_clears_assignments_in_bulk(self, mock_activity, django_capture_on_commit_callbacks):
+        tasks = TaskFactory.create_batch(3, status="failed", stale_count=1)
+        for task in tasks:
+            TaskAssignmentFactory(task=task)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaskManager().retry_failed_tasks()
+
+        assert Task.objects.filter(status="pending").count() == 3
+        assert not TaskAssignment.objects.exists()
+        mock_activity.assert_called_once()
+
+    @patch("hub.transitions.publish_network_activity")
+    def test_rolled_back_transitions_emit_nothing(self, mock_activity, django_capture_on_commit_callbacks):
+        from hub import priority_index
+        task = TaskFactory(status="pending")
+        activity_counters.reconcile()
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            with pytest.raises(RuntimeError), transaction.atomic():
+                transition_tasks([task], "in_queue")
+                raise RuntimeError("lease lost")
+
+        assert callbacks == []
+        mock_activity.assert_not_called()
+        assert activity_counters.snapshot()["in_queue_tasks"] == 0
+        assert priority_index.top_task_ids("in_queue", 10) == []
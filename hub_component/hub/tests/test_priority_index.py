@@ -0,0 +1,101 @@
+import pytest
+from django.utils import timezone
+
+from hub import priority_index
+from hub.models import Task
+from hub.task_manager import TaskManager
+from hub.tests.factories import TaskFactory
+
+
+def _age(task, minutes):
+    """Backdate created_at (auto_now_add) through save() so the signal re-indexes the task."""
+    task.created_at = timezone.now() - timezone.timedelta(minutes=minutes)
+    task.save()
+    return task
+
+
+@pytest.mark.django_db
+class TestPriorityIndex:
+    """Tests for the Redis sorted-set priority index of pending and in_queue tasks."""
+
+    def test_status_transitions_update_index(self):
+        task = TaskFactory(status="pending")
+        assert priority_index.top_task_ids("pending", 5) == [str(task.id)]
+
+        task.status = "in_queue"
+        task.save()
+        assert priority_index.top_task_ids("pending", 5) == []
+        assert priority_index.top_task_ids("in_queue", 5) == [str(task.id)]
+
+        task.status = "in_progress"
+        task.save()
+        assert priority_index.top_task_ids("in_queue", 5) == []
+
+    def test_deleted_task_is_dropped(self):
+        task = TaskFactory(status="pending")
+        task.delete()
+        assert priority_index.top_task_ids("pending", 5) == []
+
+    def test_order_matches_calculate_task_priority_across_weights(self):
+        manager = TaskManager()
+        tasks = [
+            _age(TaskFactory(status="pending", resource_requirements={"cpu": 1, "ram": 2}), 10),
+            _age(TaskFactory(status="pending", resource_requirements={"cpu": 4, "ram": 8}), 50),
+            _age(TaskFactory(status="pending", resource_requirements={"cpu": 1, "ram": 2}, stale_count=3), 40),
+            _age(TaskFactory(status="pending", resource_requirements={}), 5),
+            _age(TaskFactory(status="pending", resource_requirements={"cpu": 2, "ram": 1}), 30),
+        ]
+        now = timezone.now()
+        expected = [str(task.id) for task in sorted(tasks, key=manager.calculate_task_priority, reverse=True)]
+
+        assert priority_index.top_task_ids("pending", len(tasks), now=now) == expected
+        assert priority_index.top_task_ids("pending", 2, now=now) == expected[:2]
+        assert priority_index.lowest_task_id("pending", now=now) == expected[-1]
+
+    def test_mark_stale_rescores_task(self):
+        fresh = _age(TaskFactory(status="in_queue"), 1)
+        older = _age(TaskFactory(status="in_queue"), 1.2)
+        assert priority_index.lowest_task_id("in_queue") == str(fresh.id)
+
+        older.mark_stale()
+        assert priority_index.lowest_task_id("in_queue") == str(older.id)
+
+    def test_rebuild_restores_drifted_index(self):
+        task = TaskFactory(status="pending")
+        priority_index.clear()
+        assert priority_index.rebuild() == 1
+        assert priority_index.top_task_ids("pending", 5) == [str(task.id)]
+
+
+@pytest.mark.django_db
+class TestTaskManagerWithPriorityIndex:
+    """Tests that TaskManager selects and reorders tasks through the priority index."""
+
+    def test_move_tasks_activates_highest_priority(self, settings):
+        settings.ACTIVE_QUEUE_SIZE = 1
+        _age(TaskFactory(status="pending"), 1)
+        oldest = _age(TaskFactory(status="pending"), 60)
+        TaskManager().move_tasks_to_active_queue()
+        assert list(Task.objects.filter(status="in_queue").values_list("id", flat=True)) == [oldest.id]
+
+    def test_move_tasks_skips_drifted_entries(self, settings):
+        settings.ACTIVE_QUEUE_SIZE = 1
+        ghost = _age(TaskFactory(status="pending"), 60)
+        live = _age(TaskFactory(status="pending"), 1)
+        Task.objects.filter(id=ghost.id).update(status="failed")  # bypasses signals, index is now stale
+
+        TaskManager().move_tasks_to_active_queue()
+
+        live.refresh_from_db()
+        assert live.status == "in_queue"
+        assert str(ghost.id) not in priority_index.top_task_ids("pending", 5)
+
+    def test_reorder_swaps_through_index(self, settings):
+        settings.PRIORITY_BACKEND = "redis"
+        high_task = _age(TaskFactory(status="pending"), 30)
+        low_task = TaskFactory(status="in_queue", stale_count=5)
+        TaskManager().reorder_active_queue()
+        high_task.refresh_from_db()
+        low_task.refresh_from_db()
+        assert high_task.status == "in_queue"
+        assert low_task.status == "pending"
@@ -0,0 +1,142 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from hub import activity_counters
+from hub.models import Node, Task
+from hub.task_manager import TaskManager, MAX_STALE_COUNT
+from hub.tasks import check_node_health
+
+# Tables large enough in production that a sequential scan on them is a regression
+LARGE_TABLES = ("hub_node", "hub_task", "hub_taskassignment")
+
+NODES = 10_000
+ACTIVE_NODES = 100
+TASKS = 50_000
+
+
+def _populate():
+    """
+    A hub after some months of operation: mostly inactive historical nodes, mostly finished tasks each
+    with a completed assignment, and a small live working set (3 of the active nodes just went silent,
+    200 pending, 50 in_queue, 50 in_progress tasks with open assignments, 100 failed). Rows are generated
+    in SQL, then statistics are refreshed so the planner sees the distribution.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO hub_node (id, name, ip_address, status, trust_index, resources_capacity, free_resources,
+                                  last_heartbeat, created_at, updated_at)
+            SELECT gen_random_uuid(), 'node-' || i, '10.0.0.1',
+                   CASE WHEN i <= %(active)s THEN 'active' ELSE 'inactive' END,
+                   random() * 10, '{}', '{"free_cpu": 4, "free_ram": 8}',
+                   -- Live nodes heartbeat every few seconds, a handful just went silent
+                   CASE WHEN i <= %(active)s - 3 THEN now() ELSE now() - make_interval(mins => i) END,
+                   now() - make_interval(hours => i), now()
+            FROM generate_series(1, %(nodes)s) AS i
+        """, {"active": ACTIVE_NODES, "nodes": NODES})
+        cursor.execute("""
+            WITH submitters AS (SELECT array_agg(id) AS ids FROM hub_node WHERE status = 'active')
+            INSERT INTO hub_task (id, description, status, trust_index_required, container_spec,
+                                  resource_requirements, overlap_count, created_at, updated_at, submitted_by_id,
+                                  stale_count)
+            SELECT gen_random_uuid(), 'task',
+                   CASE WHEN i <= 200 THEN 'pending' WHEN i <= 250 THEN 'in_queue'
+                        WHEN i <= 300 THEN 'in_progress' WHEN i <= 400 THEN 'failed' ELSE 'completed' END,
+                   random() * 8, '{}', '{"cpu": 1, "ram": 1}', 1,
+                   now() - make_interval(secs => i), now() - make_interval(secs => i),
+                   submitters.ids[1 + mod(i, 50)],
+                   CASE WHEN i > 300 AND i <= 400 THEN mod(i, %(stale)s) ELSE 0 END
+            FROM generate_series(1, %(tasks)s) AS i, submitters
+        """, {"tasks": TASKS, "stale": MAX_STALE_COUNT + 2})
+        cursor.execute("""
+            WITH live AS (SELECT array_agg(id) AS ids FROM hub_node WHERE status = 'active'),
+                 everyone AS (SELECT array_agg(id) AS ids FROM hub_node)
+            INSERT INTO hub_taskassignment (id, node_id, task_id, assigned_at, completed_at, reserved_cpu,
+                                            reserved_ram)
+            SELECT gen_random_uuid(),
+                   CASE WHEN t.status = 'completed' THEN everyone.ids[1 + mod(t.n, %(nodes)s)]
+                        ELSE live.ids[1 + mod(t.n, %(active)s)] END,
+                   t.id, now(), CASE WHEN t.status = 'completed' THEN now() END, 1, 1
+            FROM (SELECT id, status, row_number() OVER () AS n FROM hub_task
+                  WHERE status IN ('completed', 'in_progress')) AS t, live, everyone
+        """, {"active": ACTIVE_NODES, "nodes": NODES})
+        # Sample every row, so the statistics (and the plans) do not vary from run to run
+        cursor.execute("SET LOCAL default_statistics_target = 1000")
+        for table in LARGE_TABLES:
+            cursor.execute(f"ANALYZE {table}")
+    activity_counters.reconcile()  # the counters are maintained incrementally after this full count
+    return list(Node.objects.filter(status="active").order_by("name"))
+
+
+def _seq_scans(captured_queries):
+    """EXPLAIN every captured statement and return (sql, plan) of those that scan a large table sequentially."""
+    regressions = []
+    with connection.cursor() as cursor:
+        for query in captured_queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            cursor.execute(f"EXPLAIN {sql}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            if any(f"Seq Scan on {table} " in plan or plan.endswith(f"Seq Scan on {table}") for table in LARGE_TABLES):
+                regressions.append((sql, plan))
+    return regressions
+
+
+def _assert_index_only(context):
+    regressions = _seq_scans(context.captured_queries)
+    assert not regressions, "\n\n".join(f"{sql[:300]}\n{plan[:2000]}" for sql, plan in regressions)
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    """EXPLAIN regression tests: scheduler and view queries must use indexes at realistic row counts."""
+
+    def test_task_manager_queries_use_indexes(self, settings):
+        active_nodes = _populate()
+        manager = TaskManager()
+
+        with CaptureQueriesContext(connection) as context:
+            manager.assign_tasks_to_nodes_bulk()
+            manager.handle_stale_tasks()
+            manager.handle_persistently_failing_tasks()
+            manager.retry_failed_tasks()
+            manager.handle_tasks_for_inactive_nodes([active_nodes[0].id])
+            settings.ORCHESTRATION_MECHANISM = "fifo"
+            manager.select_tasks_to_activate(Task.objects.filter(status="pending"), 5)
+            manager.assign_tasks_to_nodes()
+        _assert_index_only(context)
+
+    def test_health_check_queries_use_indexes(self, settings):
+        settings.NODE_RECLAIM_GRACE_SECONDS = 300
+        _populate()
+
+        with CaptureQueriesContext(connection) as context:
+            check_node_health()  # seeds liveness from the database, then the reclaim sweep
+        _assert_index_only(context)
+
+    def test_view_queries_use_indexes(self):
+        active_nodes = _populate()
+        client = APIClient()
+        node = active_nodes[1]
+
+        with CaptureQueriesContext(connection) as context:
+            client.get(reverse("fetch_task"), {"node_id": str(node.id), "max_tasks": 5})
+            client.get(reverse("get_submitted_tasks"), {
+                "node_id": str(active_nodes[2].id), "since": timezone.now().isoformat(),
+            })
+            client.post(reverse("node_heartbeat"), data={"node_id": str(node.id)}, format="json")
+            page = client.get(reverse("list_tasks"), {"limit": 50}).data
+            client.get(page["next"])
+            client.get(reverse("list_tasks"), {"status": "failed", "fields": "id,status"})
+            client.get(reverse("list_tasks"), {"submitted_by": str(node.id)})
+            page = client.get(reverse("list_nodes"), {"limit": 50}).data
+            client.get(page["next"])
+            task = client.get(reverse("list_tasks"), {"status": "in_progress"}).data["results"][0]
+            client.get(reverse("get_task", kwargs={"task_id": task["id"]}), {"node_id": str(node.id)})
+            client.get(reverse("fetch_node", kwargs={"node_id": node.id}))
+        assert len(context.captured_queries) > 5
+        _assert_index_only(context)
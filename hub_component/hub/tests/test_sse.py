@@ -0,0 +1,147 @@
+import asyncio
+
+from hub.redis_publisher import assignments_channel, notify_new_assignments, publish_event, publish_task_update
+from hub.sse import SSEBroadcaster, event_stream, get_broadcaster, wait_for_notification
+from hub.views import task_update_stream
+
+
+class TestSSEBroadcaster:
+    """Tests for the per-process SSE fan-out with bounded client queues."""
+
+    def test_dispatch_fans_out_and_drops_slow_consumers(self, settings):
+        settings.SSE_CLIENT_QUEUE_SIZE = 2
+
+        async def scenario():
+            broadcaster = SSEBroadcaster()
+            broadcaster._reader = asyncio.get_running_loop().create_future()  # no Redis reader needed
+            fast = broadcaster.subscribe("sse:test")
+            slow = broadcaster.subscribe("sse:test")
+            for i in range(2):
+                broadcaster.dispatch("sse:test", f"m{i}")
+                assert await fast.get() == f"m{i}"
+            broadcaster.dispatch("sse:test", "m2")
+            return broadcaster, await fast.get()
+
+        broadcaster, last = asyncio.run(scenario())
+        assert last == "m2"
+        assert broadcaster.client_count == 1
+        assert broadcaster.dropped_clients == 1
+
+    def test_stream_sends_keepalive_and_redis_messages(self, settings):
+        settings.SSE_KEEPALIVE_SECONDS = 0.05
+
+        async def scenario():
+            stream = event_stream("sse:test")
+            frames = [await stream.__anext__()]
+            frames.append(await stream.__anext__())  # idle -> keepalive
+            await get_broadcaster().subscribed.wait()
+            event_id = publish_event("sse:test", '{"type": "ping"}')
+            frame = await stream.__anext__()
+            while frame.startswith(":"):
+                frame = await stream.__anext__()
+            frames.append(frame)
+            await stream.aclose()
+            return frames, event_id, get_broadcaster().client_count
+
+        frames, event_id, client_count = asyncio.run(scenario())
+        assert frames == ["retry: 3000\n: connected\n\n", ": keepalive\n\n", f'id: {event_id}\ndata: {{"type": "ping"}}\n\n']
+        assert client_count == 0
+
+    def test_task_update_stream_only_receives_own_node_events(self):
+        async def next_data(stream):
+            frame = await stream.__anext__()
+            while frame.startswith(":"):
+                frame = await stream.__anext__()
+            return frame
+
+        async def scenario():
+            own, other = task_update_stream("node-a"), task_update_stream("node-b")
+            for stream in (own, other):
+                await stream.__anext__()  # connected
+            await get_broadcaster().subscribed.wait()
+            publish_task_update("node-b", emit=True)
+            publish_task_update("node-a", emit=True)
+            frame = await next_data(own)
+            other_frame = await next_data(other)
+            await own.aclose()
+            await other.aclose()
+            return frame, other_frame
+
+        frame, other_frame = asyncio.run(scenario())
+        assert '"node_id": "node-a"' in frame
+        assert '"node_id": "node-b"' in other_frame
+
+
+async def _next_event(stream):
+    frame = await stream.__anext__()
+    while frame.startswith((":", "retry:")):
+        frame = await stream.__anext__()
+    return frame
+
+
+class TestSSEReplay:
+    """Tests for Last-Event-ID replay from the capped per-channel Redis Streams."""
+
+    def test_reconnect_replays_only_missed_events_then_goes_live(self):
+        ids = [publish_event("sse:test", f'{{"n": {n}}}') for n in range(3)]
+
+        async def scenario():
+            stream = event_stream("sse:test", last_event_id=ids[0])
+            frames = [await _next_event(stream), await _next_event(stream)]
+            await get_broadcaster().subscribed.wait()
+            live_id = publish_event("sse:test", '{"n": 3}')
+            frames.append(await _next_event(stream))
+            await stream.aclose()
+            return frames, live_id
+
+        frames, live_id = asyncio.run(scenario())
+        assert frames == [
+            f'id: {ids[1]}\ndata: {{"n": 1}}\n\n',
+            f'id: {ids[2]}\ndata: {{"n": 2}}\n\n',
+            f'id: {live_id}\ndata: {{"n": 3}}\n\n',
+        ]
+
+    def test_gap_older_than_retention_requires_resync(self, settings):
+        settings.SSE_REPLAY_MAX_EVENTS = 2
+        ids = [publish_event("sse:test", f'{{"n": {n}}}') for n in range(4)]
+
+        async def scenario():
+            frames = []
+            for last_event_id in (ids[0], "not-an-id", ids[2]):
+                stream = event_stream("sse:test", last_event_id=last_event_id)
+                frames.append(await _next_event(stream))
+                await stream.aclose()
+            return frames
+
+        trimmed, malformed, retained = asyncio.run(scenario())
+        assert trimmed == malformed == 'data: {"type": "resync_required"}\n\n'
+        assert retained == f'id: {ids[3]}\ndata: {{"n": 3}}\n\n'
+
+
+class TestWaitForNotification:
+    """Tests for long-poll waits woken through the shared subscription."""
+
+    def test_notification_wakes_waiter(self):
+        assigned = []
+
+        async def condition():
+            return bool(assigned)
+
+        async def scenario():
+            waiter = asyncio.create_task(wait_for_notification(assignments_channel("node-a"), condition, 10))
+            await get_broadcaster().subscribed.wait()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            assigned.append(1)
+            notify_new_assignments(["node-a"])
+            return await waiter, loop.time() - start
+
+        woken, elapsed = asyncio.run(scenario())
+        assert woken is True
+        assert elapsed < 5
+
+    def test_times_out_without_notification(self):
+        async def condition():
+            return False
+
+        assert asyncio.run(wait_for_notification(assignments_channel("node-a"), condition, 0.1)) is False
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from hub import activity_counters, priority_index
+from hub.models import Task
+from hub.redis_publisher import publish_network_activity, publish_task_update
+
+
+def bulk_transition(transitions, fields=()):
+    """
+    Persist a batch of (task, new_status) transitions with a single bulk_update.
+    `fields` lists extra attributes the caller already set on the tasks (e.g. last_attempted).
+    bulk_update bypasses the per-row save signals, so their side effects are emitted once per batch:
+    one priority index sync, one network-activity event and one task update per submitter.
+    Tasks already in their target status are skipped. Returns the tasks whose status changed.
+    """
+    now = timezone.now()
+    changed = []
+    for task, status in transitions:
+        if task.status == status:
+            continue
+        task._old_status = task.status
+        task.status = status
+        task.updated_at = now  # auto_now is not applied by bulk_update
+        changed.append(task)
+
+    if not changed:
+        return []
+
+    Task.objects.bulk_update(changed, ['status', 'updated_at', *fields])
+    for task in changed:
+        task._loaded_status = task.status
+    publish_transitions(changed)
+    return changed
+
+
+def transition_tasks(tasks, status, **values):
+    """
+    Move every task in `tasks` to `status`, setting any extra field `values` on the way
+    (e.g. transition_tasks(tasks, 'in_queue', last_attempted=now)). See bulk_transition.
+    """
+    tasks = list(tasks)
+    for task in tasks:
+        for name, value in values.items():
+            setattr(task, name, value)
+    return bulk_transition([(task, status) for task in tasks], fields=list(values))
+
+
+def publish_transitions(tasks):
+    """
+    Emit the coalesced change events for a batch of tasks whose status changed, once the caller's
+    transaction commits (right away in autocommit): a rolled-back batch must not touch the counters,
+    the priority index or the subscribers.
+    """
+    transitions = [(task._old_status, task.status) for task in tasks]  # as of this batch, the tasks may move on
+    transaction.on_commit(partial(_emit_transitions, list(tasks), transitions))
+
+
+def _emit_transitions(tasks, transitions):
+    activity_counters.record_task_transitions(transitions)
+    priority_index.sync_tasks(tasks)
+    publish_network_activity()
+    by_submitter = defaultdict(list)
+    for task in tasks:
+        if task.submitted_by_id:
+            by_submitter[task.submitted_by_id].append(task)
+    for submitter_id, submitted in by_submitter.items():
+        publish_task_update(submitter_id, submitted, emit=True)
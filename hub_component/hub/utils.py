@@ -1,4 +1,8 @@
+import hashlib
+
 from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from rest_framework.response import Response
 from rest_framework import status
 from functools import wraps
@@ -13,4 +17,29 @@ def experiment_mode_required(view_func):
                 status=status.HTTP_403_FORBIDDEN
             )
         return view_func(request, *args, **kwargs)
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
+
+
+def weak_etag(*parts):
+    """Weak ETag for a representation identified by `parts` (version columns, ids...)."""
+    return 'W/"%s"' % hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional_get(etag_func):
+    """
+    Decorator for polled GET views: `etag_func(request, *args, **kwargs)` computes the ETag from a cheap
+    version lookup, and a matching If-None-Match is answered 304 without running the view (nor serializing
+    anything). If it returns None (e.g. unknown object) the view runs as usual.
+    Successful responses get a short public Cache-Control (API_CACHE_MAX_AGE) so a proxy can cache them too.
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+            return response
+        return _wrapped_view
+    return decorator
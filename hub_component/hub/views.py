@@ -1,30 +1,75 @@
 import uuid
 
-import redis
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
-from django.http import StreamingHttpResponse
+from django.db.models import Count, F, Max, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from hub.models import Node, Task, TaskAssignment, Heartbeat
+from hub import activity_counters, exports, heartbeat_history, heartbeats
+from hub.models import Node, Task, TaskAssignment, Heartbeat, HeartbeatRollup, normalize_free_resources
+from hub.pagination import paginated_response
 from hub.serializers import NodeSerializer, TaskSerializer, NodeRegistrationSerializer
-from hub.tasks import validate_docker_image_task
-from hub.redis_publisher import get_network_activity_data
+from hub.sse import event_stream, wait_for_notification
+from hub.tasks import validate_docker_image_task, request_orchestration
+from hub.redis_publisher import assignments_channel, get_network_activity_data, task_updates_channel
 from hub.tasks import orchestrate_task_distribution
-from hub.utils import experiment_mode_required
+from hub.utils import conditional_get, experiment_mode_required, weak_etag
+
+
+def _parse_statuses(value, model):
+    """Statuses of `model` listed as "a,b"; raises ValueError for an unknown one."""
+    statuses = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(statuses) - {name for name, _ in model._meta.get_field('status').choices}
+    if unknown:
+        raise ValueError(f"Unknown status: {', '.join(sorted(unknown))}.")
+    return statuses
+
+
+def _parse_timestamp(value, name):
+    """Aware datetime from an ISO 8601 query parameter; raises ValueError if it is not one."""
+    parsed = parse_datetime(value.replace(' ', '+'))  # an unencoded "+00:00" arrives as " 00:00"
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO 8601 timestamp.")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _status_filter(request, model):
+    """
+    Statuses requested with `status=a,b`: (list or None, error Response or None).
+    """
+    statuses = request.query_params.get('status')
+    if not statuses:
+        return None, None
+    try:
+        return _parse_statuses(statuses, model), None
+    except ValueError as e:
+        return None, Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
 def list_nodes(request):
     """
-    List all nodes in the system.
+    List the nodes in the system, one page at a time (see paginated_response), optionally filtered by `status`.
     """
+    statuses, error = _status_filter(request, Node)
+    if error:
+        return error
     nodes = Node.objects.all()
-    serializer = NodeSerializer(nodes, many=True)
-    return Response(serializer.data)
+    if statuses:
+        nodes = nodes.filter(status__in=statuses)
+    return paginated_response(request, nodes, NodeSerializer)
 
+def _node_etag(request, node_id):
+    updated_at = Node.objects.filter(id=node_id).values_list('updated_at', flat=True).first()
+    return weak_etag(updated_at) if updated_at else None
+
+
+@conditional_get(_node_etag)
 @api_view(['GET'])
 def fetch_node(request, node_id):
     """
@@ -41,11 +86,22 @@ def fetch_node(request, node_id):
 @api_view(['GET'])
 def list_tasks(request):
     """
-    List all tasks in the system.
+    List the tasks in the system, one page at a time (see paginated_response),
+    optionally filtered by `status` and `submitted_by` (node id).
     """
+    statuses, error = _status_filter(request, Task)
+    if error:
+        return error
     tasks = Task.objects.all()
-    serializer = TaskSerializer(tasks, many=True)
-    return Response(serializer.data)
+    if statuses:
+        tasks = tasks.filter(status__in=statuses)
+    submitted_by = request.query_params.get('submitted_by')
+    if submitted_by:
+        try:
+            tasks = tasks.filter(submitted_by=uuid.UUID(submitted_by))
+        except ValueError:
+            return Response({"error": "submitted_by must be a node id."}, status=status.HTTP_400_BAD_REQUEST)
+    return paginated_response(request, tasks, TaskSerializer)
 
 @api_view(['POST'])
 def register_node(request):
@@ -60,38 +116,82 @@ def register_node(request):
     return Response(req_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-def fetch_task(request):
+async def fetch_task(request):
     """
     In a pull-based system using TaskAssignments:
       - A background job (TaskManager) moves tasks to 'in_progress' and creates
         TaskAssignment records for each node that should work on a task.
       - A node calls this endpoint to retrieve any uncompleted assignment it has.
 
-    We'll just return the first uncompleted assignment's Task to the node.
+    With `wait` (seconds, capped at FETCH_TASK_MAX_WAIT_SECONDS), the request is held until an assignment
+    for the node appears or the wait passes (long-polling). TaskManager wakes it through the node's
+    assignments channel, and waiting holds no worker thread under ASGI.
+    """
+    node_id = request.GET.get('node_id')
+    try:
+        wait = min(float(request.GET.get('wait', 0)), settings.FETCH_TASK_MAX_WAIT_SECONDS)
+    except ValueError:
+        wait = 0
+
+    if node_id and wait > 0:
+        try:
+            uuid.UUID(node_id)
+        except ValueError:
+            pass  # reported by claim_assigned_task
+        else:
+            has_assignment = sync_to_async(
+                TaskAssignment.objects.filter(node_id=node_id, completed_at__isnull=True).exists
+            )
+            await wait_for_notification(assignments_channel(node_id), has_assignment, wait)
+
+    return await sync_to_async(claim_assigned_task)(request)
+
+
+@api_view(['GET'])
+def claim_assigned_task(request):
+    """
+    Return the node's first uncompleted assignment's Task and mark it started (if not already).
+    With `max_tasks=N` (capped at FETCH_TASK_MAX_BATCH), return a list of up to N Tasks, oldest assignment first,
+    and mark all of them started with a single UPDATE.
     """
     node_id = request.query_params.get('node_id')
     if not node_id:
         return Response({"error": "Missing node_id parameter."}, status=status.HTTP_400_BAD_REQUEST)
 
+    max_tasks = request.query_params.get('max_tasks')
+    if max_tasks is not None:
+        try:
+            max_tasks = int(max_tasks)
+        except ValueError:
+            max_tasks = 0
+        if max_tasks < 1:
+            return Response({"error": "max_tasks must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        max_tasks = min(max_tasks, settings.FETCH_TASK_MAX_BATCH)
+
     try:
         node = Node.objects.get(id=node_id)
     except Node.DoesNotExist:
         return Response({"error": "Node not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    assignment = TaskAssignment.objects.filter(
-        node=node,
-        completed_at__isnull=True
-    ).order_by('assigned_at').first()
+    assignments = list(
+        TaskAssignment.objects.filter(
+            node=node,
+            completed_at__isnull=True
+        ).select_related('task').prefetch_related('task__assigned_nodes').order_by('assigned_at')[:max_tasks or 1]
+    )
 
-    if not assignment:
+    if not assignments:
         return Response({"message": "No assigned tasks available."}, status=status.HTTP_404_NOT_FOUND)
 
-    assignment.started_at = timezone.now()
-    assignment.save(update_fields=['started_at'])
+    # Only the first fetch starts an assignment: a node re-fetching its work keeps the original started_at
+    TaskAssignment.objects.filter(
+        id__in=[assignment.id for assignment in assignments], started_at__isnull=True
+    ).update(started_at=timezone.now())
 
-    task_data = TaskSerializer(assignment.task).data
-    return Response(task_data, status=status.HTTP_200_OK)
+    if max_tasks is None:
+        return Response(TaskSerializer(assignments[0].task).data, status=status.HTTP_200_OK)
+    tasks_data = TaskSerializer([assignment.task for assignment in assignments], many=True).data
+    return Response(tasks_data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -119,7 +219,7 @@ def submit_task_result(request):
                             status=status.HTTP_400_BAD_REQUEST)
 
         assignment.result = result
-        assignment.completed_at = timezone.now()
+        assignment.completed_at = timezone.now()  # also releases the node's resource reservation
         assignment.save()
 
         # Lock the Task row so only one can update at a time (prevent race conditions)
@@ -133,33 +233,74 @@ def submit_task_result(request):
                 manager = TaskManager()
                 manager.validate_task(task_id)
 
+    request_orchestration("assignment_completed")
     print(f"[SUBMIT TASK RESULT] Task {task_id} result: {result}")
     return Response({"message": "Task result submitted successfully."}, status=status.HTTP_200_OK)
 
+def _has_more_free_resources(old_resources, new_resources):
+    """Whether a heartbeat reports more free CPU or RAM (free_cpu, free_ram) than the node had before."""
+    old_resources = old_resources or {}
+    return any(
+        isinstance(new_resources.get(key), (int, float)) and new_resources[key] > old_resources.get(key, 0)
+        for key in ('free_cpu', 'free_ram')
+    )
+
+
 @api_view(['POST'])
 def node_heartbeat(request):
     """
     Endpoint for nodes to send periodic heartbeats and resource availability updates.
+    Heartbeats of active nodes are written behind: recorded in Redis and answered immediately,
+    the node rows are persisted in batches by flush_heartbeats_task. Unknown or inactive nodes
+    are updated in the database right away and cached for their next heartbeats.
+    Every heartbeat is counted in the node's per-minute history (hub.heartbeat_history); an optional
+    "status" of "unhealthy" lowers the healthy ratio of that minute.
     """
     node_id = request.data.get('node_id')
-    free_resources = request.data.get('free_resources')
+    free_resources = normalize_free_resources(request.data.get('free_resources'))
+    healthy = request.data.get('status', 'healthy') != 'unhealthy'
 
     if not node_id:
         return Response({"error": "node_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
+    now = timezone.now()
+    try:
+        node_id = uuid.UUID(str(node_id))
+        cached = heartbeats.record(node_id, free_resources, now)
+    except ValueError:
+        return Response({"error": "Node not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if cached is not None:
+        heartbeat_history.record(node_id, free_resources, now, healthy)
+        _, previous_resources = cached
+        if isinstance(free_resources, dict) and _has_more_free_resources(previous_resources, free_resources):
+            request_orchestration("node_free_resources")
+        return Response({"message": "Heartbeat received successfully."}, status=status.HTTP_200_OK)
+
     try:
         node = Node.objects.get(id=node_id)
     except Node.DoesNotExist:
         return Response({"error": "Node not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    node.last_heartbeat = timezone.now()
+    became_active = node.status not in ('active', 'busy')
+    gained_capacity = isinstance(free_resources, dict) and _has_more_free_resources(node.free_resources, free_resources)
+
+    node.last_heartbeat = now
     if isinstance(free_resources, dict):
         node.free_resources = free_resources
 
     if node.status != 'busy':
         node.status = 'active'
+    node.inactive_since = None
 
     node.save()
+    heartbeats.remember(node)
+    heartbeat_history.record(node.id, free_resources, now, healthy)
+
+    if became_active:
+        request_orchestration("node_active")
+    elif gained_capacity:
+        request_orchestration("node_free_resources")
     return Response({"message": "Heartbeat received successfully."}, status=status.HTTP_200_OK)
 
 
@@ -201,6 +342,26 @@ def submit_task(request):
     return Response({"message": "Task submitted and queued for validation", "task_id": str(task.id)}, status=status.HTTP_201_CREATED)
 
 
+def _task_etag(request, task_id):
+    """
+    Version of the get_task response: the task's updated_at, its set of assignments (assigned_nodes)
+    and, with `node_id`, the progress of that node's assignment. One aggregate query.
+    """
+    versions = {'assignments': Count('taskassignment'), 'last_assigned_at': Max('taskassignment__assigned_at')}
+    node_id = request.GET.get('node_id')
+    if node_id:
+        try:
+            node_id = uuid.UUID(node_id)
+        except ValueError:
+            return None
+        own = Q(taskassignment__node_id=node_id)
+        versions['started_at'] = Max('taskassignment__started_at', filter=own)
+        versions['completed_at'] = Max('taskassignment__completed_at', filter=own)
+    version = Task.objects.filter(id=task_id).annotate(**versions).values_list('updated_at', *versions).first()
+    return weak_etag(node_id, *version) if version else None
+
+
+@conditional_get(_task_etag)
 @api_view(['GET'])
 def get_task(request, task_id):
     """
@@ -236,22 +397,88 @@ def get_task(request, task_id):
 @api_view(['GET'])
 def get_submitted_tasks(request):
     """
-    Get all tasks submitted by a specific node.
+    Get the tasks submitted by a specific node, one page at a time (see paginated_response).
+    With `since` (ISO 8601 timestamp), only the tasks updated at or after it are returned, for incremental sync;
+    `status` filters by status.
     """
     node_id = request.query_params.get('node_id')
     if not node_id:
         return Response({"error": "node_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = _parse_timestamp(since, 'since')
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    statuses, error = _status_filter(request, Task)
+    if error:
+        return error
+
     try:
         node = Node.objects.get(id=node_id)
     except Node.DoesNotExist:
         return Response({"error": "Node not found."}, status=status.HTTP_404_NOT_FOUND)
 
     tasks = Task.objects.filter(submitted_by=node)
-    serializer = TaskSerializer(tasks, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    if since:
+        tasks = tasks.filter(updated_at__gte=since)
+    if statuses:
+        tasks = tasks.filter(status__in=statuses)
+    return paginated_response(request, tasks, TaskSerializer)
+
+
+def _export_response(request, queryset, columns, status_field, time_field, filename):
+    """
+    Stream `queryset` as NDJSON (default) or CSV (`format=csv`), filtered by `status=a,b` (task statuses,
+    matched against `status_field`) and by a [`since`, `until`) range of `time_field`.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    try:
+        if fmt not in exports.FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(exports.FORMATS)}.")
+        if request.GET.get('status'):
+            queryset = queryset.filter(**{f'{status_field}__in': _parse_statuses(request.GET['status'], Task)})
+        for name, lookup in (('since', 'gte'), ('until', 'lt')):
+            if request.GET.get(name):
+                queryset = queryset.filter(**{f'{time_field}__{lookup}': _parse_timestamp(request.GET[name], name)})
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        exports.stream_rows(queryset.order_by(time_field, 'id'), columns, fmt),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def export_tasks(request):
+    """
+    Stream all tasks (optionally filtered by `status` and a `since`/`until` range of created_at)
+    as newline-delimited JSON or CSV, for analytics instead of polling tasks one by one.
+    """
+    return _export_response(request, Task.objects.all(), exports.TASK_COLUMNS, 'status', 'created_at', 'tasks')
+
+
+async def export_assignments(request):
+    """
+    Stream all task assignments (optionally filtered by the task's `status` and a `since`/`until` range
+    of assigned_at) as newline-delimited JSON or CSV, with their timing and reservations.
+    """
+    queryset = TaskAssignment.objects.annotate(task_status=F('task__status'))
+    return _export_response(
+        request, queryset, exports.ASSIGNMENT_COLUMNS, 'task__status', 'assigned_at', 'assignments'
+    )
+
+
+def _network_activity_etag(request):
+    return weak_etag(activity_counters.snapshot_version())
 
 
+@conditional_get(_network_activity_etag)
 @api_view(['GET'])
 def network_activity(request):
     """
@@ -264,47 +491,38 @@ def network_activity(request):
     })
 
 
-def network_activity_stream():
-    """Generator function to stream network activity data via Server-Sent Events (SSE)."""
-    redis_client = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL)
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(settings.REDIS_NETWORK_ACTIVITY_CHANNEL)
+def network_activity_stream(last_event_id=None):
+    """Async generator streaming network activity data via Server-Sent Events (SSE)."""
+    return event_stream(settings.REDIS_NETWORK_ACTIVITY_CHANNEL, last_event_id)
 
-    try:
-        for message in pubsub.listen():
-            if message["type"] == "message":
-                yield f"data: {message['data'].decode('utf-8')}\n\n"
-    except GeneratorExit:
-        pubsub.close()
 
+def task_update_stream(node_id, last_event_id=None):
+    """Async generator streaming task updates for a specific node via Server-Sent Events (SSE)."""
+    return event_stream(task_updates_channel(node_id), last_event_id)
 
-def task_update_stream(node_id):
-    """Generator function to stream task updates for a specific node via Server-Sent Events (SSE)."""
-    redis_client = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL)
-    pubsub = redis_client.pubsub()
-    channel = settings.REDIS_TASK_UPDATES_CHANNEL
-    pubsub.subscribe(channel)
 
-    try:
-        for message in pubsub.listen():
-            if message["type"] == "message":
-                yield f"data: {message['data'].decode('utf-8')}\n\n"
-    except GeneratorExit:
-        pubsub.close()
+def _last_event_id(request):
+    """ID of the last event the client received: sent by EventSource on reconnect, or as a query parameter."""
+    return request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
 
 
-def sse_network_activity(request):
-    """ Endpoint to stream network activity data via Server-Sent Events (SSE)."""
-    response = StreamingHttpResponse(network_activity_stream(), content_type='text/event-stream')
+def _sse_response(stream):
+    """Wrap an async SSE generator. Served without holding a worker thread under ASGI (licenta/asgi.py)."""
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
     response['Access-Control-Allow-Origin'] = '*'
     response['Access-Control-Allow-Methods'] = 'GET'
-    response['Access-Control-Allow-Headers'] = 'Content-Type'
+    response['Access-Control-Allow-Headers'] = 'Content-Type, Last-Event-ID'
     return response
 
 
-def sse_task_updates(request):
+async def sse_network_activity(request):
+    """ Endpoint to stream network activity data via Server-Sent Events (SSE)."""
+    return _sse_response(network_activity_stream(_last_event_id(request)))
+
+
+async def sse_task_updates(request):
     """ Endpoint to stream task updates for a specific node via Server-Sent Events (SSE)."""
     node_id = request.GET.get('node_id')
     if not node_id:
@@ -314,13 +532,7 @@ def sse_task_updates(request):
             status=400
         )
 
-    response = StreamingHttpResponse(task_update_stream(node_id), content_type='text/event-stream')
-    response['Cache-Control'] = 'no-cache'
-    response['X-Accel-Buffering'] = 'no'
-    response['Access-Control-Allow-Origin'] = '*'
-    response['Access-Control-Allow-Methods'] = 'GET'
-    response['Access-Control-Allow-Headers'] = 'Content-Type'
-    return response
+    return _sse_response(task_update_stream(node_id, _last_event_id(request)))
 
 
 @api_view(['POST'])
@@ -349,9 +561,9 @@ def validation_experiment_setup(request):
             status="active",
             trust_index=trust,
             resources_capacity={"cpu": 4, "ram": 8},
-            free_resources={"cpu": 4, "ram": 8},
+            free_resources={"free_cpu": 4, "free_ram": 8},
         )
-        Heartbeat.objects.create(node=node, status="healthy")
+        heartbeat_history.record(node.id, node.free_resources, node.last_heartbeat)
         node_objs[name] = node
 
     task_to_exec = Task.objects.all()
@@ -380,9 +592,9 @@ def validation_experiment_keep_nodes_alive(request):
     for name in node_names:
         try:
             node = Node.objects.get(name=name)
-            Heartbeat.objects.create(node=node, status="healthy")
             node.last_heartbeat = timezone.now()
-            node.save(update_fields=['last_heartbeat'])
+            node.save(update_fields=['last_heartbeat', 'updated_at'])
+            heartbeat_history.record(node.id, node.free_resources, node.last_heartbeat)
         except Node.DoesNotExist:
             return Response({"error": f"Node {name} not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -421,7 +633,7 @@ def distribution_experiment_create_node(request):
         free_resources=free_resources,
         status="active",
     )
-    Heartbeat.objects.create(node=node, status="healthy")
+    heartbeat_history.record(node.id, node.free_resources, node.last_heartbeat)
     return Response(NodeSerializer(node).data, status=201)
 
 
@@ -434,5 +646,6 @@ def distribution_experiment_reset_db(request):
     TaskAssignment.objects.all().delete()
     Task.objects.all().delete()
     Heartbeat.objects.all().delete()
+    HeartbeatRollup.objects.all().delete()
     Node.objects.all().delete()
     return Response({"status": "Reset complete."}, status=status.HTTP_200_OK)
\ No newline at end of file
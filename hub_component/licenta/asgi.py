@@ -2,6 +2,8 @@
 ASGI config for licenta project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The hub is served through it (uvicorn) so long-lived SSE streams are async
+and do not hold a worker thread each (see hub/sse.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -9,8 +11,14 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'licenta.settings')
 
 application = get_asgi_application()
+
+if settings.DEBUG:
+    # Serve static files (admin) like runserver does
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
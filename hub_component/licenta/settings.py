@@ -159,15 +159,52 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'hub.tasks.check_node_health',
         'schedule': 60.0,
     },
+    'flush_heartbeats': {
+        'task': 'hub.tasks.flush_heartbeats_task',
+        'schedule': 5.0,
+    },
+    'purge_heartbeat_history': {
+        'task': 'hub.tasks.purge_heartbeat_history_task',
+        'schedule': 3600.0,
+    },
     'orchestrate_task_distribution': {
         'task': 'hub.tasks.orchestrate_task_distribution',
         'schedule': 120.0,
     },
+    'rebuild_priority_index': {
+        'task': 'hub.tasks.rebuild_priority_index_task',
+        'schedule': 600.0,
+    },
+    'reconcile_network_activity': {
+        'task': 'hub.tasks.reconcile_network_activity_task',
+        'schedule': 300.0,
+    },
 }
 
 REDIS_CHANNEL_PREFIX = "sse"
+# Task updates are published per submitting node on f"{REDIS_TASK_UPDATES_CHANNEL}:{node_id}"
 REDIS_TASK_UPDATES_CHANNEL = f"{REDIS_CHANNEL_PREFIX}:task_updates"
 REDIS_NETWORK_ACTIVITY_CHANNEL = f"{REDIS_CHANNEL_PREFIX}:network_activity"
+# New assignments wake long-polling fetches on f"{REDIS_ASSIGNMENTS_CHANNEL}:{node_id}"
+REDIS_ASSIGNMENTS_CHANNEL = f"{REDIS_CHANNEL_PREFIX}:assignments"
+# SSE events are also appended to capped Redis Streams f"{REDIS_SSE_STREAM_PREFIX}:{channel}" for replay
+REDIS_SSE_STREAM_PREFIX = "sse_replay"
+# Write-behind heartbeat store: <prefix>:status / :free_resources hashes, the :last_seen sorted set
+# (liveness, scored by heartbeat time) and the :dirty set
+REDIS_HEARTBEATS_PREFIX = "heartbeats"
+# Per-minute heartbeat aggregates accumulated until flush_heartbeats_task writes them as HeartbeatRollup rows
+REDIS_HEARTBEAT_ROLLUPS_KEY = f"{REDIS_HEARTBEATS_PREFIX}:rollups"
+REDIS_NETWORK_ACTIVITY_COUNTERS_KEY = "network_activity:counters"
+REDIS_NETWORK_ACTIVITY_NODES_KEY = "network_activity:nodes"
+REDIS_NETWORK_ACTIVITY_THROTTLE_KEY = "network_activity:throttle"
+REDIS_NETWORK_ACTIVITY_PENDING_KEY = "network_activity:pending"
+REDIS_NETWORK_ACTIVITY_LAST_FRAME_KEY = "network_activity:last_frame"
+REDIS_PRIORITY_INDEX_PREFIX = "priority"
+REDIS_ORCHESTRATION_PREFIX = "orchestration"
+REDIS_ORCHESTRATION_DEBOUNCE_KEY = f"{REDIS_ORCHESTRATION_PREFIX}:debounce"
+REDIS_ORCHESTRATION_LEASE_KEY = f"{REDIS_ORCHESTRATION_PREFIX}:lease"
+REDIS_ORCHESTRATION_FENCING_KEY = f"{REDIS_ORCHESTRATION_PREFIX}:fencing_token"
+REDIS_ORCHESTRATION_RERUN_KEY = f"{REDIS_ORCHESTRATION_PREFIX}:rerun"
 
 # Orchestration config for heuristics
 ACTIVE_QUEUE_SIZE = 10
@@ -180,7 +217,58 @@ MAX_STALE_COUNT = 50
 TRUST_INDEX_MIN = 1.0
 TRUST_INDEX_MAX = 10.0
 
-# Orchestration algorithm: 'custom' (default) or 'fifo'
+# Orchestration algorithm: 'custom' (default), 'fifo' or 'optimal' (global min-cost matching)
 ORCHESTRATION_MECHANISM = "custom"
+# Rank all (task, node) pairs in one vectorized pass for the 'custom' mechanism
+BULK_ASSIGNMENT = True
+# Event-driven orchestration: trigger a pass on relevant events, coalescing bursts within the window (seconds)
+ORCHESTRATION_EVENT_DRIVEN = True
+ORCHESTRATION_DEBOUNCE_SECONDS = 3.0
+# Single-flight lease for orchestration passes (renewed by every step of a pass)
+ORCHESTRATION_LEASE_SECONDS = 300
+# Where backlog priority is ranked: 'redis' (sorted-set index), 'sql' (ORDER BY annotation) or 'python'
+PRIORITY_BACKEND = "redis"
+# network_activity stream: max frames per second (bursts coalesce into one trailing frame), full keyframe interval
+NETWORK_ACTIVITY_MAX_FRAMES_PER_SECOND = 2
+NETWORK_ACTIVITY_KEYFRAME_SECONDS = 30
+# SSE gateway: per-client queue size (clients falling further behind are dropped), keepalive comment interval
+SSE_CLIENT_QUEUE_SIZE = 100
+SSE_KEEPALIVE_SECONDS = 15
+# SSE replay: events kept per channel and idle expiry of a channel's stream; older gaps get a resync event
+SSE_REPLAY_MAX_EVENTS = 1000
+SSE_REPLAY_RETENTION_SECONDS = 3600
+# Reconnection delay (ms) advertised to EventSource clients
+SSE_RETRY_MS = 3000
+# Heartbeats are persisted by flush_heartbeats_task (see CELERY_BEAT_SCHEDULE), at most this many rows per UPDATE
+HEARTBEAT_FLUSH_BATCH_SIZE = 1000
+# Upper bound on one heartbeat rollup flush; a flush still running after this may overlap the next one
+HEARTBEAT_ROLLUP_FLUSH_LOCK_SECONDS = 60
+# Seconds an inactive node keeps its task assignments before check_node_health reclaims them
+# (0: reclaim as soon as the node is marked inactive)
+NODE_RECLAIM_GRACE_SECONDS = config('NODE_RECLAIM_GRACE_SECONDS', default=0, cast=int)
+
+# Rows per page of the list endpoints when no `limit` is given, and the largest `limit` accepted
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=100, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=1000, cast=int)
+
+# Seconds a proxy or browser may reuse a polled detail response (task, node, network activity)
+# before revalidating it with its ETag
+API_CACHE_MAX_AGE = config('API_CACHE_MAX_AGE', default=2, cast=int)
+
+# Rows fetched per round trip from the server-side cursor of the streaming exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Heartbeat history (HeartbeatRollup rows) older than this is deleted by purge_heartbeat_history_task
+HEARTBEAT_HISTORY_RETENTION_DAYS = config('HEARTBEAT_HISTORY_RETENTION_DAYS', default=30, cast=int)
+# Rows deleted per DELETE statement by the retention purge
+HEARTBEAT_PURGE_BATCH_SIZE = 5000
+# Upper bound (seconds) for the `wait` parameter of tasks/fetch long-polling
+FETCH_TASK_MAX_WAIT_SECONDS = 30
+# Upper bound for the `max_tasks` parameter of tasks/fetch (batch fetch into the node's prefetch queue)
+FETCH_TASK_MAX_BATCH = 10
+# 'optimal' mechanism: solver time budget (seconds) before greedy fallback, new replicas per node per pass
+OPTIMAL_TIME_BUDGET = 30.0
+OPTIMAL_NODE_CAPACITY = 1
+# 'optimal' mechanism: largest matching solved, in eligible (task, node) pairs (~2s of solver time); larger passes use greedy
+OPTIMAL_MAX_EDGES = 20000
 
 EXPERIMENT_MODE = True # set to True to enable experiment setup endpoints
\ No newline at end of file
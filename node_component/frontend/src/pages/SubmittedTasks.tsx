@@ -1,6 +1,6 @@
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState, useCallback, useRef } from 'react';
 import { fetchSubmittedTasks, subscribeToSubmittedTaskUpdates } from '../services/api';
-import { Task } from '../types/api';
+import { Task, TaskUpdateState } from '../types/api';
 import TaskSummary from '../components/TaskSummary';
 import FullTask from '../components/FullTask';
 import ErrorPopup from '../components/ErrorPopup';
@@ -10,12 +10,25 @@ import LoadingIndicator from '../components/LoadingIndicator';
 import { useNodeConfigOnly } from '../hooks/useNodeConfigOnly';
 import { Link } from 'react-router-dom';
 
+// Newest updated_at of a task list: the `since` cursor for the next incremental sync
+const latestUpdate = (tasks: Task[], current: string | null): string | null =>
+  tasks.reduce<string | null>(
+    (latest, task) => (task.updated_at && (!latest || task.updated_at > latest) ? task.updated_at : latest),
+    current
+  );
+
 const SubmittedTasks: React.FC = () => {
   const { nodeConfig } = useNodeConfigOnly();
   const [tasks, setTasks] = useState<Task[]>([]);
   const [selectedTask, setSelectedTask] = useState<Task | null>(null);
   const [errorMessage, setErrorMessage] = useState<string | null>(null);
   const [isLoadingTasks, setIsLoadingTasks] = useState<boolean>(true);
+  const tasksRef = useRef<Task[]>([]);
+  const lastSyncRef = useRef<string | null>(null);
+
+  useEffect(() => {
+    tasksRef.current = tasks;
+  }, [tasks]);
 
   /**
     * Loads the submitted tasks for the current node.
@@ -29,6 +42,7 @@ const SubmittedTasks: React.FC = () => {
     if (nodeConfig?.node_id) {
       try {
         const fetchedTasks = await fetchSubmittedTasks(nodeConfig.node_id);
+        lastSyncRef.current = latestUpdate(fetchedTasks, null);
         setTasks(fetchedTasks);
       } catch {
         setErrorMessage('Failed to fetch tasks.');
@@ -39,12 +53,51 @@ const SubmittedTasks: React.FC = () => {
     setIsLoadingTasks(false);
   }, [nodeConfig?.node_id]);
 
+  /**
+    * Fetches only the tasks updated since the last sync and merges them into the list.
+  */
+  const syncChangedTasks = useCallback(async () => {
+    if (!nodeConfig?.node_id || !lastSyncRef.current) return loadTasks();
+    try {
+      const changed = await fetchSubmittedTasks(nodeConfig.node_id, lastSyncRef.current);
+      lastSyncRef.current = latestUpdate(changed, lastSyncRef.current);
+      const byId = new Map(changed.map((task) => [task.id, task]));
+      setTasks((prev) => [
+        ...prev.map((task) => byId.get(task.id) ?? task),
+        ...changed.filter((task) => !prev.some((known) => known.id === task.id)),
+      ]);
+      setSelectedTask((prev) => (prev && byId.get(prev.id)) ?? prev);
+    } catch {
+      setErrorMessage('Failed to fetch tasks.');
+    }
+  }, [nodeConfig?.node_id, loadTasks]);
+
+  /**
+    * Applies the compact task states of a task_update event in place.
+    * Full rows are only fetched for new tasks or when a result is available.
+  */
+  const applyTaskChanges = useCallback((changes: TaskUpdateState[]) => {
+    const byId = new Map(changes.map((change) => [change.id, change]));
+    const patch = (task: Task): Task => {
+      const change = byId.get(task.id);
+      return change ? { ...task, status: change.status, updated_at: change.updated_at ?? task.updated_at } : task;
+    };
+    setTasks((prev) => prev.map(patch));
+    setSelectedTask((prev) => prev && patch(prev));
+
+    const needsFullRows = changes.some(
+      (change) => change.result !== null || !tasksRef.current.some((task) => task.id === change.id)
+    );
+    if (needsFullRows) syncChangedTasks();
+  }, [syncChangedTasks]);
+
   useEffect(() => {
     if (!nodeConfig?.node_id) return;
 
     loadTasks();
     const unsubscribe = subscribeToSubmittedTaskUpdates(
       nodeConfig.node_id,
+      applyTaskChanges,
       () => {
         console.log('[SSE] Triggering task refresh for node:', nodeConfig.node_id);
         loadTasks();
@@ -55,7 +108,7 @@ const SubmittedTasks: React.FC = () => {
     );
 
     return () => unsubscribe();
-  }, [nodeConfig?.node_id, loadTasks]);
+  }, [nodeConfig?.node_id, loadTasks, applyTaskChanges]);
 
   return (
     <div style={{ padding: '40px', position: 'relative' }}>
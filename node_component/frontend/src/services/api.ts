@@ -1,4 +1,4 @@
-import { FullNode, NetworkActivityData, NodeConfig, Task, TaskAssignment } from '../types/api';
+import { FullNode, NetworkActivityData, NetworkActivityMessage, NodeConfig, SSEResyncMessage, Task, TaskAssignment, TaskUpdateState } from '../types/api';
 import { localApiClient, hubApiClient, sseClient } from './clients';
 import { SubmitTaskPayload } from '../types/api';
 
@@ -50,20 +50,24 @@ export async function submitTask(payload: SubmitTaskPayload): Promise<void> {
   console.log('Task submitted:', payload);
 }
 
-export async function fetchSubmittedTasks(node_id: string): Promise<Task[]> {
-  const { data } = await hubApiClient.get(`/tasks/submitted_tasks?node_id=${node_id}`);
-  return data.map((task: Task) => ({
-    id: task.id,
-    description: task.description,
-    created_at: task.created_at,
-    updated_at: task.updated_at,
-    status: task.status,
-    container_spec: task.container_spec,
-    resource_requirements: task.resource_requirements,
-    trust_index_required: task.trust_index_required,
-    overlap_count: task.overlap_count,
-    result: task.result,
-  }));
+// With `since`, only the tasks updated at or after that ISO timestamp are returned (incremental sync)
+const SUBMITTED_TASK_FIELDS = [
+  'id', 'description', 'created_at', 'updated_at', 'status', 'container_spec',
+  'resource_requirements', 'trust_index_required', 'overlap_count', 'result',
+];
+
+export async function fetchSubmittedTasks(node_id: string, since?: string): Promise<Task[]> {
+  // The hub returns one page at a time; follow `next` until the last page
+  const tasks: Task[] = [];
+  let { data } = await hubApiClient.get('/tasks/submitted_tasks', {
+    params: { node_id, since, fields: SUBMITTED_TASK_FIELDS.join(',') },
+  });
+  tasks.push(...data.results);
+  while (data.next) {
+    ({ data } = await hubApiClient.get(data.next));
+    tasks.push(...data.results);
+  }
+  return tasks;
 }
 
 export async function fetchNetworkActivity(): Promise<NetworkActivityData> {
@@ -77,20 +81,58 @@ export const subscribeToNetworkActivity = (
 ): (() => void) => {
   const sse = sseClient.getEventSource('/sse/network_activity/');
   let debounceTimeout: NodeJS.Timeout | null = null;
+  // Frames are keyframes (full snapshot) or deltas (changed fields only), see "Network Activity Stream" in the README
+  let current: NetworkActivityData | null = null;
+  let lastSeq: number | null = null;
+  let resyncing = false;
+
+  const scheduleUpdate = () => {
+    if (debounceTimeout) clearTimeout(debounceTimeout);
+    debounceTimeout = setTimeout(() => {
+      if (current) onData(current);
+    }, DEBOUNCE_DELAY);
+  };
+
+  const resync = () => {
+    if (resyncing) return;
+    resyncing = true;
+    fetchNetworkActivity()
+      .then((snapshot) => {
+        current = snapshot;
+        scheduleUpdate();
+      })
+      .catch((error) => console.error('Failed to resync network activity:', error))
+      .finally(() => {
+        resyncing = false;
+      });
+  };
 
   sse.onmessage = (event: MessageEvent) => {
-    const parsedData = JSON.parse(event.data);
-    if (parsedData.type === 'network_activity') {
-      if (debounceTimeout) clearTimeout(debounceTimeout);
-      debounceTimeout = setTimeout(() => {
-        onData(parsedData.data);
-      }, DEBOUNCE_DELAY);
+    const parsedData: NetworkActivityMessage | SSEResyncMessage = JSON.parse(event.data);
+    if (parsedData.type === 'resync_required') {
+      // Reconnected after a gap the hub no longer retains: the replay is incomplete
+      resync();
+      return;
+    }
+    if (parsedData.type !== 'network_activity') return;
+
+    if (parsedData.frame === 'delta') {
+      const missedFrames = current === null || lastSeq === null || parsedData.seq !== lastSeq + 1;
+      if (missedFrames) {
+        // No base state or missed frames: resync from the REST snapshot
+        resync();
+      }
+      if (current) current = { ...current, ...parsedData.data };
+    } else {
+      current = parsedData.data as NetworkActivityData;
     }
+    lastSeq = parsedData.seq;
+    scheduleUpdate();
   };
 
   sse.onerror = (error) => {
     if (onError) onError(error);
-    sse.close();
+    // No close(): EventSource reconnects with Last-Event-ID and the hub replays the missed events
   };
 
   return () => {
@@ -101,6 +143,7 @@ export const subscribeToNetworkActivity = (
 
 export const subscribeToSubmittedTaskUpdates = (
   nodeId: string,
+  onTaskChanges: (changes: TaskUpdateState[]) => void,
   onRefetchSignal: () => void,
   onError?: (error: Event) => void
 ): (() => void) => {
@@ -108,14 +151,18 @@ export const subscribeToSubmittedTaskUpdates = (
   
   sse.onmessage = (event: MessageEvent) => {
     const parsed = JSON.parse(event.data);
-    if (parsed.type === 'task_update' && parsed.node_id === nodeId && parsed.action === 'refetch') {
+    if (parsed.type === 'resync_required') {
       onRefetchSignal();
+    } else if (parsed.type === 'task_update' && parsed.node_id === nodeId) {
+      // 'patch' events carry the changed tasks, 'refetch' asks for the whole list
+      if (parsed.action === 'patch') onTaskChanges(parsed.tasks);
+      else if (parsed.action === 'refetch') onRefetchSignal();
     }
   };
 
   sse.onerror = (error) => {
     if (onError) onError(error);
-    sse.close();
+    // No close(): EventSource reconnects with Last-Event-ID and the hub replays the missed events
   };
 
   return () => {
@@ -79,4 +79,31 @@ export interface SubmitTaskPayload {
     failed_tasks: number;
     average_trust_index: number;
   }
+
+  // Message on /sse/network_activity/: a keyframe carries every field, a delta only the changed ones
+  export interface NetworkActivityMessage {
+    type: 'network_activity';
+    frame: 'keyframe' | 'delta';
+    seq: number;
+    timestamp: string;
+    data: Partial<NetworkActivityData>;
+  }
+
+  // Compact state of a changed task carried by task_update events (full rows come from fetchSubmittedTasks)
+  export interface TaskUpdateState {
+    id: string;
+    old_status: string | null;
+    status: string;
+    updated_at: string | null;
+    result: {
+      trust_score?: number | null;
+      has_output: boolean;
+      error?: string | null;
+    } | null;
+  }
+
+  // Sent by the hub when a reconnecting client's Last-Event-ID is older than the retained events
+  export interface SSEResyncMessage {
+    type: 'resync_required';
+  }
   
\ No newline at end of file
@@ -1,6 +1,6 @@
 import logging
 import requests
-from config import HUB_API_BASE_URL, IP_ADDRESS, get_node_id, save_node_id
+from config import HUB_API_BASE_URL, IP_ADDRESS, FETCH_WAIT_SECONDS, get_node_id, save_node_id
 from utils import get_node_resources, get_node_availability
 
 logging.basicConfig(level=logging.INFO)
@@ -34,13 +34,35 @@ class APIClient:
             save_node_id(self.node_id)
         return response_data
 
-    def fetch_task(self):
-        """Fetches a task from the hub API for the registered node."""
+    def fetch_task(self, wait=FETCH_WAIT_SECONDS):
+        """
+        Fetches a task from the hub API for the registered node.
+        The hub holds the request for up to `wait` seconds until an assignment appears (long-polling).
+        """
         if not self.node_id:
             raise Exception("[API CLIENT] Node ID is missing. Register the node first.")
-        response = requests.get(f"{self.base_url}/tasks/fetch", params={"node_id": self.node_id})
+        response = requests.get(
+            f"{self.base_url}/tasks/fetch",
+            params={"node_id": self.node_id, "wait": wait},
+            timeout=wait + 10,
+        )
         return response.json()
 
+    def fetch_tasks(self, max_tasks, wait=FETCH_WAIT_SECONDS):
+        """
+        Fetches up to `max_tasks` assigned tasks in one request, oldest assignment first.
+        Long-polls like fetch_task; returns an empty list if nothing is assigned.
+        """
+        if not self.node_id:
+            raise Exception("[API CLIENT] Node ID is missing. Register the node first.")
+        response = requests.get(
+            f"{self.base_url}/tasks/fetch",
+            params={"node_id": self.node_id, "max_tasks": max_tasks, "wait": wait},
+            timeout=wait + 10,
+        )
+        data = response.json()
+        return data if isinstance(data, list) else []
+
     def fetch_task_details(self, task_id):
         """Fetches details of a specific task assigned to the node."""
         if not self.node_id:
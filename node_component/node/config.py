@@ -5,6 +5,9 @@ from utils import get_ip_address
 
 HUB_API_BASE_URL = os.getenv("HUB_API_BASE_URL", "http://localhost:18000/api")
 HEARTBEAT_INTERVAL = 30  # in seconds
+FETCH_WAIT_SECONDS = 25  # long-poll: the hub holds tasks/fetch until an assignment appears or this passes
+FETCH_ERROR_BACKOFF = 5  # in seconds, pause before retrying after a failed fetch
+TASK_PREFETCH_SIZE = 2  # assignments kept in the local queue, their images are pulled while another task runs
 IP_ADDRESS = get_ip_address()
 
 CONFIG_FILE = "node_config.json"
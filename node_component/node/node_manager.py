@@ -3,7 +3,9 @@ import logging
 import os
 import threading
 import time
+from collections import deque
 import psutil
+from config import FETCH_ERROR_BACKOFF, FETCH_WAIT_SECONDS, TASK_PREFETCH_SIZE
 from api_client import APIClient
 from task_executor import TaskExecutor
 from heartbeat import Heartbeat
@@ -26,6 +28,7 @@ class NodeManager:
         self.running = False
         self.should_run = False
         self.last_task_id = None
+        self.task_queue = deque()  # fetched assignments waiting to run
         self.last_assignment_info = None
         self.heartbeat_thread = None
         self.task_loop_thread = None
@@ -84,18 +87,35 @@ class NodeManager:
         self.task_loop_thread.start()
 
     def _run_main_loop(self):
-        """Main loop for fetching and executing tasks."""
+        """
+        Main loop for fetching and executing tasks.
+        Assignments are fetched in batches into a local prefetch queue, so the next task's image is pulled
+        while the current one runs. Only an empty queue long-polls the hub for new assignments.
+        """
 
         while self.should_run:
+            delay = 0
             try:
-                task = self.api_client.fetch_task()
-                if task:
+                queued_ids = {task["id"] for task in self.task_queue}
+                # The hub returns uncompleted assignments oldest first, including the ones already queued here
+                fetched = self.api_client.fetch_tasks(
+                    max_tasks=TASK_PREFETCH_SIZE,
+                    wait=0 if self.task_queue else FETCH_WAIT_SECONDS,
+                )
+                for task in fetched:
+                    if task.get("id") and task["id"] not in queued_ids:
+                        self.task_queue.append(task)
+                        self.executor.prefetch_task(task)
+
+                if self.task_queue:
+                    task = self.task_queue.popleft()
                     self.last_task_id = task["id"]
                     self.save_config(self.node_id, self.last_task_id)
                     self.executor.execute_task(task)
             except Exception as e:
                 print("[NODE MANAGER] Error:", e)
-            time.sleep(60)
+                delay = FETCH_ERROR_BACKOFF
+            time.sleep(delay)
 
     def get_resource_usage(self):
         """Get current resource usage of the node."""
@@ -1,10 +1,13 @@
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from api_client import APIClient
 
 class TaskExecutor:
     """Manages the blind execution of tasks on the local worker node using Docker."""
     def __init__(self):
         self.api_client = APIClient()
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-prefetch")
+        self.prefetched = {}  # task_id -> future of the background image pull
 
     def ensure_docker_installed(self):
         """
@@ -39,6 +42,28 @@ class TaskExecutor:
                 print(f"[ERROR] Docker installation failed: {e.stderr}")
                 raise Exception("Docker installation failed. Please check the logs and try again.")
 
+    def prefetch_task(self, task):
+        """
+        Pull the image of a queued task in the background, so it is ready when the task runs.
+        Images needing registry credentials are pulled at execution time, since docker login/logout is global.
+        """
+        container_spec = task.get('container_spec', {})
+        image = container_spec.get('image', "")
+        if not image or container_spec.get('docker_credentials') or task['id'] in self.prefetched:
+            return
+        print(f"[TASK EXECUTOR] Prefetching Docker image for Task {task['id']}: {image}")
+        self.prefetched[task['id']] = self.prefetch_pool.submit(self.pull_image, image)
+
+    def pull_image(self, image):
+        """Pull a Docker image."""
+        subprocess.run(
+            f"docker pull {image}",
+            shell=True,
+            check=True,
+            capture_output=True,
+            text=True
+        )
+
     def execute_task(self, task):
         """Execute a task by pulling the Docker image and running the specified command."""
 
@@ -68,15 +93,18 @@ class TaskExecutor:
                     text=True
                 )
 
-            # Step 2: Pull the Docker image
-            print(f"[TASK EXECUTOR] Pulling Docker image: {image}")
-            subprocess.run(
-                f"docker pull {image}",
-                shell=True,
-                check=True,
-                capture_output=True,
-                text=True
-            )
+            # Step 2: Pull the Docker image, unless it was prefetched while the previous task ran
+            prefetch = self.prefetched.pop(task_id, None)
+            pulled = False
+            if prefetch is not None:
+                try:
+                    prefetch.result()
+                    pulled = True
+                except subprocess.CalledProcessError:
+                    pass  # pull again, so a failure is reported with this task's result
+            if not pulled:
+                print(f"[TASK EXECUTOR] Pulling Docker image: {image}")
+                self.pull_image(image)
 
             # Step 3: Run the container with the specified command and environment variables
             docker_command = (
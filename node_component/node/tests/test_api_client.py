@@ -40,6 +40,26 @@ def test_fetch_task_success(mock_get, api_client):
     assert result["id"] == "task-1"
 
 
+@patch("api_client.requests.get")
+def test_fetch_task_long_polls(mock_get, api_client):
+    api_client.node_id = "node-1"
+    api_client.fetch_task(wait=20)
+    _, kwargs = mock_get.call_args
+    assert kwargs["params"] == {"node_id": "node-1", "wait": 20}
+    assert kwargs["timeout"] > 20
+
+
+@patch("api_client.requests.get")
+def test_fetch_tasks_returns_batch_or_empty_list(mock_get, api_client):
+    api_client.node_id = "node-1"
+    mock_get.return_value.json.return_value = [{"id": "task-1"}, {"id": "task-2"}]
+    assert [task["id"] for task in api_client.fetch_tasks(max_tasks=2)] == ["task-1", "task-2"]
+    assert mock_get.call_args.kwargs["params"]["max_tasks"] == 2
+
+    mock_get.return_value.json.return_value = {"message": "No assigned tasks available."}
+    assert api_client.fetch_tasks(max_tasks=2) == []
+
+
 def test_fetch_task_missing_node_id():
     client = APIClient()
     client.node_id = None
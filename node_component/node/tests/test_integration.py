@@ -9,10 +9,11 @@ from node_local_server import app, node_manager
 
 def test_node_manager_start_runs_heartbeat_and_task_loop():
     with patch("heartbeat.Heartbeat.start") as mock_heartbeat_start, \
-         patch("api_client.APIClient.fetch_task") as mock_fetch_task, \
+         patch("api_client.APIClient.fetch_tasks") as mock_fetch_task, \
+         patch("task_executor.TaskExecutor.prefetch_task"), \
          patch("task_executor.TaskExecutor.execute_task") as mock_execute:
 
-        mock_fetch_task.side_effect = [{"id": "task1", "container_spec": {"image": "alpine", "command": "echo hi"}}] * 2
+        mock_fetch_task.side_effect = [[{"id": "task1", "container_spec": {"image": "alpine", "command": "echo hi"}}]] * 2
 
         manager = NodeManager()
         manager.node_id = "node-abc"  # simulate already registered
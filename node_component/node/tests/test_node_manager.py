@@ -96,7 +96,8 @@ def test_run_main_loop_handles_fetch_and_exec_once():
     fake_task = {"id": "task-1"}
     nm.node_id = "abc"
 
-    with patch.object(nm.api_client, "fetch_task", return_value=fake_task), \
+    with patch.object(nm.api_client, "fetch_tasks", return_value=[fake_task]), \
+         patch.object(nm.executor, "prefetch_task"), \
          patch.object(nm, "save_config") as mock_save, \
          patch.object(nm.executor, "execute_task") as mock_exec, \
          patch("time.sleep", side_effect=lambda x: setattr(nm, "should_run", False)):
@@ -110,6 +111,44 @@ def test_run_main_loop_handles_exception_gracefully():
     nm.should_run = True
     nm.node_id = "abc"
 
-    with patch.object(nm.api_client, "fetch_task", side_effect=Exception("fail")), \
+    with patch.object(nm.api_client, "fetch_tasks", side_effect=Exception("fail")), \
          patch("time.sleep", side_effect=lambda x: setattr(nm, "should_run", False)):
         nm._run_main_loop()
+
+
+def test_run_main_loop_polls_again_without_sleeping():
+    nm = NodeManager()
+    nm.should_run = True
+    nm.node_id = "abc"
+
+    with patch.object(nm.api_client, "fetch_tasks", return_value=[]), \
+         patch.object(nm.executor, "execute_task") as mock_exec, \
+         patch("time.sleep", side_effect=lambda x: setattr(nm, "should_run", False)) as mock_sleep:
+        nm._run_main_loop()
+        mock_exec.assert_not_called()
+        mock_sleep.assert_called_once_with(0)
+
+
+def test_run_main_loop_prefetches_queued_tasks_and_skips_long_poll():
+    nm = NodeManager()
+    nm.should_run = True
+    nm.node_id = "abc"
+    first, second = {"id": "task-1"}, {"id": "task-2"}
+    # Second fetch returns the still queued task again, as the hub serves uncompleted assignments
+    fetches = iter([[first, second], [second]])
+    sleeps = []
+
+    def stop_after_two(delay):
+        sleeps.append(delay)
+        nm.should_run = len(sleeps) < 2
+
+    with patch.object(nm.api_client, "fetch_tasks", side_effect=lambda **kwargs: next(fetches)) as mock_fetch, \
+         patch.object(nm.executor, "prefetch_task") as mock_prefetch, \
+         patch.object(nm.executor, "execute_task") as mock_exec, \
+         patch.object(nm, "save_config"), \
+         patch("time.sleep", side_effect=stop_after_two):
+        nm._run_main_loop()
+
+    assert [call.args[0] for call in mock_exec.call_args_list] == [first, second]
+    assert [call.args[0] for call in mock_prefetch.call_args_list] == [first, second]
+    assert mock_fetch.call_args_list[1].kwargs["wait"] == 0  # queue not empty: no long-poll